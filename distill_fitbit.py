@@ -6,586 +6,460 @@ import json
 import os
 import shutil
 import sys
-from concurrent.futures import ProcessPoolExecutor, as_completed
-from typing import Dict, List, Optional, Tuple
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
 
 from fitbit_distiller import (
-    to_float, parse_date_value, parse_datetime_value,
-    parse_duration_to_minutes, first_value, num_value, ensure_dir,
-    read_csv_stream,
-    infer_date_column, categorize_path, match_metric_key, is_session_headers,
-    aggregate_value, finalize_daily,
+    ensure_dir,
+    read_csv_stream, count_data_rows,
+    infer_date_column, categorize_path, classify_headers,
+    aggregate_value, finalize_daily, add_trend_fields, period_summaries, SUMMARY_PERIODS, fast_index_record,
+    FileContext, run_extractor,
+    contributions_to_agg, find_covered_files,
+    PartialAggregate, TreeReducer,
+    JSON_BACKENDS, JSON_FORMATS, JsonlWriter, Serializer, get_serializer, public_fields,
+    ROLLUP_RESOLUTIONS, iter_rollups, parse_resolutions,
+    DEFAULT_MAX_HR, hr_daily_fields, series_hr_sketches,
+    HrSeries, PaceSeries, scan_series_file,
+    detect_pace_sessions, enrich_session, write_text_atomic,
+    MANIFEST_NAME, remove_partitions, write_manifest, write_partitions,
+    DEFAULT_HOST, DEFAULT_PORT, make_server,
+    DEFAULT_POLL_INTERVAL_SEC, DirectoryPoller, find_csv_files, snapshot_csv_files,
+    write_sqlite,
+    DEFAULT_CHECKPOINT_INTERVAL_SEC, DEFAULT_STATE_DIR_NAME, RunCheckpoint, make_plan,
+    DEFAULT_TASKS_PER_WORKER, WindowedExecutor,
+    WatchState,
 )
 
+# Progress bar redraws per second at most; the final state is always drawn
+PROGRESS_REFRESH_HZ = 10.0
+
 
 def process_csv_worker(args):
-    import datetime as dtpcsv
-    from collections import defaultdict
-    (csv_path, input_root) = args
+    (csv_path, input_root, dedup, skip_irrelevant) = args
     category = categorize_path(str(csv_path))
     headers, rows_iter, encoding_used, errors = read_csv_stream(str(csv_path))
-    date_col = infer_date_column(headers) if headers else None
-
-    # Index info
-    row_count = 0
-    min_date: Optional[str] = None
-    max_date: Optional[str] = None
-    metric_hits: Dict[str, int] = defaultdict(int)
-
-    # Prepare metric header mapping for efficiency
-    header_metric_keys: List[Optional[str]] = []
-    for h in headers:
-        header_metric_keys.append(match_metric_key(h, category))
-
-    session_mode = is_session_headers(headers, category)
-
     rel_path = os.path.relpath(csv_path, start=input_root)
 
-    # Guard: disable session extraction for sedentary period files
-    if "sedentary_period" in rel_path.lower():
-        session_mode = False
-
-    local_daily: Dict[str, Dict[str, float]] = {}
-    local_sessions: List[Dict[str, object]] = []
-
-    for row in rows_iter:
-        row_count += 1
-        date_str: Optional[str] = None
-        if date_col and date_col in row:
-            d = parse_date_value(row.get(date_col))
-            if d:
-                date_str = d.isoformat()
-        # If we couldn't parse date, try any date-like field
-        if not date_str:
-            for h in headers:
-                d = parse_date_value(row.get(h))
-                if d:
-                    date_str = d.isoformat()
-                    break
-
-        # Session extraction
-        if session_mode:
-            # Start/end datetime parsing with flexible sources
-            start_dt: Optional[dtpcsv.datetime] = None
-            end_dt: Optional[dtpcsv.datetime] = None
-            start_candidates = [
-                first_value(row, headers, ["start datetime", "start date time", "start date", "start time", "start"]),
-            ]
-            end_candidates = [
-                first_value(row, headers, ["end datetime", "end date time", "end date", "end time", "finish", "end"]),
-            ]
-            sd = first_value(row, headers, ["start date", "date"]) or first_value(row, headers, ["date start"])
-            st = first_value(row, headers, ["start time", "time start", "time"])
-            ed = first_value(row, headers, ["end date"]) or first_value(row, headers, ["date end"])
-            et = first_value(row, headers, ["end time", "time end"])
-
-            for cand in start_candidates:
-                if cand:
-                    start_dt = parse_datetime_value(cand)
-                    if start_dt:
-                        break
-            if not start_dt and sd and st:
-                start_dt = parse_datetime_value(f"{sd} {st}") or parse_datetime_value(sd) or parse_datetime_value(st)
-            if not start_dt and sd:
-                start_dt = parse_datetime_value(sd)
-
-            for cand in end_candidates:
-                if cand:
-                    end_dt = parse_datetime_value(cand)
-                    if end_dt:
-                        break
-            if not end_dt and ed and et:
-                end_dt = parse_datetime_value(f"{ed} {et}") or parse_datetime_value(ed) or parse_datetime_value(et)
-            if not end_dt and ed:
-                end_dt = parse_datetime_value(ed)
-
-            # Duration
-            dur_field = first_value(row, headers, ["duration", "length", "elapsed time"]) or first_value(row, headers,
-                                                                                                         ["minutes"])
-            duration_min = parse_duration_to_minutes(dur_field) if dur_field else None
-            if duration_min is None and start_dt and end_dt:
-                try:
-                    duration_min = max((end_dt - start_dt).total_seconds() / 60.0, 0.0)
-                except (TypeError, OverflowError):
-                    duration_min = None
-
-            # Activity type / name
-            activity_type = first_value(row, headers, [
-                "activity type", "activity name", "activity", "exercise", "exercise name", "workout", "sport", "type"
-            ])
-
-            # Key metrics
-            calories = num_value(row, headers, ["calories", "calorie", "kcal", "energy"])
-            dist_mm = num_value(row, headers, [
-                "distance_mm", "distance (mm)", "tracker_total_distance_mm", "traveled_distance_mm"
-            ])
-            if dist_mm is not None:
-                distance = dist_mm / 1_000_000.0  # km from mm
-            else:
-                dist_m = num_value(row, headers, ["distance_m", "distance (m)", "meters", "metres"])
-                if dist_m is not None:
-                    distance = dist_m / 1000.0
-                else:
-                    distance = num_value(row, headers,
-                                         ["distance", "km", "kilometer", "kilometre", "miles", "mi"])  # unit unknown
-            steps_v = num_value(row, headers, ["steps", "step count", "stepcount", "step"])
-            avg_hr = num_value(row, headers,
-                               ["average heart", "avg heart", "avg hr", "average hr", "avg bpm", "average bpm",
-                                "mean hr"])
-            max_hr = num_value(row, headers, ["max heart", "max hr", "peak heart", "max bpm"])
-            elev_mm = num_value(row, headers, [
-                "elevation_gain_mm", "altitude_gain_mm", "tracker_total_altitude_mm", "elevation_mm",
-                "elevation gain (mm)"
-            ])
-            if elev_mm is not None:
-                elev_gain = elev_mm / 1000.0
-            else:
-                elev_gain = num_value(row, headers,
-                                      ["elevation gain", "elevation (m)", "elevation gain (m)", "elevation gain (ft)",
-                                       "elev gain", "ascent", "climb"])
-            azm_total = num_value(row, headers, ["active zone minutes", "azm", "zone minutes"])
-            azm_fat = num_value(row, headers, ["fat burn minutes", "azm - fat burn", "active zone minutes - fat burn",
-                                               "fat burn zone minutes", "fat burn"])
-            azm_cardio = num_value(row, headers, ["cardio minutes", "azm - cardio", "active zone minutes - cardio",
-                                                  "cardio zone minutes", "cardio"])
-            azm_peak = num_value(row, headers,
-                                 ["peak minutes", "azm - peak", "active zone minutes - peak", "peak zone minutes",
-                                  "peak"]) 
-
-            # Determine session date for aggregation
-            if not date_str and start_dt:
-                date_str = start_dt.date().isoformat()
-
-            # Emit session record (buffer for later enrichment/write)
-            if start_dt or end_dt or duration_min is not None or activity_type:
-                rec = {
-                    "date": date_str,
-                    "start": start_dt.isoformat() if start_dt else None,
-                    "end": end_dt.isoformat() if end_dt else None,
-                    "duration_min": round(duration_min, 3) if isinstance(duration_min, (int, float)) else None,
-                    "type": activity_type,
-                    "calories": calories,
-                    "distance": distance,
-                    "steps": steps_v,
-                    "avg_hr": avg_hr,
-                    "max_hr": max_hr,
-                    "elevation_gain_m": elev_gain,
-                    "azm_minutes": azm_total,
-                    "azm_fat_burn_minutes": azm_fat,
-                    "azm_cardio_minutes": azm_cardio,
-                    "azm_peak_minutes": azm_peak,
-                    "category": category,
-                    "source_path": rel_path,
-                    # Internal fields for the enrichment phase:
-                    "_start_dt": start_dt,
-                    "_end_dt": end_dt,
-                }
-                public = {k: v for k, v in rec.items() if k not in ("_start_dt", "_end_dt") and v is not None}
-                public["_start_dt"] = start_dt
-                public["_end_dt"] = end_dt
-                local_sessions.append(public)
-
-            # Aggregate to daily workout metrics
-            if date_str and duration_min is not None:
-                aggregate_value(local_daily, date_str, "workout_minutes", float(duration_min))
-                aggregate_value(local_daily, date_str, "workout_count", 1.0)
-
-        if date_str:
-            if not min_date or date_str < min_date:
-                min_date = date_str
-            if not max_date or date_str > max_date:
-                max_date = date_str
-
-        # Aggregate metrics if we have a date
-        if date_str:
-            for h, mk in zip(headers, header_metric_keys):
-                if mk is None:
-                    continue
-                val = to_float(row.get(h))
-                if val is None:
-                    continue
-                metric_hits[mk] += 1
-                aggregate_value(local_daily, date_str, mk, val)
+    # Header-only pre-pass: files with no metric, session or date column are never row-parsed
+    file_class = classify_headers(headers, category, rel_path)
+    if file_class == "irrelevant":
+        if skip_irrelevant:
+            return {}, {}, [], None, rel_path
+        index_record = {
+            "path": rel_path,
+            "category": category,
+            "size_bytes": os.path.getsize(csv_path),
+            "file_class": file_class,
+            "encoding": encoding_used,
+            "columns": headers,
+            "row_count": count_data_rows(str(csv_path)),
+            "date_column": infer_date_column(headers) if headers else None,
+            "date_range": {"min": None, "max": None},
+            "metric_hits": {},
+            "errors": errors,
+        }
+        return {}, {}, [], index_record, rel_path
+
+    # The registry picks the extractor for this file from its name, category and headers
+    ctx = FileContext(str(csv_path), rel_path, category, headers, file_class, dedup)
+    extractor = run_extractor(ctx, rows_iter)
 
     index_record = {
-        "path": os.path.relpath(csv_path, start=input_root),
+        "path": rel_path,
         "category": category,
+        "size_bytes": os.path.getsize(csv_path),
+        "file_class": file_class,
+        "extractor": extractor.name,
         "encoding": encoding_used,
         "columns": headers,
-        "row_count": row_count,
-        "date_column": date_col,
-        "date_range": {"min": min_date, "max": max_date},
-        "metric_hits": dict(metric_hits),
+        "row_count": ctx.row_count,
+        "date_column": ctx.date_col,
+        "date_range": {"min": ctx.min_date, "max": ctx.max_date},
+        "date_precision": ctx.date_precision,
+        "metric_hits": dict(ctx.metric_hits),
         "errors": errors,
     }
-    return local_daily, local_sessions, index_record, rel_path
+    return ctx.local_daily, ctx.local_contrib.finish(), ctx.local_sessions, index_record, rel_path
 
 
-def main():
-    parser = argparse.ArgumentParser(description="Distill Fitbit CSV export into AI-consumable JSONL")
-    parser.add_argument("--input", default="Fitbit", help="Path to Fitbit export root directory")
-    parser.add_argument("--output", default="distilled", help="Path to output directory")
-    parser.add_argument("--no-progress", action="store_true", help="Disable console progress bar output")
-    parser.add_argument("--workers", type=int, default=(os.cpu_count() or 1),
-                        help="Number of parallel worker processes (default: CPU count)")
-    # Allow forcing progress output even if stderr is not a TTY (e.g., some IDE consoles)
-    parser.add_argument("--force-progress", action="store_true", help="Show progress even if stderr is not a TTY")
-    args = parser.parse_args()
+def process_csv_batch(args) -> PartialAggregate:
+    """Process several CSVs in one task, pre-merged into a single partial aggregate."""
+    (csv_paths, input_root, dedup, skip_irrelevant) = args
+    partial = PartialAggregate(dedup)
+    for csv_path in csv_paths:
+        try:
+            local_daily, local_contrib, local_sessions, index_record, _rel_path = process_csv_worker(
+                (csv_path, input_root, dedup, skip_irrelevant))
+        except Exception as e:
+            partial.index_records.append(
+                _error_index_record(os.path.relpath(csv_path, start=input_root), input_root, e))
+            continue
+        partial.add_result(local_daily, local_contrib, local_sessions, index_record)
+    return partial
 
-    # Ensure argparse values are typed as str for path operations
-    input_root: str = str(args.input)
-    output_root: str = str(args.output)
-    ensure_dir(output_root)
 
-    # Progress display control
+def _print_progress(done_print: int, total: int, current_rel: Optional[str] = None,
+                    label: str = "Processing CSVs") -> None:
     try:
-        stderr_isatty = sys.stderr.isatty()
+        cols = shutil.get_terminal_size(fallback=(80, 20)).columns
     except Exception:
-        stderr_isatty = False
-    show_progress = (not args.no_progress) and (stderr_isatty or args.force_progress)
+        cols = 80
+    prefix = f"{label}: {done_print}/{total} "
+    suffix = ""
+    if total > 0:
+        pct = int(done_print * 100 / total)
+        suffix = f"({pct}%)"
+    # Reserve space for prefix, suffix, and a minimal bar
+    bar_space = max(10, cols - len(prefix) - len(suffix) - 5)
+    # Build bar
+    filled = 0
+    if total > 0:
+        filled = int(bar_space * done_print / total)
+    bar = "#" * filled + "-" * (bar_space - filled)
+    line = f"\r{prefix}[{bar}] {suffix}"
+    # Show the current file (trim if needed)
+    if current_rel:
+        max_name = max(0, cols - len(line) - 3)
+        name_disp = current_rel if len(current_rel) <= max_name else "…" + current_rel[-(max_name - 1):]
+        line += f" {name_disp}"
+    # Ensure the line doesn't overflow
+    line = line[:cols - 1]
+    sys.stderr.write(line)
+    sys.stderr.flush()
+    if done_print >= total:
+        sys.stderr.write("\n")
+        sys.stderr.flush()
 
-    files_index_path = os.path.join(output_root, "fitbit_files_index.jsonl")
-    daily_out_path = os.path.join(output_root, "fitbit_daily_distilled.jsonl")
-    sessions_out_path = os.path.join(output_root, "fitbit_activity_sessions.jsonl")
-    readme_path = os.path.join(output_root, "README.txt")
 
-    # Aggregators
-    daily_agg: Dict[str, Dict[str, float]] = {}
+class _Progress:
+    """Progress bar redrawn at most PROGRESS_REFRESH_HZ times per second (and always on completion)."""
 
-    # Writers
-    index_f = open(files_index_path, "w", encoding="utf-8")
-    # We'll write sessions after enrichment
+    def __init__(self, total: int, label: str = "Processing CSVs", enabled: bool = True):
+        self.total = total
+        self.label = label
+        self.enabled = enabled
+        self._next_draw = 0.0
 
-    # Buffers for post-run enrichment
-    sessions_buffer: List[Dict[str, object]] = []
+    def update(self, done: int, current_rel: Optional[str] = None):
+        if not self.enabled:
+            return
+        now = time.monotonic()
+        if done < self.total and now < self._next_draw:
+            return
+        self._next_draw = now + 1.0 / PROGRESS_REFRESH_HZ
+        _print_progress(done, self.total, current_rel, label=self.label)
 
-    # Time series indexes for enrichment
-    # Store per-date sorted lists of (datetime, value...)
-    hr_series: Dict[str, List[Tuple[dt.datetime, float]]] = {}
-    pace_series: Dict[str, List[Tuple[dt.datetime, Optional[float], Optional[float], Optional[float]]]] = {}
-    # pace tuple: (timestamp, steps, distance_mm, altitude_gain_mm)
 
-    # Prepare a list of CSV files and progress bar
-    csv_paths: List[str] = []
-    for root, _, files in os.walk(input_root):
-        for name in files:
-            if name.lower().endswith(".csv"):
-                csv_paths.append(os.path.join(root, name))
-    total_csv = len(csv_paths)
+def _make_executor(args) -> WindowedExecutor:
+    """Worker pool with the --tasks-per-worker window, --task-timeout and --max-tasks-per-child settings."""
+    workers = max(1, int(args.workers))
+    return WindowedExecutor(workers, max_in_flight=workers * max(1, int(args.tasks_per_worker)),
+                            task_timeout=args.task_timeout, max_tasks_per_child=args.max_tasks_per_child)
 
-    # Pre-scan heart rate and live pace series for enrichment and auto session detection
-    # This pass is lightweight and avoids changing worker return types.
-    if not args.no_progress:
-        try:
-            sys.stderr.write("Pre-scanning time series (heart rate / live pace)...\n")
-            sys.stderr.flush()
-        except Exception:
-            pass
-    prescan_count = 0
-    for csv_path in csv_paths:
-        name_low = os.path.basename(csv_path).lower()
+
+def _error_index_record(rel: str, input_root: str, error: Exception) -> Dict[str, object]:
+    path = os.path.join(input_root, rel)
+    try:
+        size: Optional[int] = os.path.getsize(path)
+    except OSError:
+        # The file may be the reason for the error (removed or unreadable mid-run)
+        size = None
+    return {
+        "path": rel,
+        "category": categorize_path(path),
+        "size_bytes": size,
+        "file_class": None,
+        "encoding": None,
+        "columns": [],
+        "row_count": 0,
+        "date_column": None,
+        "date_range": {"min": None, "max": None},
+        "metric_hits": {},
+        "errors": [str(error)],
+    }
+
+
+def _write_index_records(files_index_path: str, index_records: List[Dict[str, object]],
+                         serializer: Serializer) -> bool:
+    with JsonlWriter(files_index_path, serializer, atomic=True) as index_f:
+        index_f.write_many(sorted(index_records, key=lambda r: r.get("path", "")))
+    return index_f.changed
+
+
+def _write_fast_index(csv_paths: List[str], input_root: str, files_index_path: str,
+                      index_records: List[Dict[str, object]], executor: WindowedExecutor, show_progress: bool,
+                      skip_irrelevant: bool, serializer: Serializer) -> None:
+    """--index-only: build the files index from raw bytes, skipping daily/session extraction."""
+    progress = _Progress(len(csv_paths), "Indexing CSVs", show_progress)
+    progress.update(0)
+    tasks = ((os.path.relpath(p, start=input_root), fast_index_record, (p, input_root)) for p in csv_paths)
+    done = 0
+    for rel, rec, error in executor.run(tasks):
+        if error is not None:
+            index_records.append(_error_index_record(rel, input_root, error))
+        elif not (skip_irrelevant and rec.get("file_class") == "irrelevant"):
+            index_records.append(rec)
+        done += 1
+        progress.update(done, rel)
+    _write_index_records(files_index_path, index_records, serializer)
+
+
+def _output_paths(output_root: str) -> Tuple[Dict[str, str], Dict[str, str]]:
+    paths = {
+        "files_index": os.path.join(output_root, "fitbit_files_index.jsonl"),
+        "daily": os.path.join(output_root, "fitbit_daily_distilled.jsonl"),
+        "sessions": os.path.join(output_root, "fitbit_activity_sessions.jsonl"),
+        "readme": os.path.join(output_root, "README.txt"),
+    }
+    for period in SUMMARY_PERIODS:
+        paths[period] = os.path.join(output_root, f"fitbit_{period}ly_summary.jsonl")
+    rollup_paths = {label: os.path.join(output_root, f"fitbit_intraday_{label}.jsonl") for label in ROLLUP_RESOLUTIONS}
+    return paths, rollup_paths
+
+
+def _load_series(csv_paths: List[str], show_progress: bool) -> Tuple[HrSeries, PaceSeries]:
+    """Pre-scan heart rate and live pace series for enrichment, rollups and auto session detection."""
+    hr_series = HrSeries()
+    pace_series = PaceSeries()
+    total = len(csv_paths)
+    for prescan_count, csv_path in enumerate(csv_paths, 1):
         try:
-            if "live_pace_" in name_low:
-                headers, rows_iter, _enc, _errs = read_csv_stream(csv_path)
-                if headers:
-                    lower_map = {h.lower().strip(): h for h in headers}
-                    ts_k = lower_map.get("timestamp")
-                    steps_k = lower_map.get("steps")
-                    dist_k = lower_map.get("distance millimeters")
-                    alt_k = lower_map.get("altitude gain millimeters")
-                    for row in rows_iter:
-                        ts = parse_datetime_value(row.get(ts_k) if ts_k else None)
-                        if not isinstance(ts, dt.datetime):
-                            continue
-                        dkey = ts.date().isoformat()
-                        steps_v = to_float(row.get(steps_k)) if steps_k else None
-                        dist_mm = to_float(row.get(dist_k)) if dist_k else None
-                        alt_mm = to_float(row.get(alt_k)) if alt_k else None
-                        if dkey not in pace_series:
-                            pace_series[dkey] = []
-                        pace_series[dkey].append((ts, steps_v, dist_mm, alt_mm))
-            elif "heart_rate_" in name_low:
-                headers, rows_iter, _enc, _errs = read_csv_stream(csv_path)
-                if headers:
-                    lower_map = {h.lower().strip(): h for h in headers}
-                    ts_k = lower_map.get("timestamp")
-                    bpm_k = lower_map.get("beats per minute")
-                    for row in rows_iter:
-                        ts = parse_datetime_value(row.get(ts_k) if ts_k else None)
-                        if not isinstance(ts, dt.datetime):
-                            continue
-                        bpm = to_float(row.get(bpm_k)) if bpm_k else None
-                        if bpm is None:
-                            continue
-                        dkey = ts.date().isoformat()
-                        if dkey not in hr_series:
-                            hr_series[dkey] = []
-                        hr_series[dkey].append((ts, float(bpm)))
+            file_hr, file_pace = scan_series_file(csv_path)
+            hr_series.extend(file_hr)
+            pace_series.extend(file_pace)
         except Exception:
             # Ignore errors in pre-scan to avoid blocking the main processing
             pass
         finally:
-            prescan_count += 1
-            if show_progress and total_csv > 0:
+            if show_progress and total > 0:
                 # Lightweight pre-scan indicator (separate from the main progress bar)
                 try:
-                    sys.stderr.write(f"\rPre-scan: {prescan_count}/{total_csv}")
+                    sys.stderr.write(f"\rPre-scan: {prescan_count}/{total}")
                     sys.stderr.flush()
                 except Exception:
                     pass
-    if show_progress and total_csv > 0:
+    if show_progress and total > 0:
         try:
             sys.stderr.write("\n")
             sys.stderr.flush()
         except Exception:
             pass
+    return hr_series, pace_series
+
+
+def _run_batches(batches: List[List[str]], input_root: str, executor: WindowedExecutor, dedup: bool,
+                 skip_irrelevant: bool, show_progress: bool, checkpoint: Optional[RunCheckpoint] = None,
+                 resume: bool = False, checkpoint_interval: float = DEFAULT_CHECKPOINT_INTERVAL_SEC) -> PartialAggregate:
+    """Process all batches and merge the batch partials in a fixed tree.
+
+    Batches are submitted through ``executor``'s bounded window, so each
+    result is merged before more work is queued. A batch whose task fails
+    (it timed out, or its worker kept dying) is rerun one file per task, so
+    only the file at fault gets an error entry. With ``checkpoint``, the
+    completed batches and the reducer's pending nodes are saved at most every
+    ``checkpoint_interval`` seconds (and on Ctrl-C); ``resume`` restores them
+    and only runs the remaining batches.
+    """
+    done_batches, pending = checkpoint.load_reduce_state() if checkpoint is not None and resume else (set(), {})
+    progress = _Progress(sum(len(batch) for batch in batches), enabled=show_progress)
+    done = sum(len(batches[i]) for i in done_batches)
+    progress.update(done)
+
+    # Workers pre-merge fixed batches of files; batch partials are combined in a tree keyed by batch
+    # index, so the merged result does not depend on completion order (or on resuming).
+    reducer: TreeReducer[PartialAggregate] = TreeReducer(PartialAggregate.merge, pending)
+    next_save = time.monotonic() + checkpoint_interval
+
+    def add_batch(batch_index: int, partial: PartialAggregate):
+        nonlocal done, next_save
+        batch = batches[batch_index]
+        reducer.add(batch_index, partial)
+        done_batches.add(batch_index)
+        done += len(batch)
+        progress.update(done, os.path.relpath(batch[-1], start=input_root))
+        if checkpoint is not None and time.monotonic() >= next_save:
+            checkpoint.save_reduce_state(done_batches, reducer.nodes())
+            next_save = time.monotonic() + checkpoint_interval
+
+    def error_partial(csv_paths: List[str], error: BaseException) -> PartialAggregate:
+        # An error index entry per file keeps the tree complete
+        partial = PartialAggregate(dedup)
+        for csv_path in csv_paths:
+            partial.index_records.append(
+                _error_index_record(os.path.relpath(csv_path, start=input_root), input_root, error))
+        return partial
 
-    def _print_progress(done_print: int, total: int, current_rel: Optional[str] = None) -> None:
-        try:
-            cols = shutil.get_terminal_size(fallback=(80, 20)).columns
-        except Exception:
-            cols = 80
-        prefix = f"Processing CSVs: {done_print}/{total} "
-        suffix = ""
-        if total > 0:
-            pct = int(done_print * 100 / total)
-            suffix = f"({pct}%)"
-        # Reserve space for prefix, suffix, and a minimal bar
-        bar_space = max(10, cols - len(prefix) - len(suffix) - 5)
-        # Build bar
-        filled = 0
-        if total > 0:
-            filled = int(bar_space * done_print / total)
-        bar = "#" * filled + "-" * (bar_space - filled)
-        line = f"\r{prefix}[{bar}] {suffix}"
-        # Show the current file (trim if needed)
-        if current_rel:
-            max_name = max(0, cols - len(line) - 3)
-            name_disp = current_rel if len(current_rel) <= max_name else "…" + current_rel[-(max_name - 1):]
-            line += f" {name_disp}"
-        # Ensure the line doesn't overflow
-        line = line[:cols - 1]
-        sys.stderr.write(line)
-        sys.stderr.flush()
-        if done_print >= total:
-            sys.stderr.write("\n")
-            sys.stderr.flush()
-
-    csv_count = total_csv
-    index_records: List[Dict[str, object]] = []
+    tasks = ((batch_index, process_csv_batch, ((batch, input_root, dedup, skip_irrelevant),))
+             for batch_index, batch in enumerate(batches) if batch_index not in done_batches)
+    failed: List[int] = []
+    try:
+        for batch_index, partial, error in executor.run(tasks):
+            batch = batches[batch_index]
+            if error is not None:
+                if len(batch) > 1:
+                    failed.append(batch_index)
+                    continue
+                partial = error_partial(batch, error)
+            add_batch(batch_index, partial)
+
+        if failed:
+            # Rerun failed batches one file per task; each batch's file partials are merged in file order,
+            # which gives the same partial the batch task would have returned.
+            failed.sort()
+            file_tasks = (((batch_index, pos), process_csv_batch, (([csv_path], input_root, dedup, skip_irrelevant),))
+                          for batch_index in failed for pos, csv_path in enumerate(batches[batch_index]))
+            file_partials: Dict[int, Dict[int, PartialAggregate]] = {batch_index: {} for batch_index in failed}
+            for (batch_index, pos), partial, error in executor.run(file_tasks):
+                batch = batches[batch_index]
+                if error is not None:
+                    partial = error_partial([batch[pos]], error)
+                parts = file_partials[batch_index]
+                parts[pos] = partial
+                if len(parts) == len(batch):
+                    del file_partials[batch_index]
+                    merged = PartialAggregate(dedup)
+                    for i in range(len(batch)):
+                        merged.merge(parts[i])
+                    add_batch(batch_index, merged)
+    except KeyboardInterrupt:
+        if checkpoint is not None:
+            checkpoint.save_reduce_state(done_batches, reducer.nodes())
+            sys.stderr.write(f"\nInterrupted; progress saved to {checkpoint.state_dir} (rerun with --resume)\n")
+        raise
+
+    return reducer.result() or PartialAggregate(dedup)
+
+
+def _write_outputs(merged: PartialAggregate, index_records: List[Dict[str, object]],
+                   hr_series: HrSeries, pace_series: PaceSeries,
+                   paths: Dict[str, str], rollup_paths: Dict[str, str], rollup_resolutions: List[str],
+                   serializer: Serializer, max_hr: float, partitioned_root: Optional[str] = None,
+                   sqlite_path: Optional[str] = None, trends: bool = False) -> List[str]:
+    """Write index, rollup, session and daily outputs; returns the paths whose content changed.
+
+    Every file is written to a temporary sibling and renamed into place, and
+    left untouched when its content is unchanged. With ``partitioned_root``,
+    daily and session records go to monthly partitions under that directory
+    plus a manifest instead of single files. With ``sqlite_path``, daily,
+    session and index records are also loaded into that SQLite database
+    (always reported as written). Weekly and monthly summaries are computed
+    from the daily records; ``trends`` adds rolling trend and baseline fields
+    to the daily records. ``merged`` is consumed (its daily sums are
+    finalized in place).
+    """
+    # Sort time series for range queries
+    hr_series.sort()
+    pace_series.sort()
 
-    if show_progress:
-        _print_progress(0, total_csv)
+    # Auto-detect sessions from live pace series (contiguous movement)
+    sessions_buffer = list(merged.sessions)
+    sessions_buffer.extend(detect_pace_sessions(pace_series, sessions_buffer))
 
-    workers = max(1, int(args.workers))
-    with ProcessPoolExecutor(max_workers=workers) as executor:
-        futures = {}
-        for csv_path in csv_paths:
-            future = executor.submit(process_csv_worker, (csv_path, input_root))
-            futures[future] = os.path.relpath(csv_path, start=input_root)
-        done = 0
-        for future in as_completed(futures):
-            rel = futures[future]
-            try:
-                local_daily, local_sessions, index_record, _rel_path = future.result()
-                # Merge daily aggregates
-                for d, metrics in local_daily.items():
-                    if d not in daily_agg:
-                        daily_agg[d] = {}
-                    for k, v in metrics.items():
-                        daily_agg[d][k] = daily_agg[d].get(k, 0.0) + v
-                # Extend sessions buffer
-                sessions_buffer.extend(local_sessions)
-                # Collect index record
-                index_records.append(index_record)
-            except Exception as e:
-                # Record an error index entry and continue
-                index_records.append({
-                    "path": rel,
-                    "category": categorize_path(os.path.join(input_root, rel)),
-                    "encoding": None,
-                    "columns": [],
-                    "row_count": 0,
-                    "date_column": None,
-                    "date_range": {"min": None, "max": None},
-                    "metric_hits": {},
-                    "errors": [str(e)],
-                })
-            finally:
-                done += 1
-                if show_progress:
-                    _print_progress(done, total_csv, rel)
+    # Enrich buffered sessions using time-series data; clean internal fields and drop Nones
+    session_records = [public_fields(enrich_session(rec, hr_series, pace_series)) for rec in sessions_buffer]
 
-    # Write index records (sorted by path for deterministic output)
-    for index_record in sorted(index_records, key=lambda r: r.get("path", "")):
-        index_f.write(json.dumps(index_record, ensure_ascii=False) + "\n")
-    index_f.close()
+    # Finalize daily aggregated metrics
+    daily_agg = merged.daily
+    contributions_to_agg(merged.contrib, daily_agg)
+    for dkey, hist in series_hr_sketches(hr_series).items():
+        for key, value in hr_daily_fields(hist, max_hr).items():
+            aggregate_value(daily_agg, dkey, key, value)
+    daily_records = finalize_daily(daily_agg)
 
-    # Sort time series per date for efficient window scans
-    for dkey, lst in hr_series.items():
-        lst.sort(key=lambda x: x[0])
-    for dkey, lst in pace_series.items():
-        lst.sort(key=lambda x: x[0])
+    # Intraday rollups: one streaming pass per day, encoded as they are written
+    rollup_days = ({label: [serializer(rec) for rec in records] for label, records in day_rollups.items()}
+                   for day_rollups in iter_rollups(hr_series, pace_series, rollup_resolutions))
+    return _publish_outputs(index_records + merged.index_records, rollup_days, session_records, daily_records,
+                            paths, rollup_paths, rollup_resolutions, serializer, partitioned_root, sqlite_path,
+                            trends)
 
-    # Auto-detect sessions from live pace series (contiguous movement)
-    existing_keys = set()
-    for rec in sessions_buffer:
-        s = rec.get("start")
-        if s:
-            existing_keys.add((s, rec.get("category"), rec.get("source_path")))
 
-    min_duration_min = 10.0
-    gap_allow_sec = 180  # allow up to 3 minutes of inactivity within a session
+def _publish_outputs(index_records: List[Dict[str, object]], rollup_days: Iterable[Dict[str, List[bytes]]],
+                     session_records: List[Dict[str, object]], daily_records: List[Dict[str, object]],
+                     paths: Dict[str, str], rollup_paths: Dict[str, str], rollup_resolutions: List[str],
+                     serializer: Serializer, partitioned_root: Optional[str] = None,
+                     sqlite_path: Optional[str] = None, trends: bool = False) -> List[str]:
+    """Write finished records to the output files (see ``_write_outputs``); returns the paths that changed.
 
-    for dkey, points in pace_series.items():
-        if not points:
-            continue
-        # points are sorted
-        in_session = False
-        sess_start: Optional[dt.datetime] = None
-        last_active: Optional[dt.datetime] = None
-        steps_sum = 0.0
-        dist_mm_sum = 0.0
-        alt_mm_sum = 0.0
-
-        def _flush_session():
-            nonlocal in_session, sess_start, last_active, steps_sum, dist_mm_sum, alt_mm_sum
-            if in_session and sess_start and last_active:
-                duration_min = (last_active - sess_start).total_seconds() / 60.0
-                if duration_min >= min_duration_min:
-                    start_iso = sess_start.isoformat()
-                    key = (start_iso, "Physical Activity_GoogleData", "Physical Activity_GoogleData/live_pace_*.csv")
-                    if key not in existing_keys:
-                        rec_fl = {
-                            "date": sess_start.date().isoformat(),
-                            "start": start_iso,
-                            "end": last_active.isoformat(),
-                            "duration_min": round(duration_min, 3),
-                            "type": "Auto (live pace)",
-                            "steps": round(steps_sum, 3) if steps_sum > 0 else None,
-                            "distance": round(dist_mm_sum / 1_000_000.0, 6) if dist_mm_sum > 0 else None,
-                            "elevation_gain_m": round(alt_mm_sum / 1000.0, 3) if alt_mm_sum > 0 else None,
-                            "category": "Physical Activity_GoogleData",
-                            "source_path": "Physical Activity_GoogleData/live_pace_*.csv",
-                            "_start_dt": sess_start,
-                            "_end_dt": last_active,
-                        }
-                        sessions_buffer.append(rec_fl)
-                        existing_keys.add(key)
-            # reset
-            in_session = False
-            sess_start = None
-            last_active = None
-            steps_sum = 0.0
-            dist_mm_sum = 0.0
-            alt_mm_sum = 0.0
-
-        for ts, steps_v, dist_mm, alt_mm in points:
-            moved = ((steps_v or 0.0) > 0.0) or ((dist_mm or 0.0) > 0.0)
-            if not in_session:
-                if moved:
-                    in_session = True
-                    sess_start = ts
-                    last_active = ts
-                    steps_sum = (steps_v or 0.0)
-                    dist_mm_sum = (dist_mm or 0.0)
-                    alt_mm_sum = (alt_mm or 0.0)
-                else:
-                    # idle, skip
-                    continue
-            else:
-                # we are in a session
-                # Check gap since last_active
-                if last_active and (ts - last_active).total_seconds() > gap_allow_sec:
-                    # too long gap -> end the current session and possibly start a new one
-                    _flush_session()
-                    if moved:
-                        in_session = True
-                        sess_start = ts
-                        last_active = ts
-                        steps_sum = (steps_v or 0.0)
-                        dist_mm_sum = (dist_mm or 0.0)
-                        alt_mm_sum = (alt_mm or 0.0)
-                    else:
-                        in_session = False
-                        sess_start = None
-                        last_active = None
-                        steps_sum = 0.0
-                        dist_mm_sum = 0.0
-                        alt_mm_sum = 0.0
-                else:
-                    # within the allowed gap window
-                    if moved:
-                        last_active = ts
-                        steps_sum += (steps_v or 0.0)
-                        dist_mm_sum += (dist_mm or 0.0)
-                        alt_mm_sum += (alt_mm or 0.0)
-                    # else keep the session open within an allowed gap
-        # End of day: flush any pending session
-        _flush_session()
-
-    # Enrich buffered sessions using time-series data
-    with open(sessions_out_path, "w", encoding="utf-8") as sessions_f:
-        for rec in sessions_buffer:
-            start_dt = rec.get("_start_dt")
-            end_dt = rec.get("_end_dt")
-            # Only enrich when we have a valid window
-            if isinstance(start_dt, dt.datetime) and isinstance(end_dt, dt.datetime) and end_dt >= start_dt:
-                # Collect candidate dates (handle potential cross-midnight)
-                date_keys = {start_dt.date().isoformat(), end_dt.date().isoformat()}
-
-                # Heart rate enrichment
-                hr_values: List[float] = []
-                for dkey in date_keys:
-                    for ts, bpm in hr_series.get(dkey, []):
-                        if start_dt <= ts <= end_dt:
-                            hr_values.append(bpm)
-                if hr_values:
-                    if rec.get("avg_hr") is None and len(hr_values) > 0:
-                        rec["avg_hr"] = round(sum(hr_values) / float(len(hr_values)), 3)
-                    if rec.get("max_hr") is None:
-                        rec["max_hr"] = max(hr_values)
-
-                # Live pace enrichment (steps, distance, altitude gain)
-                steps_sum = 0.0
-                dist_mm_sum = 0.0
-                alt_mm_sum = 0.0
-                any_pace_points = False
-                for dkey in date_keys:
-                    for ts, steps_v, dist_mm, alt_mm in pace_series.get(dkey, []):
-                        if start_dt <= ts <= end_dt:
-                            any_pace_points = True
-                            if steps_v is not None:
-                                steps_sum += steps_v
-                            if dist_mm is not None:
-                                dist_mm_sum += dist_mm
-                            if alt_mm is not None:
-                                alt_mm_sum += alt_mm
-                if any_pace_points:
-                    # Backfill steps if missing
-                    if rec.get("steps") is None and steps_sum > 0:
-                        rec["steps"] = round(steps_sum, 3)
-                    # Backfill distance if missing (km from millimeters)
-                    if rec.get("distance") is None and dist_mm_sum > 0:
-                        rec["distance"] = round(dist_mm_sum / 1_000_000.0, 6)  # km
-                    # Backfill elevation gain if missing (meters from millimeters)
-                    if rec.get("elevation_gain_m") is None and alt_mm_sum > 0:
-                        rec["elevation_gain_m"] = round(alt_mm_sum / 1000.0, 3)
-
-            # Clean internal fields and drop Nones
-            rec.pop("_start_dt", None)
-            rec.pop("_end_dt", None)
-            rec = {k: v for k, v in rec.items() if v is not None}
-            sessions_f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+    ``rollup_days`` yields, per day in date order, each resolution's encoded
+    rollup lines. ``daily_records`` are plain daily records; with ``trends``
+    their rolling fields are added in place.
+    """
+    written: List[str] = []
 
-    # Finalize daily aggregated metrics
-    daily_records = finalize_daily(daily_agg)
-    with open(daily_out_path, "w", encoding="utf-8") as df:
-        for rec in daily_records:
-            df.write(json.dumps(rec, ensure_ascii=False) + "\n")
+    # Write index records (sorted by path for deterministic output)
+    if _write_index_records(paths["files_index"], index_records, serializer):
+        written.append(paths["files_index"])
 
-    # README
-    readme = f"""
+    # Intraday rollups: one output file per resolution
+    if rollup_resolutions:
+        rollup_writers = {label: JsonlWriter(rollup_paths[label], serializer, atomic=True)
+                          for label in rollup_resolutions}
+        try:
+            for day_lines in rollup_days:
+                for label, lines in day_lines.items():
+                    writer = rollup_writers[label]
+                    for line in lines:
+                        writer.write_encoded(line)
+        except BaseException:
+            for writer in rollup_writers.values():
+                writer.abort()
+            raise
+        for label in rollup_resolutions:
+            rollup_writers[label].close()
+            if rollup_writers[label].changed:
+                written.append(rollup_paths[label])
+
+    partitions: Dict[str, List[Dict[str, object]]] = {}
+    if partitioned_root is not None:
+        partitions["fitbit_activity_sessions"], changed = write_partitions(
+            partitioned_root, "fitbit_activity_sessions", session_records, serializer)
+        written.extend(changed)
+    else:
+        with JsonlWriter(paths["sessions"], serializer, atomic=True) as sessions_f:
+            sessions_f.write_many(session_records)
+        if sessions_f.changed:
+            written.append(paths["sessions"])
+
+    # Calendar summaries of the plain daily values, then the rolling fields on the daily records
+    for period in SUMMARY_PERIODS:
+        with JsonlWriter(paths[period], serializer, atomic=True) as summary_f:
+            summary_f.write_many(period_summaries(daily_records, period))
+        if summary_f.changed:
+            written.append(paths[period])
+    if trends:
+        add_trend_fields(daily_records)
+    if partitioned_root is not None:
+        partitions["fitbit_daily_distilled"], changed = write_partitions(
+            partitioned_root, "fitbit_daily_distilled", daily_records, serializer)
+        written.extend(changed)
+        manifest_path = write_manifest(partitioned_root, partitions)
+        if manifest_path:
+            written.append(manifest_path)
+        # Only one layout is kept, so readers never see both
+        for path in (paths["sessions"], paths["daily"]):
+            if os.path.isfile(path):
+                os.remove(path)
+                written.append(path)
+    else:
+        with JsonlWriter(paths["daily"], serializer, atomic=True) as df:
+            df.write_many(daily_records)
+        if df.changed:
+            written.append(paths["daily"])
+        written.extend(remove_partitions(os.path.dirname(paths["daily"]),
+                                         ("fitbit_activity_sessions", "fitbit_daily_distilled")))
+
+    if sqlite_path is not None:
+        write_sqlite(sqlite_path, daily_records, session_records,
+                     sorted(index_records, key=lambda r: r.get("path", "")))
+        written.append(sqlite_path)
+    return written
+
+
+def _write_readme(readme_path: str) -> None:
+    readme = """
 Fitbit distilled outputs
 ========================
 
@@ -595,12 +469,57 @@ Files:
 - fitbit_daily_distilled.jsonl: one JSON object per line with aggregated daily metrics.
 - fitbit_activity_sessions.jsonl: one JSON object per line with per-workout session details (type, start/end, duration, calories, distance, steps, HR stats, AZM splits) and source metadata.
 - fitbit_files_index.jsonl: one JSON object per CSV file with basic metadata and detected metrics.
+- fitbit_weekly_summary.jsonl, fitbit_monthly_summary.jsonl: one JSON object per calendar week (ISO, Monday to Sunday) or month with data, summarizing the daily records.
+- fitbit_intraday_<resolution>.jsonl (resolution: 1min, 15min, 1h, 1d): heart rate and live pace rollups per time bucket, built from the intraday heart_rate_*/live_pace_* series. Select resolutions with --rollups (e.g. --rollups 1h,1d) or disable with --rollups none.
 
 Usage:
     python3 distill_fitbit.py --input Fitbit --output distilled --workers $(python3 -c 'import os;print(os.cpu_count() or 1)')
 
+Audit-only runs:
+    python3 distill_fitbit.py --input Fitbit --output distilled --index-only
+  writes only fitbit_files_index.jsonl. Row counts come from a buffered newline count and date ranges from the first and last rows (verified against a sample of rows; unordered files fall back to scanning the date column). metric_hits is left empty and date_range_method records how the range was obtained.
+
+Watch mode:
+    python3 distill_fitbit.py --input Fitbit --output distilled --watch
+  processes everything once, then polls --input every --poll-interval seconds (default 2). New or changed CSVs are re-processed once their size and mtime are stable across two polls; removed CSVs are dropped. Results are kept per file, so an update only parses the affected files, and only the daily records, intraday rollups, merged time series and sessions of the dates those files touch are recomputed. Every output is written to a temporary file and renamed into place, and a file is only replaced when its content changed. --watch cannot be combined with --index-only or --skip-covered. Stop with Ctrl-C.
+
+Partitioned layout:
+    python3 distill_fitbit.py --input Fitbit --output distilled --partitioned
+  writes daily and session records as monthly partitions instead of the two single files:
+    fitbit_daily_distilled/year=YYYY/month=MM/part.jsonl
+    fitbit_activity_sessions/year=YYYY/month=MM/part.jsonl
+  Records are partitioned by their date field (sessions without a date go to year=unknown/month=unknown). Each partition is written to a temporary file and renamed into place only when its content changed, and partitions left without records are removed, so syncing the output directory only moves the months that changed. fitbit_manifest.json lists every partition with its record count, size and sha256. A --partitioned run removes fitbit_daily_distilled.jsonl and fitbit_activity_sessions.jsonl from the output directory, and a run without it removes the manifest and partitions, so only one layout is ever present.
+
+Query server:
+    python3 distill_fitbit.py --output distilled --serve [--host 127.0.0.1] [--port 8765]
+  serves the existing outputs over HTTP (add --watch to keep processing --input and serve the live results). Daily and session records are loaded once into date-sorted in-memory tables (from the partitions listed in fitbit_manifest.json when it exists, else from the single files; a run writes one layout and removes the other), and responses go through an LRU cache. The output files are checked for changes at most every 0.5 s; a change reloads the tables and empties the cache.
+  GET /daily?from=YYYY-MM-DD&to=YYYY-MM-DD&fields=steps,calories
+  GET /sessions?from=YYYY-MM-DD&to=YYYY-MM-DD&type=walk
+  from/to are inclusive and optional; fields limits the daily fields returned (date is always included); type matches the session type case-insensitively. Responses are {"count": N, "records": [...]} in the canonical JSON format (whatever --json-format the outputs were written with); invalid parameters get HTTP 400.
+
+SQLite output:
+    python3 distill_fitbit.py --input Fitbit --output distilled --sqlite distilled/fitbit.db
+  also loads the records into a SQLite database (the JSONL outputs are written as usual; works with --watch and --partitioned):
+    daily     one row per date (primary key), one REAL column per daily metric
+    sessions  one row per session, indexed on date, start, end and type
+    files     one row per files index entry (path primary key; columns, metric_hits and errors as JSON text; date_range as date_min/date_max)
+  Fields without a column of their own are kept in each table's extra column as a JSON object. The database uses WAL mode and every run replaces the table contents in a single transaction, so readers never see a half-written state. When the table layout changes (e.g. a new daily metric), the tables are dropped and recreated on the next run. Example:
+    sqlite3 distilled/fitbit.db "SELECT strftime('%Y-%m', date) AS month, SUM(steps) FROM daily GROUP BY month"
+    sqlite3 distilled/fitbit.db "SELECT * FROM sessions WHERE start >= '2024-03-01' AND type = 'Walk'"
+
+Checkpoint and resume:
+    python3 distill_fitbit.py --input Fitbit --output distilled --checkpoint
+  saves the run's progress (completed batches and the merged results so far) to <output>/.distill_state every --checkpoint-interval seconds (default 60; 0 disables it) and on Ctrl-C. The pre-scanned time series are written with the first save, once; a run that finishes before its first save writes nothing but the small plan file. Runs without --checkpoint (the default) write no state. After an interruption (Ctrl-C, OOM, a preempted machine),
+    python3 distill_fitbit.py --input Fitbit --output distilled --resume
+  skips the batches already merged and continues with the rest; the outputs are identical to an uninterrupted run. A checkpoint only applies to the same CSV files (paths, sizes and mtimes), --batch-size, --no-dedup and --skip-irrelevant; otherwise --resume starts from the beginning. --state-dir puts the checkpoint elsewhere. The state directory is removed once a run completes.
+
+JSON output:
+- By default every line is json.dumps(record, ensure_ascii=False), exactly as earlier versions wrote it.
+- --json-format canonical writes compact JSON (no spaces after ',' and ':', UTF-8, keys in insertion order). The canonical bytes are the same whichever encoder produces them (floats are written as orjson writes them, e.g. 5e-6 and 1e16, with NaN and infinities as null); --json-backend auto (the default) uses orjson when it is installed and the stdlib otherwise.
+- scripts/bench_serializers.py compares the available backends.
+
 Progress:
-- A live console progress bar is shown while processing CSV files (on TTY only).
+- A live console progress bar is shown while processing CSV files (on TTY only), redrawn at most 10 times per second.
 - Use --no-progress to disable the progress bar.
 
 Daily schema (fields present if detected in your data):
@@ -628,6 +547,8 @@ Daily schema (fields present if detected in your data):
 - sedentary_minutes
 - workout_minutes (sum of durations from detected sessions)
 - workout_count (count of detected sessions)
+- hr_p50, hr_p95 (median and 95th percentile bpm from the merged heart_rate_* series; a timestamp held by several files, e.g. overlapping legacy and GoogleData exports, counts once, and readings outside 30-220 bpm are ignored)
+- hr_zone_fat_burn_minutes, hr_zone_cardio_minutes, hr_zone_peak_minutes (time at 50-70%, 70-85% and 85%+ of --max-hr; each sample counts until the next one, at most 60 s)
 
 Sessions schema (fields present if detected):
 - date (YYYY-MM-DD)
@@ -639,20 +560,348 @@ Sessions schema (fields present if detected):
 - azm_minutes, azm_fat_burn_minutes, azm_cardio_minutes, azm_peak_minutes
 - category (top-level Fitbit folder), source_path (relative path in export)
 
+Weekly/monthly summary schema:
+- period (week or month), label (e.g. 2024-W05 or 2024-01), start, end (YYYY-MM-DD), days (days with a daily record)
+- summed metrics (steps, calories, workout_minutes, ...): <metric> (period total) and <metric>_per_day (mean over the days that have it)
+- averaged metrics (resting_heart_rate, hrv_ms, sleep_score, ...): <metric> (mean of the daily values), <metric>_min, <metric>_max
+
+Trend fields on daily records (with --trends; only for metrics present that day):
+- <metric>_avg_7d, <metric>_avg_28d for every metric (mean over the days with a value), plus <metric>_sum_7d, <metric>_sum_28d (window total) for summed metrics: over the trailing 7/28 calendar days including the day itself (days without the metric are skipped, not counted as zero)
+- for resting_heart_rate, hrv_ms, spo2_percent, sleep_duration_min, sleep_score, readiness_score, stress_score and skin_temp_variation: <metric>_baseline_30d (mean over the previous 30 days, excluding the day itself), <metric>_delta_30d (the day's value minus that baseline), <metric>_min_30d and <metric>_max_30d; present once at least 7 of those days have a value
+  With --sqlite these fields are stored in the daily table's extra column.
+
+Intraday rollup schema (fields present if the bucket has samples):
+- date (YYYY-MM-DD), start (ISO8601 bucket start), resolution
+- hr_count, hr_min, hr_max, hr_mean, hr_p50, hr_p95 (percentiles over whole bpm)
+- steps, distance (km) from live pace samples
+
 Notes:
 - Values that occur multiple times per day are summed by default. Certain metrics (resting_heart_rate, hrv_ms, spo2_percent, sleep_score, readiness_score, stress_score, skin_temp_variation) are averaged across entries.
 - workout_* fields are derived from per-session extraction when recognizable activity session files are present.
-- The files index helps audit which files contributed to which metrics.
+- Overlapping export files (e.g. legacy and GoogleData variants of the same metric) are deduplicated by (metric, timestamp, value source) before summing; sessions are deduplicated by start time and type, together with the metric columns of their rows (so a session repeated within one file also counts once). Use --no-dedup to sum every row as-is.
+- With --skip-covered, files whose date range and columns are fully covered by another file with at least as many rows per day (per the previous run's files index, or a raw-byte pre-pass for new or changed files) are not parsed; their index entry carries covered_by. Only files with date-only values (date_precision "date" in the files index) are compared, since a day range does not show which hours of an intraday file's first and last day are present.
+- Workers process files in batches (--batch-size) and batch results are merged in a fixed tree, so outputs are identical regardless of worker count or completion order.
+- Only --tasks-per-worker tasks per worker (default 2) are queued at a time; more are submitted as results are merged, so memory stays flat on exports with tens of thousands of files. --task-timeout N fails a task that runs longer than N seconds (its worker processes are replaced); a task whose worker process dies is rerun once on its own before it counts as failed. The files of a failed batch are then rerun one file per task, so only the file that timed out or killed its worker gets an error entry in the files index. --max-tasks-per-child N replaces the worker processes after about N tasks each.
+- The files index helps audit which files contributed to which metrics. Each entry carries file_class (metric, session, timeseries or irrelevant), decided from the header line alone; irrelevant files are never row-parsed and their row_count is a raw newline count. Use --skip-irrelevant to leave them out of the index. Row-parsed files also record the extractor that handled them (heart_rate, steps, calories, resting_heart_rate, live_pace, sleep, exercise, or generic for everything else).
 - If some metrics are missing, it may be due to header names not matching built-in heuristics. You can extend METRIC_MAP in the script to add more header fragments.
 """.strip()
-    with open(readme_path, "w", encoding="utf-8") as rf:
-        rf.write(readme + "\n")
+    write_text_atomic(readme_path, readme + "\n")
+
+
+def _process_files(executor: WindowedExecutor, csv_paths: List[str], input_root: str, dedup: bool,
+                   skip_irrelevant: bool, file_partials: Dict[str, PartialAggregate],
+                   file_series: Dict[str, Tuple[HrSeries, PaceSeries]],
+                   show_progress: bool) -> None:
+    """--watch: process files one task each into ``file_partials`` and ``file_series``, keyed by path."""
+    progress = _Progress(len(csv_paths), enabled=show_progress)
+    progress.update(0)
+    tasks = []
+    for csv_path in csv_paths:
+        tasks.append((("partial", csv_path), process_csv_batch, (([csv_path], input_root, dedup, skip_irrelevant),)))
+        tasks.append((("series", csv_path), scan_series_file, (csv_path,)))
+    done = 0
+    for (kind, csv_path), result, error in executor.run(tasks):
+        rel = os.path.relpath(csv_path, start=input_root)
+        if kind == "series":
+            # Same as the batch pre-scan: unreadable series are left out
+            file_series[csv_path] = result if error is None else (HrSeries(), PaceSeries())
+            continue
+        partial = result
+        if error is not None:
+            partial = PartialAggregate(dedup)
+            partial.index_records.append(_error_index_record(rel, input_root, error))
+        file_partials[csv_path] = partial
+        done += 1
+        progress.update(done, rel)
+
+
+def _watch(args, input_root: str, output_root: str, paths: Dict[str, str], rollup_paths: Dict[str, str],
+           rollup_resolutions: List[str], serializer: Serializer, show_progress: bool) -> None:
+    """--watch: keep per-file results and rewrite the outputs whenever CSVs are added, changed or removed.
+
+    Only the dates and days that a change touches are recomputed (see ``WatchState``).
+    """
+    dedup = not args.no_dedup
+    interval = max(0.1, float(args.poll_interval))
+    partitioned_root = output_root if args.partitioned else None
+    sqlite_path = args.sqlite
+    known = snapshot_csv_files(input_root)
+    state = WatchState(dedup, args.max_hr, rollup_resolutions, serializer)
+
+    def write() -> List[str]:
+        return _publish_outputs(state.index_records(), state.rollup_days(), state.session_records,
+                                state.daily_records(), paths, rollup_paths, rollup_resolutions, serializer,
+                                partitioned_root, sqlite_path, args.trends)
+
+    # One pool for the lifetime of the watcher, so updates do not pay for process start-up
+    with _make_executor(args) as executor:
+        file_partials: Dict[str, PartialAggregate] = {}
+        file_series: Dict[str, Tuple[HrSeries, PaceSeries]] = {}
+        _process_files(executor, sorted(known), input_root, dedup, args.skip_irrelevant,
+                       file_partials, file_series, show_progress)
+        state.update(file_partials, file_series)
+        write()
+        print(f"Processed {len(known)} CSV files. Watching {os.path.abspath(input_root)} "
+              f"(every {interval:g}s, Ctrl-C to stop)", flush=True)
+
+        poller = DirectoryPoller(input_root, known)
+        try:
+            while True:
+                time.sleep(interval)
+                changed, removed = poller.poll()
+                if not changed and not removed:
+                    continue
+                started = time.monotonic()
+                file_partials = {}
+                file_series = {}
+                _process_files(executor, changed, input_root, dedup, args.skip_irrelevant,
+                               file_partials, file_series, False)
+                state.update(file_partials, file_series, removed)
+                written = write()
+                print(f"{dt.datetime.now().isoformat(timespec='seconds')} "
+                      f"{len(changed)} changed, {len(removed)} removed; "
+                      f"rewrote {len(written)} output file(s) in {time.monotonic() - started:.2f}s"
+                      + "".join(f"\n  {os.path.relpath(p, start=output_root)}" for p in written), flush=True)
+        except KeyboardInterrupt:
+            print("Stopped watching.", flush=True)
+
+
+def _serve(output_root: str, host: str, port: int) -> None:
+    """--serve: answer /daily and /sessions queries until interrupted."""
+    server = make_server(output_root, host, port)
+    print(f"Serving {os.path.abspath(output_root)} on http://{host}:{server.server_address[1]}/ "
+          f"(/daily?from=&to=&fields=, /sessions?from=&to=&type=; Ctrl-C to stop)", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("Stopped serving.", flush=True)
+    finally:
+        server.server_close()
 
+
+def main():
+    parser = argparse.ArgumentParser(description="Distill Fitbit CSV export into AI-consumable JSONL")
+    parser.add_argument("--input", default="Fitbit", help="Path to Fitbit export root directory")
+    parser.add_argument("--output", default="distilled", help="Path to output directory")
+    parser.add_argument("--no-progress", action="store_true", help="Disable console progress bar output")
+    parser.add_argument("--workers", type=int, default=(os.cpu_count() or 1),
+                        help="Number of parallel worker processes (default: CPU count)")
+    # Allow forcing progress output even if stderr is not a TTY (e.g., some IDE consoles)
+    parser.add_argument("--force-progress", action="store_true", help="Show progress even if stderr is not a TTY")
+    parser.add_argument("--batch-size", type=int, default=8,
+                        help="Number of CSV files each worker task processes and pre-merges (default: 8)")
+    parser.add_argument("--tasks-per-worker", type=int, default=DEFAULT_TASKS_PER_WORKER,
+                        help="Tasks kept in flight per worker; more are submitted as results are merged "
+                             f"(default: {DEFAULT_TASKS_PER_WORKER})")
+    parser.add_argument("--task-timeout", type=float, default=0,
+                        help="Fail a task (recorded as an error in the files index) after this many seconds "
+                             "of running; 0 means no limit (default: 0)")
+    parser.add_argument("--max-tasks-per-child", type=int, default=0,
+                        help="Replace the worker processes after about this many tasks each; 0 keeps them "
+                             "for the whole run (default: 0)")
+    parser.add_argument("--json-format", choices=JSON_FORMATS, default="default",
+                        help="'default' keeps json.dumps spacing; 'canonical' writes compact JSON")
+    parser.add_argument("--json-backend", choices=JSON_BACKENDS, default="auto",
+                        help="JSON encoder: orjson (canonical format only), stdlib, or auto (orjson if installed)")
+    parser.add_argument("--rollups", default=",".join(ROLLUP_RESOLUTIONS),
+                        help="Comma-separated intraday rollup resolutions to write "
+                             f"({', '.join(ROLLUP_RESOLUTIONS)}), or 'none' (default: all)")
+    parser.add_argument("--max-hr", type=float, default=DEFAULT_MAX_HR,
+                        help=f"Max heart rate used for daily HR zone minutes (default: {DEFAULT_MAX_HR})")
+    parser.add_argument("--trends", action="store_true",
+                        help="Add rolling 7/28-day trend fields and 30-day baseline fields to daily records")
+    parser.add_argument("--no-dedup", action="store_true",
+                        help="Sum every row as-is instead of deduplicating overlapping export files")
+    parser.add_argument("--skip-covered", action="store_true",
+                        help="Skip files whose date range and columns are fully covered by another file "
+                             "(planned from the previous run's files index or a raw-byte pre-pass)")
+    parser.add_argument("--index-only", action="store_true",
+                        help="Only write the files index, computing row counts and date ranges from raw bytes")
+    parser.add_argument("--skip-irrelevant", action="store_true",
+                        help="Leave files with no metric, session or date columns out of the files index")
+    parser.add_argument("--partitioned", action="store_true",
+                        help="Write daily and session records as monthly partitions (year=YYYY/month=MM/) "
+                             f"with a {MANIFEST_NAME} listing their checksums")
+    parser.add_argument("--sqlite", metavar="PATH",
+                        help="Also load daily metrics, sessions and the files index into this SQLite database "
+                             "(indexed tables, rewritten in one transaction)")
+    parser.add_argument("--checkpoint", action="store_true",
+                        help="Save progress to --state-dir every --checkpoint-interval seconds and on Ctrl-C, "
+                             "so an interrupted run can be continued with --resume")
+    parser.add_argument("--resume", action="store_true",
+                        help="Continue an interrupted --checkpoint run from its checkpoint in --state-dir (starts "
+                             "afresh if the input files or options changed); keeps checkpointing")
+    parser.add_argument("--state-dir", metavar="PATH",
+                        help=f"Checkpoint directory (default: <output>/{DEFAULT_STATE_DIR_NAME}); removed after a "
+                             "completed run")
+    parser.add_argument("--checkpoint-interval", type=float, default=DEFAULT_CHECKPOINT_INTERVAL_SEC,
+                        help="Seconds between --checkpoint saves of merged progress, 0 to disable "
+                             f"(default: {DEFAULT_CHECKPOINT_INTERVAL_SEC:g})")
+    parser.add_argument("--watch", action="store_true",
+                        help="Keep running: poll --input and update the outputs when CSVs are added, changed or removed")
+    parser.add_argument("--poll-interval", type=float, default=DEFAULT_POLL_INTERVAL_SEC,
+                        help=f"Seconds between --watch polls (default: {DEFAULT_POLL_INTERVAL_SEC:g})")
+    parser.add_argument("--serve", action="store_true",
+                        help="Serve /daily and /sessions queries over HTTP from the outputs in --output "
+                             "(alone: serve existing outputs; with --watch: serve while updating them)")
+    parser.add_argument("--host", default=DEFAULT_HOST, help=f"--serve bind address (default: {DEFAULT_HOST})")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"--serve port (default: {DEFAULT_PORT})")
+    args = parser.parse_args()
+
+    if args.serve and (args.index_only or args.skip_covered):
+        parser.error("--serve cannot be combined with --index-only or --skip-covered")
+    if args.watch and (args.index_only or args.skip_covered):
+        parser.error("--watch cannot be combined with --index-only or --skip-covered")
+    if (args.resume or args.checkpoint) and (args.watch or args.serve or args.index_only):
+        parser.error("--checkpoint and --resume cannot be combined with --watch, --serve or --index-only")
+    if args.resume and args.checkpoint_interval <= 0:
+        parser.error("--resume needs checkpoints (--checkpoint-interval > 0)")
+    if args.state_dir and not (args.checkpoint or args.resume):
+        parser.error("--state-dir needs --checkpoint or --resume")
+    if args.sqlite and (args.index_only or (args.serve and not args.watch)):
+        parser.error("--sqlite needs a processing run (not --index-only, or --serve without --watch)")
+
+    # Ensure argparse values are typed as str for path operations
+    input_root: str = str(args.input)
+    output_root: str = str(args.output)
+    ensure_dir(output_root)
+
+    # Progress display control
+    try:
+        stderr_isatty = sys.stderr.isatty()
+    except Exception:
+        stderr_isatty = False
+    show_progress = (not args.no_progress) and (stderr_isatty or args.force_progress)
+
+    paths, rollup_paths = _output_paths(output_root)
+    files_index_path = paths["files_index"]
+
+    dedup = not args.no_dedup
+
+    try:
+        serializer = get_serializer(args.json_backend, args.json_format)
+        rollup_resolutions = [] if args.rollups.strip().lower() == "none" else parse_resolutions(args.rollups)
+    except ValueError as e:
+        parser.error(str(e))
+
+    if args.serve and not args.watch:
+        _serve(output_root, args.host, args.port)
+        return
+
+    if args.watch:
+        _write_readme(paths["readme"])
+        if args.serve:
+            # Queries are answered from the files the watcher rewrites; the store reloads on change
+            server = make_server(output_root, args.host, args.port)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            print(f"Serving http://{args.host}:{server.server_address[1]}/daily and /sessions", flush=True)
+        _watch(args, input_root, output_root, paths, rollup_paths, rollup_resolutions, serializer, show_progress)
+        return
+
+    # Files index of the previous run, used to plan which files can be skipped
+    prior_index: Dict[str, Dict[str, object]] = {}
+    if args.skip_covered and os.path.isfile(files_index_path):
+        with open(files_index_path, "r", encoding="utf-8") as pf:
+            for line in pf:
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    continue
+                if isinstance(rec, dict) and rec.get("path") and not rec.get("covered_by"):
+                    prior_index[str(rec["path"])] = rec
+
+    # Stable order so batches (and therefore merge order) are reproducible
+    csv_paths = find_csv_files(input_root)
+    csv_count = len(csv_paths)
+
+    index_records: List[Dict[str, object]] = []
+
+    # Drop files fully covered by another file. Prior index entries are trusted while the file size
+    # still matches; other files get a raw-byte index record.
+    if args.skip_covered:
+        planning: Dict[str, Dict[str, object]] = {}
+        for csv_path in csv_paths:
+            rel = os.path.relpath(csv_path, start=input_root)
+            rec = prior_index.get(rel)
+            if rec is None or rec.get("size_bytes") != os.path.getsize(csv_path) or "date_precision" not in rec:
+                rec = fast_index_record(csv_path, input_root)
+            planning[rel] = rec
+        covered = find_covered_files(planning.values())
+        if covered:
+            for rel, by in sorted(covered.items()):
+                skipped = dict(planning[rel])
+                skipped["covered_by"] = by
+                index_records.append(skipped)
+            csv_paths = [p for p in csv_paths if os.path.relpath(p, start=input_root) not in covered]
+
+    if args.index_only:
+        with _make_executor(args) as executor:
+            _write_fast_index(csv_paths, input_root, files_index_path, index_records,
+                              executor, show_progress, args.skip_irrelevant, serializer)
+        print(f"Indexed {csv_count} CSV files.\n"
+              f"Wrote: {os.path.abspath(files_index_path)}")
+        return
+
+    batch_size = max(1, int(args.batch_size))
+    batches = [csv_paths[i:i + batch_size] for i in range(0, len(csv_paths), batch_size)]
+
+    # Checkpoints are only resumed for the same batches of unchanged files and the same options
+    checkpoint: Optional[RunCheckpoint] = None
+    resuming = False
+    if (args.checkpoint or args.resume) and args.checkpoint_interval > 0:
+        state_dir = str(args.state_dir or os.path.join(output_root, DEFAULT_STATE_DIR_NAME))
+        checkpoint = RunCheckpoint(state_dir, make_plan(input_root, batches, {
+            "dedup": dedup, "skip_irrelevant": bool(args.skip_irrelevant)}))
+        resuming = args.resume and checkpoint.matches()
+        if args.resume and not resuming:
+            sys.stderr.write(f"No checkpoint for these input files and options in {state_dir}; starting from the "
+                             "beginning.\n")
+        if not resuming:
+            try:
+                checkpoint.start()
+            except ValueError as e:
+                parser.error(str(e))
+
+    # Pre-scan heart rate and live pace series for enrichment and auto session detection
+    # This pass is lightweight and avoids changing worker return types.
+    series = checkpoint.load_series() if resuming else None
+    if series is None:
+        if not args.no_progress:
+            try:
+                sys.stderr.write("Pre-scanning time series (heart rate / live pace)...\n")
+                sys.stderr.flush()
+            except Exception:
+                pass
+        series = _load_series(csv_paths, show_progress)
+        if checkpoint is not None:
+            checkpoint.set_series(series)
+    hr_series, pace_series = series
+
+    with _make_executor(args) as executor:
+        merged = _run_batches(batches, input_root, executor, dedup, args.skip_irrelevant,
+                              show_progress, checkpoint, resuming, args.checkpoint_interval)
+
+    _write_outputs(merged, index_records, hr_series, pace_series, paths, rollup_paths, rollup_resolutions,
+                   serializer, args.max_hr, output_root if args.partitioned else None, args.sqlite, args.trends)
+    _write_readme(paths["readme"])
+    if checkpoint is not None:
+        checkpoint.clear()
+
+    if args.partitioned:
+        record_outputs = [os.path.join(output_root, "fitbit_daily_distilled", ""),
+                          os.path.join(output_root, "fitbit_activity_sessions", ""),
+                          os.path.join(output_root, MANIFEST_NAME)]
+    else:
+        record_outputs = [paths["daily"], paths["sessions"]]
+    if args.sqlite:
+        record_outputs.append(args.sqlite)
     print(f"Processed {csv_count} CSV files.\n" 
-          f"Wrote: {os.path.abspath(daily_out_path)}\n"
-          f"       {os.path.abspath(sessions_out_path)}\n"
-          f"       {os.path.abspath(files_index_path)}\n"
-          f"       {os.path.abspath(readme_path)}")
+          f"Wrote: {os.path.abspath(record_outputs[0])}\n"
+          + "".join(f"       {os.path.abspath(p)}\n" for p in record_outputs[1:])
+          + f"       {os.path.abspath(files_index_path)}\n"
+          + "".join(f"       {os.path.abspath(paths[period])}\n" for period in SUMMARY_PERIODS)
+          + "".join(f"       {os.path.abspath(rollup_paths[label])}\n" for label in rollup_resolutions)
+          + f"       {os.path.abspath(paths['readme'])}")
 
 
 if __name__ == "__main__":
@@ -1,4 +1,18 @@
-from .constants import DATE_COL_CANDIDATES, METRIC_MAP, AVERAGE_PREFERENCE, SUM_PREFERENCE
+from .constants import (
+    DATE_COL_CANDIDATES,
+    METRIC_MAP,
+    AVERAGE_PREFERENCE,
+    SUM_PREFERENCE,
+    HR_MIN_BPM,
+    HR_MAX_BPM,
+    HR_MAX_SAMPLE_GAP_SEC,
+    DEFAULT_MAX_HR,
+    HR_ZONES,
+    TREND_WINDOWS_DAYS,
+    BASELINE_METRICS,
+    BASELINE_WINDOW_DAYS,
+    BASELINE_MIN_DAYS,
+)
 from .utils import (
     normalize_whitespace,
     to_float,
@@ -8,21 +22,182 @@ from .utils import (
     first_value,
     num_value,
     ensure_dir,
+    temp_path_for,
+    replace_if_changed,
+    write_bytes_atomic,
+    write_text_atomic,
+)
+from .csv_reader import (
+    CsvFormat,
+    detect_encoding,
+    count_delimiter,
+    detect_delimiter,
+    detect_csv_format,
+    read_csv_stream,
+    count_data_rows,
+)
+from .heuristics import (
+    infer_date_column,
+    categorize_path,
+    match_metric_key,
+    is_session_headers,
+    classify_headers,
+    FILE_CLASSES,
+)
+from .aggregation import (
+    SUMMARY_PERIODS,
+    aggregate_value,
+    finalize_daily,
+    SlidingWindow,
+    add_trend_fields,
+    period_summaries,
+)
+from .fast_index import fast_index_record
+from .extractors import (
+    FileContext,
+    Extractor,
+    ExtractorRegistry,
+    REGISTRY,
+    GENERIC_EXTRACTOR,
+    SessionColumns,
+    register_extractor,
+    run_extractor,
+)
+from .reduction import PartialAggregate, TreeReducer
+from .rollups import ROLLUP_RESOLUTIONS, RollupBucket, rollup_day, iter_rollups, parse_resolutions
+from .sketches import HrHistogram, hr_day_sketch, series_hr_sketches, hr_daily_fields
+from .series import SERIES_EPOCH, HrSeries, PaceSeries, epoch_seconds, scan_series_file
+from .sessions import (
+    AUTO_SESSION_MIN_DURATION_MIN,
+    AUTO_SESSION_GAP_ALLOW_SEC,
+    detect_pace_sessions,
+    enrich_session,
+)
+from .partitions import (
+    PARTITION_FILE,
+    PARTITION_LAYOUT,
+    UNKNOWN_PARTITION,
+    MANIFEST_NAME,
+    partition_of,
+    partition_relpath,
+    write_partitions,
+    write_manifest,
+    remove_partitions,
+)
+from .server import (
+    DEFAULT_HOST,
+    DEFAULT_PORT,
+    DEFAULT_CACHE_ENTRIES,
+    QueryError,
+    LruCache,
+    DistilledStore,
+    QueryService,
+    make_handler,
+    make_server,
+)
+from .watch import (
+    DEFAULT_POLL_INTERVAL_SEC,
+    FileSignature,
+    DirectoryPoller,
+    find_csv_files,
+    snapshot_csv_files,
+)
+from .incremental import WatchState
+from .sqlite_store import (
+    SQLITE_SCHEMA_VERSION,
+    SQLITE_BATCH_ROWS,
+    DAILY_COLUMNS,
+    SESSION_COLUMNS,
+    FILES_COLUMNS,
+    write_sqlite,
+)
+from .checkpoint import (
+    CHECKPOINT_VERSION,
+    DEFAULT_STATE_DIR_NAME,
+    DEFAULT_CHECKPOINT_INTERVAL_SEC,
+    RunCheckpoint,
+    make_plan,
+)
+from .scheduler import (
+    DEFAULT_TASKS_PER_WORKER,
+    DEFAULT_TASK_RETRIES,
+    TaskTimeout,
+    WindowedExecutor,
+)
+from .serialization import (
+    JSON_BACKENDS,
+    JSON_FORMATS,
+    Serializer,
+    JsonlWriter,
+    get_serializer,
+    orjson_available,
+    public_fields,
+)
+from .dedup import (
+    contribution_key,
+    normalize_timestamp,
+    value_source,
+    has_time_of_day,
+    KeyedValues,
+    FileContributions,
+    merge_contributions,
+    contributions_to_agg,
+    find_covered_files,
 )
-from .csv_reader import detect_delimiter, read_csv_stream
-from .heuristics import infer_date_column, categorize_path, match_metric_key, is_session_headers
-from .aggregation import aggregate_value, finalize_daily
 
 __all__ = [
     # constants
     "DATE_COL_CANDIDATES", "METRIC_MAP", "AVERAGE_PREFERENCE", "SUM_PREFERENCE",
+    "HR_MIN_BPM", "HR_MAX_BPM", "HR_MAX_SAMPLE_GAP_SEC", "DEFAULT_MAX_HR", "HR_ZONES",
+    "TREND_WINDOWS_DAYS", "BASELINE_METRICS", "BASELINE_WINDOW_DAYS", "BASELINE_MIN_DAYS",
     # utils
     "normalize_whitespace", "to_float", "parse_date_value", "parse_datetime_value",
     "parse_duration_to_minutes", "first_value", "num_value", "ensure_dir",
+    "temp_path_for", "replace_if_changed", "write_bytes_atomic", "write_text_atomic",
     # csv
-    "detect_delimiter", "read_csv_stream",
+    "CsvFormat", "detect_encoding", "count_delimiter", "detect_delimiter", "detect_csv_format",
+    "read_csv_stream", "count_data_rows",
     # heuristics
     "infer_date_column", "categorize_path", "match_metric_key", "is_session_headers",
+    "classify_headers", "FILE_CLASSES",
     # aggregation
-    "aggregate_value", "finalize_daily",
+    "SUMMARY_PERIODS", "aggregate_value", "finalize_daily", "SlidingWindow", "add_trend_fields",
+    "period_summaries",
+    # fast index
+    "fast_index_record",
+    # extractors
+    "FileContext", "Extractor", "ExtractorRegistry", "REGISTRY", "GENERIC_EXTRACTOR", "SessionColumns",
+    "register_extractor", "run_extractor",
+    # reduction
+    "PartialAggregate", "TreeReducer",
+    # rollups
+    "ROLLUP_RESOLUTIONS", "RollupBucket", "rollup_day", "iter_rollups", "parse_resolutions",
+    # sketches
+    "HrHistogram", "hr_day_sketch", "series_hr_sketches", "hr_daily_fields",
+    # series
+    "SERIES_EPOCH", "HrSeries", "PaceSeries", "epoch_seconds", "scan_series_file",
+    # sessions
+    "AUTO_SESSION_MIN_DURATION_MIN", "AUTO_SESSION_GAP_ALLOW_SEC", "detect_pace_sessions", "enrich_session",
+    # partitions
+    "PARTITION_FILE", "PARTITION_LAYOUT", "UNKNOWN_PARTITION", "MANIFEST_NAME", "partition_of",
+    "partition_relpath", "write_partitions", "write_manifest", "remove_partitions",
+    # server
+    "DEFAULT_HOST", "DEFAULT_PORT", "DEFAULT_CACHE_ENTRIES", "QueryError", "LruCache", "DistilledStore",
+    "QueryService", "make_handler", "make_server",
+    # watch
+    "DEFAULT_POLL_INTERVAL_SEC", "FileSignature", "DirectoryPoller", "find_csv_files", "snapshot_csv_files",
+    "WatchState",
+    # sqlite
+    "SQLITE_SCHEMA_VERSION", "SQLITE_BATCH_ROWS", "DAILY_COLUMNS", "SESSION_COLUMNS", "FILES_COLUMNS",
+    "write_sqlite",
+    # checkpoint
+    "CHECKPOINT_VERSION", "DEFAULT_STATE_DIR_NAME", "DEFAULT_CHECKPOINT_INTERVAL_SEC", "RunCheckpoint", "make_plan",
+    # scheduler
+    "DEFAULT_TASKS_PER_WORKER", "DEFAULT_TASK_RETRIES", "TaskTimeout", "WindowedExecutor",
+    # serialization
+    "JSON_BACKENDS", "JSON_FORMATS", "Serializer", "JsonlWriter", "get_serializer",
+    "orjson_available", "public_fields",
+    # dedup
+    "contribution_key", "normalize_timestamp", "value_source", "has_time_of_day", "KeyedValues",
+    "FileContributions", "merge_contributions", "contributions_to_agg", "find_covered_files",
 ]
@@ -1,8 +1,20 @@
 from __future__ import annotations
 
-from typing import Dict, List
+import datetime as dt
+from collections import deque
+from typing import Deque, Dict, Iterable, List, Optional, Sequence, Tuple
 
-from .constants import AVERAGE_PREFERENCE, SUM_PREFERENCE
+from .constants import (
+    AVERAGE_PREFERENCE,
+    BASELINE_METRICS,
+    BASELINE_MIN_DAYS,
+    BASELINE_WINDOW_DAYS,
+    SUM_PREFERENCE,
+    TREND_WINDOWS_DAYS,
+)
+
+# Calendar periods for the summary files
+SUMMARY_PERIODS = ("week", "month")
 
 
 def aggregate_value(agg: Dict[str, Dict[str, float]], date: str, key: str, value: float):
@@ -18,6 +30,7 @@ def aggregate_value(agg: Dict[str, Dict[str, float]], date: str, key: str, value
 
 
 def finalize_daily(agg: Dict[str, Dict[str, float]]) -> List[Dict[str, float]]:
+    """Daily records (sorted by date) from summed values."""
     out: List[Dict[str, float]] = []
     for date, metrics in sorted(agg.items()):
         record: Dict[str, float] = {"date": date}
@@ -34,3 +47,172 @@ def finalize_daily(agg: Dict[str, Dict[str, float]]) -> List[Dict[str, float]]:
                 record[key] = round(val, 3)
         out.append(record)
     return out
+
+
+class SlidingWindow:
+    """Values over a trailing range of days (by date ordinal).
+
+    Keeps a running sum and count plus monotonic deques for the minimum and
+    maximum, so pushing a day and expiring old ones is amortised O(1).
+    """
+
+    __slots__ = ("_items", "_min", "_max", "total", "count")
+
+    def __init__(self):
+        self._items: Deque[Tuple[int, float]] = deque()
+        self._min: Deque[Tuple[int, float]] = deque()
+        self._max: Deque[Tuple[int, float]] = deque()
+        self.total = 0.0
+        self.count = 0
+
+    def push(self, ordinal: int, value: float):
+        """Add a value; ordinals must not decrease."""
+        self._items.append((ordinal, value))
+        self.total += value
+        self.count += 1
+        while self._min and self._min[-1][1] >= value:
+            self._min.pop()
+        self._min.append((ordinal, value))
+        while self._max and self._max[-1][1] <= value:
+            self._max.pop()
+        self._max.append((ordinal, value))
+
+    def expire(self, first_ordinal: int):
+        """Drop values from days before ``first_ordinal``."""
+        items = self._items
+        while items and items[0][0] < first_ordinal:
+            _, value = items.popleft()
+            self.total -= value
+            self.count -= 1
+        while self._min and self._min[0][0] < first_ordinal:
+            self._min.popleft()
+        while self._max and self._max[0][0] < first_ordinal:
+            self._max.popleft()
+        if not items:
+            # Reset so float error from adding and removing does not carry over into an empty window
+            self.total = 0.0
+
+    def mean(self) -> Optional[float]:
+        return self.total / self.count if self.count else None
+
+    def min(self) -> Optional[float]:
+        return self._min[0][1] if self._min else None
+
+    def max(self) -> Optional[float]:
+        return self._max[0][1] if self._max else None
+
+
+def add_trend_fields(records: List[Dict[str, float]], windows: Sequence[int] = TREND_WINDOWS_DAYS,
+                     baseline_metrics: Iterable[str] = BASELINE_METRICS,
+                     baseline_days: int = BASELINE_WINDOW_DAYS, baseline_min_days: int = BASELINE_MIN_DAYS):
+    """Add rolling trend and baseline fields in place to date-sorted daily records, in one pass.
+
+    For each metric present on a day, over the trailing ``n``-day window
+    ending that day (days without the metric are skipped, not counted as
+    zero): ``<metric>_avg_<n>d``, the mean over the days with a value, and
+    for summed metrics also the window total ``<metric>_sum_<n>d``. For ``baseline_metrics``, the previous
+    ``baseline_days`` days (excluding the day itself) give
+    ``<metric>_baseline_<n>d`` (mean), ``<metric>_delta_<n>d`` (the day's
+    value minus the baseline) and ``<metric>_min_<n>d``/``<metric>_max_<n>d``,
+    once at least ``baseline_min_days`` days have values.
+    """
+    baseline_metrics = set(baseline_metrics)
+    trailing: Dict[Tuple[str, int], SlidingWindow] = {}
+    baselines: Dict[str, SlidingWindow] = {}
+    for rec in records:
+        day = dt.date.fromisoformat(str(rec["date"])).toordinal()
+        fields: Dict[str, float] = {}
+        for key, value in list(rec.items()):
+            if key == "date" or not isinstance(value, (int, float)):
+                continue
+            if key in baseline_metrics:
+                window = baselines.get(key)
+                if window is None:
+                    window = baselines[key] = SlidingWindow()
+                window.expire(day - baseline_days)
+                if window.count >= baseline_min_days:
+                    base = window.mean()
+                    fields[f"{key}_baseline_{baseline_days}d"] = round(base, 3)
+                    fields[f"{key}_delta_{baseline_days}d"] = round(value - base, 3)
+                    fields[f"{key}_min_{baseline_days}d"] = round(window.min(), 3)
+                    fields[f"{key}_max_{baseline_days}d"] = round(window.max(), 3)
+                window.push(day, value)
+            summed = key not in AVERAGE_PREFERENCE
+            for n in windows:
+                window = trailing.get((key, n))
+                if window is None:
+                    window = trailing[(key, n)] = SlidingWindow()
+                window.expire(day - n + 1)
+                window.push(day, value)
+                if summed:
+                    fields[f"{key}_sum_{n}d"] = round(window.total, 3)
+                fields[f"{key}_avg_{n}d"] = round(window.mean(), 3)
+        rec.update(fields)
+
+
+def _period_bounds(date: dt.date, period: str) -> Tuple[str, dt.date, dt.date]:
+    if period == "week":
+        iso = date.isocalendar()
+        start = date - dt.timedelta(days=date.weekday())
+        return f"{iso[0]}-W{iso[1]:02d}", start, start + dt.timedelta(days=6)
+    if period == "month":
+        start = date.replace(day=1)
+        next_month = (start + dt.timedelta(days=32)).replace(day=1)
+        return f"{date.year}-{date.month:02d}", start, next_month - dt.timedelta(days=1)
+    raise ValueError(f"Unknown summary period {period!r}; expected one of {', '.join(SUMMARY_PERIODS)}")
+
+
+def period_summaries(records: Iterable[Dict[str, float]], period: str) -> List[Dict[str, object]]:
+    """Calendar week (ISO, Monday first) or month summaries of date-sorted daily records, in one pass.
+
+    Summed metrics get the period total (``<metric>``) and the mean per day
+    with a value (``<metric>_per_day``); averaged metrics get the mean of
+    their daily values (``<metric>``) with ``<metric>_min``/``<metric>_max``.
+    ``days`` counts the days with a daily record. Expects records without
+    trend fields.
+    """
+    out: List[Dict[str, object]] = []
+    label: Optional[str] = None
+    start = end = None
+    days = 0
+    stats: Dict[str, List[float]] = {}
+
+    def _flush():
+        rec: Dict[str, object] = {"period": period, "label": label, "start": start.isoformat(),
+                                  "end": end.isoformat(), "days": days}
+        for key, (total, count, lo, hi) in stats.items():
+            if key in AVERAGE_PREFERENCE:
+                rec[key] = round(total / count, 3)
+                rec[f"{key}_min"] = round(lo, 3)
+                rec[f"{key}_max"] = round(hi, 3)
+            else:
+                rec[key] = round(total, 3)
+                rec[f"{key}_per_day"] = round(total / count, 3)
+        out.append(rec)
+
+    for rec in records:
+        date = dt.date.fromisoformat(str(rec["date"]))
+        if label is None or date > end:
+            if label is not None:
+                _flush()
+            label, start, end = _period_bounds(date, period)
+            days = 0
+            stats = {}
+        days += 1
+        for key, value in rec.items():
+            if key == "date" or not isinstance(value, (int, float)):
+                continue
+            st = stats.get(key)
+            if st is None:
+                stats[key] = [value, 1, value, value]
+            else:
+                st[0] += value
+                st[1] += 1
+                if value < st[2]:
+                    st[2] = value
+                if value > st[3]:
+                    st[3] = value
+    if label is not None:
+        _flush()
+    return out
+
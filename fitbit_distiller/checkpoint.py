@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import pickle
+from typing import Dict, List, Optional, Set, Tuple
+
+from .utils import ensure_dir, temp_path_for, write_text_atomic
+
+# Bump when the saved state layout changes; older checkpoints are ignored
+CHECKPOINT_VERSION = 4
+DEFAULT_STATE_DIR_NAME = ".distill_state"
+DEFAULT_CHECKPOINT_INTERVAL_SEC = 60.0
+
+PLAN_FILE = "plan.json"
+STATE_FILE = "reduce_state.pkl"
+SERIES_FILE = "series.pkl"
+
+
+def make_plan(input_root: str, batches: List[List[str]], options: Dict[str, object]) -> Dict[str, object]:
+    """Describe a run: the batches (relative paths), each file's size and mtime, and result-affecting options.
+
+    A checkpoint is only resumed for an identical plan, so files changed
+    since the interrupted run (or a different --batch-size) start a fresh run.
+    """
+    rel_batches = [[os.path.relpath(p, start=input_root) for p in batch] for batch in batches]
+    signatures = {}
+    for batch in batches:
+        for path in batch:
+            st = os.stat(path)
+            signatures[os.path.relpath(path, start=input_root)] = [st.st_size, st.st_mtime_ns]
+    return {
+        "version": CHECKPOINT_VERSION,
+        "input_root": os.path.abspath(input_root),
+        "options": options,
+        "batches": rel_batches,
+        "signatures": signatures,
+    }
+
+
+def _plan_digest(plan: Dict[str, object]) -> str:
+    return hashlib.sha256(json.dumps(plan, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def _dump_atomic(path: str, obj: object):
+    tmp_path = temp_path_for(path)
+    with open(tmp_path, "wb") as f:
+        pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class RunCheckpoint:
+    """Checkpoint of a batch run in a state directory.
+
+    Holds the plan, the indices of the batches whose results are merged and
+    the reducer's pending tree nodes, plus the pre-scanned time series
+    (written once, with the first saved reduce state). The reducer's tree depends only on batch indices, so restoring its nodes and
+    adding the remaining batches gives the same result as an uninterrupted
+    run. State files are pickles: only resume from a state directory you
+    wrote yourself.
+    """
+
+    def __init__(self, state_dir: str, plan: Dict[str, object]):
+        self.state_dir = state_dir
+        self.plan = plan
+        self.digest = _plan_digest(plan)
+        # Series handed to set_series() and not written yet
+        self._unsaved_series: Optional[object] = None
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.state_dir, name)
+
+    def start(self):
+        """Begin a fresh run: drop any previous state and record the plan.
+
+        Raises ValueError for a non-empty directory that holds no checkpoint,
+        so an unrelated directory is never used (or cleared) as state.
+        """
+        if os.path.isdir(self.state_dir) and os.listdir(self.state_dir) \
+                and not os.path.isfile(self._path(PLAN_FILE)):
+            raise ValueError(f"State directory {self.state_dir} is not empty and holds no checkpoint "
+                             f"({PLAN_FILE}); choose an empty or new directory")
+        self.clear()
+        ensure_dir(self.state_dir)
+        write_text_atomic(self._path(PLAN_FILE), json.dumps(self.plan, indent=2) + "\n")
+
+    def matches(self) -> bool:
+        """Whether the state directory holds a checkpoint for this plan."""
+        try:
+            with open(self._path(PLAN_FILE), "r", encoding="utf-8") as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return False
+        return _plan_digest(saved) == self.digest
+
+    def load_reduce_state(self) -> Tuple[Set[int], Dict[Tuple[int, int], object]]:
+        """``(done batch indices, pending tree nodes)``; empty when nothing was saved yet."""
+        try:
+            with open(self._path(STATE_FILE), "rb") as f:
+                state = pickle.load(f)
+        except OSError:
+            return set(), {}
+        if state.get("version") != CHECKPOINT_VERSION or state.get("plan") != self.digest:
+            return set(), {}
+        return set(state["done"]), state["pending"]
+
+    def save_reduce_state(self, done: Set[int], pending: Dict[Tuple[int, int], object]):
+        """Save the merged progress, after first writing the series if that is still pending."""
+        if self._unsaved_series is not None:
+            _dump_atomic(self._path(SERIES_FILE), {"version": CHECKPOINT_VERSION, "plan": self.digest,
+                                                   "series": self._unsaved_series})
+            self._unsaved_series = None
+        _dump_atomic(self._path(STATE_FILE), {
+            "version": CHECKPOINT_VERSION,
+            "plan": self.digest,
+            "done": sorted(done),
+            "pending": pending,
+        })
+
+    def load_series(self) -> Optional[object]:
+        try:
+            with open(self._path(SERIES_FILE), "rb") as f:
+                state = pickle.load(f)
+        except OSError:
+            return None
+        if state.get("version") != CHECKPOINT_VERSION or state.get("plan") != self.digest:
+            return None
+        return state["series"]
+
+    def set_series(self, series: object):
+        """Include ``series`` in the checkpoint.
+
+        It is only written with the next ``save_reduce_state``, so a run that
+        finishes before its first checkpoint never pickles it, and it is
+        written once however many checkpoints follow.
+        """
+        self._unsaved_series = series
+
+    def clear(self):
+        """Remove the checkpoint's own files (and their temp files), then the directory if that left it empty."""
+        if not os.path.isdir(self.state_dir):
+            return
+        owned = (PLAN_FILE, STATE_FILE, SERIES_FILE)
+        for name in os.listdir(self.state_dir):
+            # Temp files are named ".<file>.<pid>.tmp" (see temp_path_for)
+            if name in owned or any(name.startswith(f".{own}.") and name.endswith(".tmp") for own in owned):
+                os.remove(self._path(name))
+        if not os.listdir(self.state_dir):
+            os.rmdir(self.state_dir)
@@ -35,7 +35,8 @@ METRIC_MAP = {
 }
 
 # For metrics that should be averaged rather than summed when multiple entries per day
-AVERAGE_PREFERENCE = {"resting_heart_rate", "hrv_ms", "spo2_percent", "sleep_score", "readiness_score", "stress_score", "skin_temp_variation"}
+AVERAGE_PREFERENCE = {"resting_heart_rate", "hrv_ms", "spo2_percent", "sleep_score", "readiness_score", "stress_score", "skin_temp_variation",
+                      "hr_p50", "hr_p95"}
 
 # For metrics typically summed across rows (e.g., multiple logs in a day)
 SUM_PREFERENCE = {
@@ -44,4 +45,29 @@ SUM_PREFERENCE = {
     "mindfulness_minutes",
     "sleep_duration_min", "lightly_active_minutes", "fairly_active_minutes", "very_active_minutes", "sedentary_minutes",
     "workout_minutes", "workout_count",
+    "hr_zone_fat_burn_minutes", "hr_zone_cardio_minutes", "hr_zone_peak_minutes",
 }
+
+# Heart-rate sketch range (1 bpm bins); readings outside are ignored
+HR_MIN_BPM = 30
+HR_MAX_BPM = 220
+# A heart-rate sample counts for the time until the next one, up to this many seconds
+HR_MAX_SAMPLE_GAP_SEC = 60
+# Used for zone boundaries unless --max-hr is given
+DEFAULT_MAX_HR = 190
+# Zone bounds as fractions of max heart rate: name -> (lower, upper or None)
+HR_ZONES = {
+    "fat_burn": (0.50, 0.70),
+    "cardio": (0.70, 0.85),
+    "peak": (0.85, None),
+}
+
+# Trailing windows (days) for the rolling trend fields on daily records: every metric gets the mean of its daily
+# values (<metric>_avg_<n>d), summed metrics also the window total (<metric>_sum_<n>d)
+TREND_WINDOWS_DAYS = (7, 28)
+# Metrics compared against their own recent baseline (mean of the previous BASELINE_WINDOW_DAYS days)
+BASELINE_METRICS = ("resting_heart_rate", "hrv_ms", "spo2_percent", "sleep_duration_min", "sleep_score",
+                    "readiness_score", "stress_score", "skin_temp_variation")
+BASELINE_WINDOW_DAYS = 30
+# A baseline needs at least this many days with values in its window
+BASELINE_MIN_DAYS = 7
@@ -1,68 +1,160 @@
 from __future__ import annotations
 
+import codecs
 import csv
-from typing import Dict, Iterable, List, Optional, Tuple
+import os
+import re
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+
+# Bytes read from the start of a file for encoding, delimiter and header detection
+SAMPLE_BYTES = 64 * 1024
+# Candidate delimiters, in order of preference when counts are equally consistent
+DELIMITERS = ",;\t|"
+# Lines used to count candidate delimiters
+DELIMITER_SAMPLE_LINES = 20
+
+_QUOTED = re.compile(r'"(?:[^"]|"")*"')
+
+# Delimiters already decided, keyed by (directory, raw header line)
+_DIALECT_CACHE: Dict[Tuple[str, bytes], str] = {}
+_DIALECT_CACHE_MAX = 4096
+
+
+class CsvFormat(NamedTuple):
+    encoding: str
+    delimiter: str
+    headers: List[str]
+
+
+def detect_encoding(raw: bytes) -> str:
+    """Encoding from a byte sample: BOM, else strict UTF-8 validation, else latin-1."""
+    if raw.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    try:
+        # Incremental decode so a multi-byte character cut at the sample end is not an error
+        codecs.getincrementaldecoder("utf-8")("strict").decode(raw, final=False)
+        return "utf-8"
+    except UnicodeDecodeError:
+        return "latin-1"
+
+
+def _count_delimiter(line: str, delimiter: str) -> int:
+    if '"' in line:
+        line = _QUOTED.sub("", line)
+    return line.count(delimiter)
+
+
+def count_delimiter(lines: List[str]) -> Optional[str]:
+    """Delimiter whose count is the same non-zero number on every line, or None when ambiguous.
+
+    A single candidate present on the first line is accepted as is; no
+    candidate at all means a single-column file (``,``). Several consistent
+    candidates, or none, are ambiguous.
+    """
+    if not lines:
+        return ","
+    counts = {d: [_count_delimiter(line, d) for line in lines] for d in DELIMITERS}
+    present = [d for d in DELIMITERS if counts[d][0] > 0]
+    if not present:
+        return ","
+    consistent = [d for d in present if all(c == counts[d][0] for c in counts[d])]
+    if len(consistent) == 1:
+        return consistent[0]
+    if len(present) == 1:
+        return present[0]
+    return None
 
 
 def detect_delimiter(sample: str) -> str:
+    """Delimiter of a text sample: direct counting, with ``csv.Sniffer`` only when ambiguous."""
+    lines = [line for line in sample.splitlines() if line.strip()]
+    if len(lines) > 1 and not sample.endswith(("\n", "\r")):
+        lines = lines[:-1]  # last line may be cut off
+    delimiter = count_delimiter(lines[:DELIMITER_SAMPLE_LINES])
+    if delimiter is not None:
+        return delimiter
     try:
-        dialect = csv.Sniffer().sniff(sample, delimiters=",;\t|")
+        dialect = csv.Sniffer().sniff(sample, delimiters=DELIMITERS)
         return dialect.delimiter
     except Exception:
         return ","
 
 
+def detect_csv_format(path: str) -> Optional[CsvFormat]:
+    """Encoding, delimiter and header row of a CSV, from one read of its first bytes.
+
+    The header is the first non-blank line. Delimiters are cached per
+    directory and raw header line, so sibling files with the same columns
+    (e.g. monthly heart_rate_* files) skip detection. Returns None for a file
+    without a non-blank line.
+    """
+    with open(path, "rb") as f:
+        raw = f.read(SAMPLE_BYTES)
+        encoding = detect_encoding(raw)
+        header_raw = b""
+        for line in raw.splitlines(keepends=True):
+            if line.strip() and line.strip() != codecs.BOM_UTF8:
+                header_raw = line
+                break
+        if header_raw and not header_raw.endswith((b"\n", b"\r")) and len(raw) == SAMPLE_BYTES:
+            # Header longer than the sample: read the rest of it
+            header_raw += f.readline()
+    if not header_raw:
+        return None
+    cache_key = (os.path.dirname(os.path.abspath(path)), header_raw.lstrip(codecs.BOM_UTF8).rstrip(b"\r\n"))
+    delimiter = _DIALECT_CACHE.get(cache_key)
+    if delimiter is None:
+        delimiter = detect_delimiter(raw.decode(encoding, errors="ignore"))
+        if len(_DIALECT_CACHE) >= _DIALECT_CACHE_MAX:
+            _DIALECT_CACHE.clear()
+        _DIALECT_CACHE[cache_key] = delimiter
+    header_text = header_raw.decode(encoding, errors="ignore").lstrip("\ufeff")
+    headers = [c.strip() for c in next(csv.reader([header_text.rstrip("\r\n")], delimiter=delimiter))]
+    return CsvFormat(encoding, delimiter, headers)
+
+
 def read_csv_stream(path: str) -> Tuple[List[str], Iterable[Dict[str, str]], Optional[str], List[str]]:
-    """Return headers, row iterator (dicts), encoding_used, errors (list of strings)."""
+    """Return headers, row iterator (dicts), encoding_used, errors (list of strings).
+
+    The first non-blank line is the header; every following row is data.
+    """
     errors: List[str] = []
-    encodings = ["utf-8-sig", "utf-8", "latin-1"]
-    for enc in encodings:
-        try:
-            with open(path, "rb") as f:
-                raw = f.read(4096)
-            sample_text = raw.decode(enc, errors="ignore")
-            delimiter = detect_delimiter(sample_text)
-            # Re-open as text stream
-            def row_iter() -> Iterable[Dict[str, str]]:
-                with open(path, "r", encoding=enc, errors="ignore", newline="") as tf:
-                    # Use csv.DictReader
-                    first_chunk = tf.read(4096)
-                    tf.seek(0)
-                    sniffer = csv.Sniffer()
-                    has_header = True
-                    try:
-                        has_header = sniffer.has_header(first_chunk)
-                    except Exception:
-                        pass
-                    reader = csv.reader(tf, delimiter=delimiter)
-                    headers: List[str] = []
-                    for row in reader:
-                        if not row or all(not str(cell).strip() for cell in row):
-                            continue
-                        headers = [str(c).strip() for c in row]
-                        break
-                    if not headers:
-                        return
-                    # Build DictReader with found headers
-                    tf.seek(0)
-                    dict_reader = csv.DictReader(tf, fieldnames=headers, delimiter=delimiter)
-                    if has_header:
-                        next(dict_reader, None)  # skip header row
-                    for r in dict_reader:
-                        # Normalize keys to original headers
-                        yield {k: (v if v is not None else "").strip() for k, v in r.items()}
-            # We need headers separately
-            with open(path, "r", encoding=enc, errors="ignore", newline="") as tf2:
-                first_line = None
-                for line in tf2:
-                    if line.strip():
-                        first_line = line
-                        break
-                if first_line is None:
-                    return [], iter(()), enc, []
-                headers = [c.strip() for c in next(csv.reader([first_line], delimiter=delimiter))]
-            return headers, row_iter(), enc, errors
-        except Exception as e:
-            errors.append(f"{enc}: {e}")
-            continue
-    return [], iter(()), None, errors
+    try:
+        fmt = detect_csv_format(path)
+    except Exception as e:
+        errors.append(str(e))
+        return [], iter(()), None, errors
+    if fmt is None:
+        return [], iter(()), "utf-8", errors
+    encoding, delimiter, headers = fmt
+
+    def row_iter() -> Iterable[Dict[str, str]]:
+        with open(path, "r", encoding=encoding, errors="ignore", newline="") as tf:
+            dict_reader = csv.DictReader(tf, fieldnames=headers, delimiter=delimiter)
+            next(dict_reader, None)  # skip header row
+            for r in dict_reader:
+                # Normalize keys to original headers
+                yield {k: (v if v is not None else "").strip() for k, v in r.items()}
+
+    return headers, row_iter(), encoding, errors
+
+
+def count_data_rows(path: str, chunk_size: int = 1 << 20) -> int:
+    """Count data rows from raw bytes (newlines minus the header line).
+
+    Blank lines and quoted multi-line cells are not special-cased; this is
+    meant for files whose rows are never parsed.
+    """
+    lines = 0
+    last = b""
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            lines += chunk.count(b"\n")
+            last = chunk
+    if last and not last.endswith(b"\n"):
+        lines += 1
+    return max(lines - 1, 0)
@@ -0,0 +1,249 @@
+from __future__ import annotations
+
+import datetime as dt
+import hashlib
+import math
+from array import array
+from typing import Dict, Iterable, List, Optional
+
+from .utils import parse_datetime_value
+
+
+def contribution_key(metric: str, timestamp: str, source: str, occurrence: int = 0) -> int:
+    """Stable 64-bit key for a (metric, timestamp, value source) observation.
+
+    Built from blake2b rather than ``hash()`` so keys agree across worker
+    processes regardless of PYTHONHASHSEED. ``occurrence`` distinguishes
+    repeated observations of the same key within a single file, so a file
+    that legitimately logs two identical rows keeps both while a second file
+    repeating them is still treated as a duplicate. The key is the metric's
+    hash XOR the observation's, so the metrics of one row share one digest.
+    """
+    key = _metric_hash(metric) ^ _observation_hash(timestamp, source)
+    return _repeat_key(key, occurrence) if occurrence else key
+
+
+def _hash64(text: str) -> int:
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little", signed=True)
+
+
+_METRIC_HASHES: Dict[str, int] = {}
+
+
+def _metric_hash(metric: str) -> int:
+    h = _METRIC_HASHES.get(metric)
+    if h is None:
+        h = _METRIC_HASHES[metric] = _hash64(f"metric\x1f{metric}")
+    return h
+
+
+def _observation_hash(timestamp: str, source: str) -> int:
+    return _hash64(f"{timestamp}\x1f{source}")
+
+
+def _repeat_key(key: int, occurrence: int) -> int:
+    return _hash64(f"{key}\x1f{occurrence}")
+
+
+def source_family(category: str) -> str:
+    """Collapse export variants of a category (e.g. ``Sleep`` and ``Sleep_GoogleData``)."""
+    cat = category.lower().strip()
+    if cat.endswith("_googledata"):
+        cat = cat[:-len("_googledata")]
+    return cat
+
+
+def value_source(category: str, row_source: Optional[str] = None) -> str:
+    """Value source of an observation: the category family plus any explicit source column."""
+    family = source_family(category)
+    if row_source:
+        return f"{family}|{row_source.lower().strip()}"
+    return family
+
+
+def normalize_timestamp(raw: Optional[str], date_str: str) -> str:
+    """Normalize a row timestamp so legacy and GoogleData exports compare equal.
+
+    Date-only values collapse to the ISO date; values carrying a time part are
+    re-rendered as naive ISO datetimes (any UTC offset is dropped, since the
+    two export variants disagree on whether they write one).
+    """
+    if raw and ":" in raw:
+        ts = parse_datetime_value(raw)
+        if isinstance(ts, dt.datetime):
+            return ts.replace(tzinfo=None).isoformat()
+    return date_str
+
+
+def has_time_of_day(raw: Optional[str]) -> bool:
+    """Whether a date cell carries a time of day (midnight-only timestamps count as dates)."""
+    if not raw or ":" not in raw:
+        return False
+    ts = parse_datetime_value(raw)
+    return isinstance(ts, dt.datetime) and ts.time() != dt.time(0)
+
+
+class KeyedValues:
+    """Contributions of one date and metric: keys and values in parallel arrays, one value per key.
+
+    Takes 16 bytes per observation instead of a dict entry with boxed key
+    and value, and pickles as two flat buffers.
+    """
+
+    __slots__ = ("keys", "values")
+
+    def __init__(self, keys: Optional[array] = None, values: Optional[array] = None):
+        self.keys = array("q") if keys is None else keys
+        self.values = array("d") if values is None else values
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def copy(self) -> "KeyedValues":
+        return KeyedValues(array("q", self.keys), array("d", self.values))
+
+    def update(self, other: "KeyedValues"):
+        """Append the observations of ``other`` whose key is not here yet; the first value seen for a key wins."""
+        if self.keys == other.keys:
+            return
+        seen = set(self.keys)
+        keys, values = self.keys, self.values
+        for key, value in zip(other.keys, other.values):
+            if key not in seen:
+                seen.add(key)
+                keys.append(key)
+                values.append(value)
+
+
+# date -> metric -> keyed values
+Contributions = Dict[str, Dict[str, KeyedValues]]
+
+
+class FileContributions:
+    """Per-file builder for keyed metric contributions; call ``finish`` once the file is done."""
+
+    def __init__(self):
+        self.data: Contributions = {}
+        # Observation hash of the last (timestamp, source), shared by the metrics of a row
+        self._last_timestamp: Optional[str] = None
+        self._last_source: Optional[str] = None
+        self._last_hash = 0
+
+    def add(self, date: str, metric: str, timestamp: str, source: str, value: float):
+        if timestamp != self._last_timestamp or source != self._last_source:
+            self._last_timestamp = timestamp
+            self._last_source = source
+            self._last_hash = _observation_hash(timestamp, source)
+        keyed = self._keyed(date, metric)
+        keyed.keys.append(_metric_hash(metric) ^ self._last_hash)
+        keyed.values.append(value)
+
+    def add_keyed(self, date: str, metric: str, key: int, value: float):
+        """Set the value of ``key``; a linear scan, meant for a handful of keys per day (e.g. sessions)."""
+        keyed = self._keyed(date, metric)
+        if key in keyed.keys:
+            keyed.values[keyed.keys.index(key)] = value
+        else:
+            keyed.keys.append(key)
+            keyed.values.append(value)
+
+    def finish(self) -> Contributions:
+        """The file's contributions, with repeated observations keyed by their occurrence.
+
+        ``add`` appends without checking for repeats; a day and metric that
+        got the same key more than once (rare) has its later copies re-keyed
+        here, as ``contribution_key`` does with ``occurrence``.
+        """
+        for metrics in self.data.values():
+            for keyed in metrics.values():
+                keys = keyed.keys
+                if len(set(keys)) == len(keys):
+                    continue
+                seen: Dict[int, int] = {}
+                for i, key in enumerate(keys):
+                    occurrence = seen.get(key, 0)
+                    seen[key] = occurrence + 1
+                    if occurrence:
+                        keys[i] = _repeat_key(key, occurrence)
+        return self.data
+
+    def _keyed(self, date: str, metric: str) -> KeyedValues:
+        metrics = self.data.get(date)
+        if metrics is None:
+            metrics = self.data[date] = {}
+        keyed = metrics.get(metric)
+        if keyed is None:
+            keyed = metrics[metric] = KeyedValues()
+        return keyed
+
+
+def merge_contributions(dst: Contributions, src: Contributions):
+    """Merge ``src`` into ``dst``; the first value seen for a key wins."""
+    for date, metrics in src.items():
+        dst_metrics = dst.setdefault(date, {})
+        for metric, keyed in metrics.items():
+            dst_keyed = dst_metrics.get(metric)
+            if dst_keyed is None:
+                dst_metrics[metric] = keyed.copy()
+            else:
+                dst_keyed.update(keyed)
+
+
+def contributions_to_agg(contrib: Contributions, agg: Dict[str, Dict[str, float]]):
+    """Fold deduplicated contributions into the sum/count layout used by ``finalize_daily``."""
+    for date, metrics in contrib.items():
+        day = agg.setdefault(date, {})
+        for metric, keyed in metrics.items():
+            day[metric] = day.get(metric, 0.0) + math.fsum(keyed.values)
+            day[f"{metric}__count"] = day.get(f"{metric}__count", 0.0) + float(len(keyed))
+
+
+def column_signature(columns: Iterable[str]) -> tuple:
+    return tuple(c.lower().strip() for c in columns)
+
+
+def find_covered_files(records: Iterable[Dict[str, object]]) -> Dict[str, str]:
+    """Return ``{covered_path: covering_path}`` for redundant files.
+
+    A file is covered when another file of the same category family and column
+    signature spans its whole ``date_range`` with at least as many rows per
+    day. Only files whose ``date_precision`` is ``"date"`` take part: a day
+    range says nothing about which hours of its first and last day an
+    intraday file holds. Ties between equal ranges go to the file with more
+    rows, then the smaller path, so the result does not depend on input order.
+    """
+    groups: Dict[tuple, List[Dict[str, object]]] = {}
+    for rec in records:
+        rng = rec.get("date_range") or {}
+        if not rng.get("min") or not rng.get("max") or rec.get("date_precision") != "date":
+            continue
+        group = (source_family(str(rec.get("category") or "")), column_signature(rec.get("columns") or []))
+        groups.setdefault(group, []).append(rec)
+
+    covered: Dict[str, str] = {}
+    for members in groups.values():
+        if len(members) < 2:
+            continue
+        # Rank widest range first, then most rows, then smallest path; a file is
+        # only covered by a higher-ranked one, so two files never cover each other.
+        members.sort(key=lambda r: (-_days(r), -int(r.get("row_count") or 0), r["path"]))
+        for i, rec in enumerate(members):
+            lo, hi = rec["date_range"]["min"], rec["date_range"]["max"]
+            density = _rows_per_day(rec)
+            # The highest-ranked candidate is never covered itself: anything
+            # covering it would cover ``rec`` too and rank higher still.
+            for other in members[:i]:
+                rng = other["date_range"]
+                if rng["min"] <= lo and rng["max"] >= hi and _rows_per_day(other) >= density:
+                    covered[rec["path"]] = other["path"]
+                    break
+    return covered
+
+
+def _days(rec: Dict[str, object]) -> int:
+    rng = rec["date_range"]
+    return (dt.date.fromisoformat(rng["max"]) - dt.date.fromisoformat(rng["min"])).days + 1
+
+
+def _rows_per_day(rec: Dict[str, object]) -> float:
+    return int(rec.get("row_count") or 0) / _days(rec)
@@ -0,0 +1,555 @@
+from __future__ import annotations
+
+import abc
+import datetime as dt
+import fnmatch
+import os
+import re
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Pattern, Sequence, Tuple
+
+from .aggregation import aggregate_value
+from .dedup import FileContributions, contribution_key, has_time_of_day, normalize_timestamp, value_source
+from .heuristics import infer_date_column, match_metric_key
+from .utils import parse_date_value, parse_datetime_value, parse_duration_to_minutes, to_float
+
+Row = Dict[str, str]
+
+
+class FileContext:
+    """Per-file state handed to an extractor: header-derived lookups plus the local results.
+
+    Built once from the header line, so extractors never re-derive column
+    mappings per row.
+    """
+
+    def __init__(self, csv_path: str, rel_path: str, category: str, headers: List[str], file_class: str,
+                 dedup: bool = True):
+        self.csv_path = csv_path
+        self.rel_path = rel_path
+        self.name = os.path.basename(csv_path).lower()
+        self.category = category
+        self.headers = headers
+        self.file_class = file_class
+        self.dedup = dedup
+        self.date_col = infer_date_column(headers) if headers else None
+        self.lower_map = {h.lower().strip(): h for h in headers}
+        # Headers that map to a daily metric, with their metric key
+        self.metric_columns: List[Tuple[str, str]] = [
+            (h, mk) for h, mk in ((h, match_metric_key(h, category)) for h in headers) if mk is not None]
+        # Explicit per-row source column (e.g. "data source"), part of the dedup key
+        self.source_col = next((h for h in headers if "source" in h.lower()), None)
+        self.value_source = value_source(category)
+        # Intraday heart rate columns
+        self.hr_ts_col = self.lower_map.get("timestamp")
+        self.hr_bpm_col = self.lower_map.get("beats per minute")
+
+        self.row_count = 0
+        self.min_date: Optional[str] = None
+        self.max_date: Optional[str] = None
+        # "date" or "datetime" once a date cell was seen (see note_date_cell)
+        self.date_precision: Optional[str] = None
+        self.metric_hits: Dict[str, int] = defaultdict(int)
+        self.local_daily: Dict[str, Dict[str, float]] = {}
+        self.local_contrib = FileContributions()
+        self.local_sessions: List[Dict[str, object]] = []
+
+    def row_date(self, row: Row) -> Optional[str]:
+        """Row date from the date column, else from the first cell that parses as a date."""
+        date_col = self.date_col
+        if date_col and date_col in row:
+            raw = row.get(date_col)
+            d = parse_date_value(raw)
+            if d:
+                self.note_date_cell(raw)
+                return d.isoformat()
+        # If we couldn't parse date, try any date-like field
+        for h in self.headers:
+            raw = row.get(h)
+            d = parse_date_value(raw)
+            if d:
+                self.note_date_cell(raw)
+                return d.isoformat()
+        return None
+
+    def note_date_cell(self, raw: Optional[str]):
+        """Track the file's date precision: "datetime" once any date cell carries a time of day."""
+        if self.date_precision != "datetime":
+            self.date_precision = "datetime" if has_time_of_day(raw) else "date"
+
+    def see_date(self, date_str: str):
+        if not self.min_date or date_str < self.min_date:
+            self.min_date = date_str
+        if not self.max_date or date_str > self.max_date:
+            self.max_date = date_str
+
+    def add_metrics(self, row: Row, date_str: str, session_key: Optional[int] = None):
+        """Aggregate the row's metric columns into the file's daily results.
+
+        With dedup, the values of a session row (``session_key``) are keyed
+        by the session, like its workout minutes: a session repeated within
+        a file counts once, as it does in the session records.
+        """
+        ts_key: Optional[str] = None
+        row_source = None
+        for h, mk in self.metric_columns:
+            val = to_float(row.get(h))
+            if val is None:
+                continue
+            self.metric_hits[mk] += 1
+            if self.dedup and session_key is not None:
+                self.local_contrib.add_keyed(date_str, mk, session_key, val)
+            elif self.dedup:
+                if ts_key is None:
+                    ts_key = normalize_timestamp(row.get(self.date_col) if self.date_col else None, date_str)
+                    row_source = value_source(self.category, row.get(self.source_col)) if self.source_col \
+                        else self.value_source
+                self.local_contrib.add(date_str, mk, ts_key, row_source, val)
+            else:
+                aggregate_value(self.local_daily, date_str, mk, val)
+
+
+class Extractor(abc.ABC):
+    """Base class for per-file extractors.
+
+    ``patterns`` are shell-style patterns matched against the lower-case file
+    name and ``categories`` are substrings of the lower-case category (top
+    folder); an empty tuple matches anything, but an extractor must declare
+    at least one of the two. ``accepts`` makes a final check against the
+    headers, so a file whose columns do not fit falls back to the generic
+    extractor.
+    """
+
+    name = "base"
+    patterns: Tuple[str, ...] = ()
+    categories: Tuple[str, ...] = ()
+
+    def accepts(self, ctx: FileContext) -> bool:
+        return True
+
+    @abc.abstractmethod
+    def extract(self, ctx: FileContext, rows: Iterable[Row]) -> None:
+        """Read ``rows`` into ``ctx``'s local results."""
+
+
+class ExtractorRegistry:
+    """Extractors keyed by file name pattern and category, compiled into a dispatch table.
+
+    Registration order is priority order. The table (one compiled regex per
+    extractor) is built on first use after a registration; files that no
+    specialized extractor accepts go to the fallback.
+    """
+
+    def __init__(self):
+        self._extractors: List[Extractor] = []
+        self._fallback: Optional[Extractor] = None
+        self._table: Optional[List[Tuple[Optional[Pattern[str]], Tuple[str, ...], Extractor]]] = None
+
+    def register(self, extractor: Extractor, fallback: bool = False) -> Extractor:
+        if fallback:
+            self._fallback = extractor
+        else:
+            if not extractor.patterns and not extractor.categories:
+                raise ValueError(f"Extractor {extractor.name!r} declares no file patterns or categories")
+            self._extractors.append(extractor)
+        self._table = None
+        return extractor
+
+    def extractors(self) -> List[Extractor]:
+        return list(self._extractors)
+
+    def _compile(self) -> List[Tuple[Optional[Pattern[str]], Tuple[str, ...], Extractor]]:
+        table = []
+        for ext in self._extractors:
+            regex = re.compile("|".join(fnmatch.translate(p.lower()) for p in ext.patterns)) if ext.patterns else None
+            table.append((regex, tuple(c.lower() for c in ext.categories), ext))
+        return table
+
+    def select(self, ctx: FileContext) -> Extractor:
+        table = self._table
+        if table is None:
+            table = self._table = self._compile()
+        category = ctx.category.lower()
+        for regex, categories, ext in table:
+            if regex is not None and not regex.match(ctx.name):
+                continue
+            if categories and not any(c in category for c in categories):
+                continue
+            if ext.accepts(ctx):
+                return ext
+        if self._fallback is None:
+            raise LookupError("No fallback extractor registered")
+        return self._fallback
+
+
+# Registry used by the distiller; extractors registered at import time are visible in worker processes
+REGISTRY = ExtractorRegistry()
+
+
+def register_extractor(cls):
+    """Class decorator: register an instance of ``cls`` with ``REGISTRY``.
+
+    Specialized extractors registered later take priority only after the
+    built-in ones; register in a module imported by the distiller so worker
+    processes see it too.
+    """
+    REGISTRY.register(cls())
+    return cls
+
+
+def _matching_headers(headers: Sequence[str], keywords: Sequence[str]) -> List[str]:
+    kw = [k.lower() for k in keywords]
+    return [h for h in headers if any(k in h.lower() for k in kw)]
+
+
+class SessionColumns:
+    """Session column lookups, resolved once per file from the header line.
+
+    Each field lists the headers matching its keywords in header order; a
+    row's value is the first non-empty one, as ``first_value`` would return.
+    """
+
+    _FIELDS = {
+        "start": ["start datetime", "start date time", "start date", "start time", "start"],
+        "end": ["end datetime", "end date time", "end date", "end time", "finish", "end"],
+        "start_date": ["start date", "date"],
+        "date_start": ["date start"],
+        "start_time": ["start time", "time start", "time"],
+        "end_date": ["end date"],
+        "date_end": ["date end"],
+        "end_time": ["end time", "time end"],
+        "duration": ["duration", "length", "elapsed time"],
+        "minutes": ["minutes"],
+        "type": ["activity type", "activity name", "activity", "exercise", "exercise name", "workout", "sport",
+                 "type"],
+        "calories": ["calories", "calorie", "kcal", "energy"],
+        "dist_mm": ["distance_mm", "distance (mm)", "tracker_total_distance_mm", "traveled_distance_mm"],
+        "dist_m": ["distance_m", "distance (m)", "meters", "metres"],
+        "distance": ["distance", "km", "kilometer", "kilometre", "miles", "mi"],
+        "steps": ["steps", "step count", "stepcount", "step"],
+        "avg_hr": ["average heart", "avg heart", "avg hr", "average hr", "avg bpm", "average bpm", "mean hr"],
+        "max_hr": ["max heart", "max hr", "peak heart", "max bpm"],
+        "elev_mm": ["elevation_gain_mm", "altitude_gain_mm", "tracker_total_altitude_mm", "elevation_mm",
+                    "elevation gain (mm)"],
+        "elev": ["elevation gain", "elevation (m)", "elevation gain (m)", "elevation gain (ft)", "elev gain",
+                 "ascent", "climb"],
+        "azm_total": ["active zone minutes", "azm", "zone minutes"],
+        "azm_fat": ["fat burn minutes", "azm - fat burn", "active zone minutes - fat burn", "fat burn zone minutes",
+                    "fat burn"],
+        "azm_cardio": ["cardio minutes", "azm - cardio", "active zone minutes - cardio", "cardio zone minutes",
+                       "cardio"],
+        "azm_peak": ["peak minutes", "azm - peak", "active zone minutes - peak", "peak zone minutes", "peak"],
+    }
+
+    def __init__(self, headers: Sequence[str]):
+        self.columns: Dict[str, List[str]] = {f: _matching_headers(headers, kw) for f, kw in self._FIELDS.items()}
+
+    def text(self, row: Row, field: str) -> Optional[str]:
+        for h in self.columns[field]:
+            v = row.get(h)
+            if v is not None and str(v).strip() != "":
+                return v
+        return None
+
+    def number(self, row: Row, field: str) -> Optional[float]:
+        v = self.text(row, field)
+        return to_float(v) if v is not None else None
+
+
+def add_session(ctx: FileContext, cols: SessionColumns, row: Row, date_str: Optional[str]
+                ) -> Tuple[Optional[str], Optional[int]]:
+    """Extract a session from ``row`` into ``ctx``.
+
+    Returns the row date (from the start time if missing) and the session's
+    dedup key, or None when the row holds no session.
+    """
+    # Start/end datetime parsing with flexible sources
+    start_dt: Optional[dt.datetime] = None
+    end_dt: Optional[dt.datetime] = None
+    start_candidates = [cols.text(row, "start")]
+    end_candidates = [cols.text(row, "end")]
+    sd = cols.text(row, "start_date") or cols.text(row, "date_start")
+    st = cols.text(row, "start_time")
+    ed = cols.text(row, "end_date") or cols.text(row, "date_end")
+    et = cols.text(row, "end_time")
+
+    for cand in start_candidates:
+        if cand:
+            start_dt = parse_datetime_value(cand)
+            if start_dt:
+                break
+    if not start_dt and sd and st:
+        start_dt = parse_datetime_value(f"{sd} {st}") or parse_datetime_value(sd) or parse_datetime_value(st)
+    if not start_dt and sd:
+        start_dt = parse_datetime_value(sd)
+
+    for cand in end_candidates:
+        if cand:
+            end_dt = parse_datetime_value(cand)
+            if end_dt:
+                break
+    if not end_dt and ed and et:
+        end_dt = parse_datetime_value(f"{ed} {et}") or parse_datetime_value(ed) or parse_datetime_value(et)
+    if not end_dt and ed:
+        end_dt = parse_datetime_value(ed)
+
+    # Duration
+    dur_field = cols.text(row, "duration") or cols.text(row, "minutes")
+    duration_min = parse_duration_to_minutes(dur_field) if dur_field else None
+    if duration_min is None and start_dt and end_dt:
+        try:
+            duration_min = max((end_dt - start_dt).total_seconds() / 60.0, 0.0)
+        except (TypeError, OverflowError):
+            duration_min = None
+
+    # Activity type / name
+    activity_type = cols.text(row, "type")
+
+    # Key metrics
+    calories = cols.number(row, "calories")
+    dist_mm = cols.number(row, "dist_mm")
+    if dist_mm is not None:
+        distance = dist_mm / 1_000_000.0  # km from mm
+    else:
+        dist_m = cols.number(row, "dist_m")
+        if dist_m is not None:
+            distance = dist_m / 1000.0
+        else:
+            distance = cols.number(row, "distance")  # unit unknown
+    steps_v = cols.number(row, "steps")
+    avg_hr = cols.number(row, "avg_hr")
+    max_hr = cols.number(row, "max_hr")
+    elev_mm = cols.number(row, "elev_mm")
+    if elev_mm is not None:
+        elev_gain = elev_mm / 1000.0
+    else:
+        elev_gain = cols.number(row, "elev")
+    azm_total = cols.number(row, "azm_total")
+    azm_fat = cols.number(row, "azm_fat")
+    azm_cardio = cols.number(row, "azm_cardio")
+    azm_peak = cols.number(row, "azm_peak")
+
+    # Determine session date for aggregation
+    if not date_str and start_dt:
+        date_str = start_dt.date().isoformat()
+
+    # Identity of the session across export variants
+    session_key = contribution_key(
+        "session",
+        start_dt.replace(tzinfo=None).isoformat() if start_dt else (date_str or ""),
+        value_source(ctx.category, (activity_type or "").lower()),
+    )
+
+    # Emit session record (buffer for later enrichment/write)
+    if start_dt or end_dt or duration_min is not None or activity_type:
+        rec = {
+            "date": date_str,
+            "start": start_dt.isoformat() if start_dt else None,
+            "end": end_dt.isoformat() if end_dt else None,
+            "duration_min": round(duration_min, 3) if isinstance(duration_min, (int, float)) else None,
+            "type": activity_type,
+            "calories": calories,
+            "distance": distance,
+            "steps": steps_v,
+            "avg_hr": avg_hr,
+            "max_hr": max_hr,
+            "elevation_gain_m": elev_gain,
+            "azm_minutes": azm_total,
+            "azm_fat_burn_minutes": azm_fat,
+            "azm_cardio_minutes": azm_cardio,
+            "azm_peak_minutes": azm_peak,
+            "category": ctx.category,
+            "source_path": ctx.rel_path,
+        }
+        public = {k: v for k, v in rec.items() if v is not None}
+        # Internal fields for the enrichment phase
+        public["_start_dt"] = start_dt
+        public["_end_dt"] = end_dt
+        public["_dedup_key"] = session_key
+        ctx.local_sessions.append(public)
+    else:
+        session_key = None
+
+    # Aggregate to daily workout metrics
+    if date_str and duration_min is not None:
+        if ctx.dedup:
+            ctx.local_contrib.add_keyed(date_str, "workout_minutes", session_key, float(duration_min))
+            ctx.local_contrib.add_keyed(date_str, "workout_count", session_key, 1.0)
+        else:
+            aggregate_value(ctx.local_daily, date_str, "workout_minutes", float(duration_min))
+            aggregate_value(ctx.local_daily, date_str, "workout_count", 1.0)
+    return date_str, session_key
+
+
+class GenericExtractor(Extractor):
+    """Fallback for any file: date inference, session extraction and metric columns per row."""
+
+    name = "generic"
+
+    def extract(self, ctx: FileContext, rows: Iterable[Row]) -> None:
+        hr_ts_k = ctx.hr_ts_col if ctx.hr_bpm_col else None
+        if hr_ts_k:
+            ctx.date_precision = "datetime"
+        cols = SessionColumns(ctx.headers) if ctx.file_class == "session" else None
+        for row in rows:
+            ctx.row_count += 1
+            date_str: Optional[str] = None
+            if hr_ts_k:
+                ts = parse_datetime_value(row.get(hr_ts_k))
+                if isinstance(ts, dt.datetime):
+                    date_str = ts.date().isoformat()
+            if not date_str:
+                date_str = ctx.row_date(row)
+            session_key: Optional[int] = None
+            if cols is not None:
+                date_str, session_key = add_session(ctx, cols, row, date_str)
+            if date_str:
+                ctx.see_date(date_str)
+                ctx.add_metrics(row, date_str, session_key)
+
+
+@register_extractor
+class HeartRateExtractor(Extractor):
+    """heart_rate_* intraday files: only dates and any metric columns (the samples are read as a series)."""
+
+    name = "heart_rate"
+    patterns = ("heart_rate_*.csv",)
+
+    def accepts(self, ctx: FileContext) -> bool:
+        return bool(ctx.hr_ts_col and ctx.hr_bpm_col) and ctx.file_class != "session"
+
+    def extract(self, ctx: FileContext, rows: Iterable[Row]) -> None:
+        ts_k = ctx.hr_ts_col
+        ctx.date_precision = "datetime"
+        has_metrics = bool(ctx.metric_columns)
+        count = 0
+        last_day: Optional[dt.date] = None
+        day_str: Optional[str] = None
+        for row in rows:
+            count += 1
+            ts = parse_datetime_value(row.get(ts_k))
+            if isinstance(ts, dt.datetime):
+                day = ts.date()
+                if day != last_day:
+                    last_day, day_str = day, day.isoformat()
+                    ctx.see_date(day_str)
+                date_str: Optional[str] = day_str
+            else:
+                date_str = ctx.row_date(row)
+                if date_str:
+                    ctx.see_date(date_str)
+            if date_str and has_metrics:
+                ctx.add_metrics(row, date_str)
+        ctx.row_count += count
+
+
+class _TimestampedMetricExtractor(Extractor):
+    """Metric-only files with one date/time column: no session or HR checks per row."""
+
+    def accepts(self, ctx: FileContext) -> bool:
+        return ctx.date_col is not None and ctx.file_class in ("metric", "timeseries") and not (ctx.hr_ts_col and ctx.hr_bpm_col)
+
+    def extract(self, ctx: FileContext, rows: Iterable[Row]) -> None:
+        date_col = ctx.date_col
+        count = 0
+        last_raw: Optional[str] = None
+        last_str: Optional[str] = None
+        for row in rows:
+            count += 1
+            raw = row.get(date_col)
+            # Consecutive rows usually share a date prefix; reuse the parse when the value repeats
+            if raw != last_raw or last_str is None:
+                last_raw = raw
+                d = parse_date_value(raw)
+                last_str = d.isoformat() if d else None
+                if d:
+                    ctx.note_date_cell(raw)
+            date_str = last_str or ctx.row_date(row)
+            if date_str:
+                ctx.see_date(date_str)
+                ctx.add_metrics(row, date_str)
+        ctx.row_count += count
+
+
+class _SingleMetricExtractor(_TimestampedMetricExtractor):
+    """Daily files for one metric (``metric``); files without a column for it fall back."""
+
+    metric = ""
+
+    def accepts(self, ctx: FileContext) -> bool:
+        return super().accepts(ctx) and any(mk == self.metric for _, mk in ctx.metric_columns)
+
+
+@register_extractor
+class StepsExtractor(_SingleMetricExtractor):
+    """steps_* files: step counts per day or per timestamp."""
+
+    name = "steps"
+    patterns = ("steps.csv", "steps_*.csv", "steps-*.csv")
+    metric = "steps"
+
+
+@register_extractor
+class CaloriesExtractor(_SingleMetricExtractor):
+    """calories_* files: calories burned per day or per timestamp."""
+
+    name = "calories"
+    patterns = ("calories.csv", "calories_*.csv", "calories-*.csv")
+    metric = "calories"
+
+
+@register_extractor
+class RestingHeartRateExtractor(_SingleMetricExtractor):
+    """Daily resting heart rate files."""
+
+    name = "resting_heart_rate"
+    patterns = ("*resting_heart_rate*.csv", "*resting heart rate*.csv", "*rhr*.csv")
+    metric = "resting_heart_rate"
+
+
+@register_extractor
+class LivePaceExtractor(_TimestampedMetricExtractor):
+    """live_pace_* intraday files: steps and distance per timestamp."""
+
+    name = "live_pace"
+    patterns = ("live_pace_*.csv",)
+
+
+@register_extractor
+class SleepExtractor(_TimestampedMetricExtractor):
+    """Sleep logs and scores (never sessions): one metric row per log."""
+
+    name = "sleep"
+    categories = ("sleep",)
+
+
+@register_extractor
+class ExerciseExtractor(Extractor):
+    """Exercise/activity session logs: one session per row plus its metric columns."""
+
+    name = "exercise"
+    patterns = ("exercise*.csv", "*activit*.csv", "*workout*.csv")
+
+    def accepts(self, ctx: FileContext) -> bool:
+        return ctx.file_class == "session" and not (ctx.hr_ts_col and ctx.hr_bpm_col)
+
+    def extract(self, ctx: FileContext, rows: Iterable[Row]) -> None:
+        cols = SessionColumns(ctx.headers)
+        count = 0
+        for row in rows:
+            count += 1
+            date_str, session_key = add_session(ctx, cols, row, ctx.row_date(row))
+            if date_str:
+                ctx.see_date(date_str)
+                ctx.add_metrics(row, date_str, session_key)
+        ctx.row_count += count
+
+
+GENERIC_EXTRACTOR = REGISTRY.register(GenericExtractor(), fallback=True)
+
+
+def run_extractor(ctx: FileContext, rows: Iterable[Row], registry: Optional[ExtractorRegistry] = None) -> Extractor:
+    """Run the extractor selected for ``ctx`` over ``rows``; returns the extractor used."""
+    extractor = (registry or REGISTRY).select(ctx)
+    extractor.extract(ctx, rows)
+    return extractor
@@ -0,0 +1,187 @@
+from __future__ import annotations
+
+import csv
+import datetime as dt
+import os
+from typing import Dict, List, Optional, Tuple
+
+from .csv_reader import count_data_rows, detect_csv_format
+from .dedup import has_time_of_day
+from .heuristics import categorize_path, classify_headers, infer_date_column
+from .utils import parse_date_value
+
+# Bytes read from the end of a file to find its last rows
+TAIL_BYTES = 64 * 1024
+
+
+def _parse_line(raw: bytes, encoding: str, delimiter: str) -> List[str]:
+    text = raw.decode(encoding, errors="ignore").strip("\r\n")
+    if not text.strip():
+        return []
+    try:
+        return next(csv.reader([text], delimiter=delimiter))
+    except (csv.Error, StopIteration):
+        return []
+
+
+def _cell_date(cells: List[str], col: Optional[int]) -> Optional[dt.date]:
+    if col is None or col >= len(cells):
+        return None
+    return parse_date_value(cells[col])
+
+
+def _head_rows(f, encoding: str, delimiter: str, limit: int = 2) -> Tuple[List[List[str]], int]:
+    """Return the first ``limit`` data rows and the byte offset where data starts."""
+    f.seek(0)
+    rows: List[List[str]] = []
+    data_start = 0
+    header_seen = False
+    while len(rows) < limit:
+        line = f.readline()
+        if not line:
+            break
+        cells = _parse_line(line, encoding, delimiter)
+        if not cells:
+            continue
+        if not header_seen:
+            header_seen = True
+            data_start = f.tell()
+            continue
+        rows.append(cells)
+    return rows, data_start
+
+
+def _tail_rows(f, encoding: str, delimiter: str, size: int, limit: int = 2) -> List[List[str]]:
+    """Return up to ``limit`` last data rows, last row first."""
+    f.seek(max(0, size - TAIL_BYTES))
+    block = f.read()
+    lines = block.split(b"\n")
+    if size > TAIL_BYTES:
+        lines = lines[1:]  # first line is partial
+    rows: List[List[str]] = []
+    for line in reversed(lines):
+        cells = _parse_line(line, encoding, delimiter)
+        if cells:
+            rows.append(cells)
+            if len(rows) >= limit:
+                break
+    return rows
+
+
+def _sample_dates(f, encoding: str, delimiter: str, col: int, start: int, end: int,
+                  samples: int) -> List[Optional[dt.date]]:
+    """Dates of rows found at evenly spaced byte offsets in ``[start, end)``."""
+    out: List[Optional[dt.date]] = []
+    span = end - start
+    if span <= 0:
+        return out
+    for i in range(1, samples + 1):
+        f.seek(start + span * i // (samples + 1))
+        f.readline()  # skip to the next full line
+        line = f.readline()
+        if not line:
+            continue
+        out.append(_cell_date(_parse_line(line, encoding, delimiter), col))
+    return out
+
+
+def _scan_date_range(path: str, encoding: str, delimiter: str, col: int
+                     ) -> Tuple[Optional[str], Optional[str]]:
+    """Full scan of a single date column (used when the file is not ordered)."""
+    min_date: Optional[str] = None
+    max_date: Optional[str] = None
+    with open(path, "r", encoding=encoding, errors="ignore", newline="") as tf:
+        reader = csv.reader(tf, delimiter=delimiter)
+        header_seen = False
+        for row in reader:
+            if not row or all(not c.strip() for c in row):
+                continue
+            if not header_seen:
+                header_seen = True
+                continue
+            d = _cell_date(row, col)
+            if d is None:
+                continue
+            ds = d.isoformat()
+            if min_date is None or ds < min_date:
+                min_date = ds
+            if max_date is None or ds > max_date:
+                max_date = ds
+    return min_date, max_date
+
+
+def fast_index_record(csv_path: str, input_root: str, samples: int = 8) -> Dict[str, object]:
+    """Build a files-index record from raw bytes, without a per-row parse.
+
+    ``row_count`` is a buffered newline count. ``date_range`` comes from the
+    first and last rows when a sample of rows at evenly spaced offsets
+    confirms the file is ordered by date (ascending or descending); otherwise
+    only the date column is scanned. ``date_precision`` is ``"datetime"``
+    when the first or last rows carry a time of day. ``metric_hits`` is left
+    empty.
+    """
+    category = categorize_path(str(csv_path))
+    rel_path = os.path.relpath(csv_path, start=input_root)
+    errors: List[str] = []
+    try:
+        fmt = detect_csv_format(str(csv_path))
+    except Exception as e:
+        fmt = None
+        errors.append(str(e))
+    headers = fmt.headers if fmt else []
+    encoding_used = fmt.encoding if fmt else None
+    date_col = infer_date_column(headers) if headers else None
+    size = os.path.getsize(csv_path)
+    record: Dict[str, object] = {
+        "path": rel_path,
+        "category": category,
+        "size_bytes": size,
+        "file_class": classify_headers(headers, category, rel_path),
+        "encoding": encoding_used,
+        "columns": headers,
+        "row_count": count_data_rows(str(csv_path)) if headers else 0,
+        "date_column": date_col,
+        "date_range": {"min": None, "max": None},
+        "date_range_method": None,
+        "date_precision": None,
+        "metric_hits": {},
+        "errors": errors,
+    }
+    if not headers or not encoding_used:
+        return record
+
+    with open(csv_path, "rb") as f:
+        delimiter = fmt.delimiter
+        head, data_start = _head_rows(f, encoding_used, delimiter)
+        tail = _tail_rows(f, encoding_used, delimiter, size)
+        if not head or not tail:
+            return record
+
+        # Pick the date column once: the inferred one, else the first cell of
+        # the first row that parses as a date.
+        col: Optional[int] = headers.index(date_col) if date_col in headers else None
+        if _cell_date(head[0], col) is None:
+            col = next((i for i in range(len(head[0])) if _cell_date(head[0], i)), None)
+        if col is None:
+            return record
+
+        edge_cells = [row[col] for row in head + tail if col < len(row)]
+        record["date_precision"] = "datetime" if any(has_time_of_day(c) for c in edge_cells) else "date"
+        first = _cell_date(head[0], col)
+        last = _cell_date(tail[0], col)
+        sampled = _sample_dates(f, encoding_used, delimiter, col, data_start, size, samples)
+
+    seq = [first] + sampled + [last]
+    if all(d is not None for d in seq):
+        ascending = all(a <= b for a, b in zip(seq, seq[1:]))
+        descending = all(a >= b for a, b in zip(seq, seq[1:]))
+        if ascending or descending:
+            lo, hi = (first, last) if ascending else (last, first)
+            record["date_range"] = {"min": lo.isoformat(), "max": hi.isoformat()}
+            record["date_range_method"] = "head-tail"
+            return record
+
+    min_date, max_date = _scan_date_range(str(csv_path), encoding_used, delimiter, col)
+    record["date_range"] = {"min": min_date, "max": max_date}
+    record["date_range_method"] = "scan"
+    return record
@@ -63,3 +63,20 @@ def is_session_headers(headers: List[str], category: str) -> bool:
     has_type = any(any(k in h for k in ["activity", "exercise", "workout", "sport"]) for h in lh)
     # Avoid broad category fallbacks that include 'Activity Goals'
     return (has_start and (has_end or has_duration)) and (has_type or "mindfulness" in cat)
+
+
+# Per-file classes decided from the header line alone
+FILE_CLASSES = ("metric", "session", "timeseries", "irrelevant")
+
+
+def classify_headers(headers: List[str], category: str, rel_path: str = "") -> str:
+    """Classify a CSV from its header line without reading any data rows."""
+    if not headers:
+        return "irrelevant"
+    if is_session_headers(headers, category) and "sedentary_period" not in rel_path.lower():
+        return "session"
+    if any(match_metric_key(h, category) for h in headers):
+        return "metric"
+    if infer_date_column(headers):
+        return "timeseries"
+    return "irrelevant"
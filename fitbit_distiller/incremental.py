@@ -0,0 +1,300 @@
+from __future__ import annotations
+
+import datetime as dt
+from bisect import bisect_left
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from .aggregation import aggregate_value, finalize_daily
+from .dedup import Contributions, contributions_to_agg, merge_contributions
+from .reduction import PartialAggregate
+from .rollups import rollup_day
+from .serialization import Serializer, public_fields
+from .series import HrSeries, PaceSeries, epoch_seconds
+from .sessions import AUTO_SESSION_GAP_ALLOW_SEC, detect_pace_sessions, enrich_session
+from .sketches import HrHistogram, hr_daily_fields, hr_day_sketch
+
+_DAY_SEC = 24 * 60 * 60
+
+# day -> {file path: index range of the file's samples on that day}
+DayIndex = Dict[str, Dict[str, Tuple[int, int]]]
+
+
+def _partial_dates(partial: PartialAggregate) -> Set[str]:
+    return set(partial.daily) | set(partial.contrib)
+
+
+def _day_ordinal(day: str) -> int:
+    return int(epoch_seconds(dt.datetime.strptime(day, "%Y-%m-%d"))) // _DAY_SEC
+
+
+class WatchState:
+    """--watch results per file, with the outputs recomputed only where a change lands.
+
+    Keeps each file's partial aggregate and sorted series, the merged series
+    and the finished per-date daily records and encoded per-day rollup lines.
+    ``update`` replaces the state of changed and removed files, then
+    recomputes the daily records of the dates their old and new versions
+    touch, the merged series and rollups of the days their samples fall on,
+    auto-detected sessions around those days and the enrichment of sessions
+    overlapping them. Everything else is reused, and the results equal a
+    full merge of the per-file state in path order.
+    """
+
+    def __init__(self, dedup: bool, max_hr: float, rollup_resolutions: Iterable[str], serializer: Serializer):
+        self.dedup = dedup
+        self.max_hr = max_hr
+        self.rollup_resolutions = list(rollup_resolutions)
+        self.serializer = serializer
+        self.hr_series = HrSeries()
+        self.pace_series = PaceSeries()
+        self.session_records: List[Dict[str, object]] = []
+        self._partials: Dict[str, PartialAggregate] = {}
+        self._series: Dict[str, Tuple[HrSeries, PaceSeries]] = {}
+        # date -> files whose partial has values for it
+        self._date_files: Dict[str, Set[str]] = {}
+        self._hr_days: DayIndex = {}
+        self._pace_days: DayIndex = {}
+        self._hr_ranges: Dict[str, Tuple[int, int]] = {}
+        self._pace_ranges: Dict[str, Tuple[int, int]] = {}
+        self._daily: Dict[str, Dict[str, float]] = {}
+        # day -> HR histogram of the merged series
+        self._hr_sketches: Dict[str, HrHistogram] = {}
+        # day -> resolution -> encoded rollup lines
+        self._rollups: Dict[str, Dict[str, List[bytes]]] = {}
+        self._auto_sessions: List[Dict[str, object]] = []
+        # id(session) -> (session, enriched public record)
+        self._enriched: Dict[int, Tuple[Dict[str, object], Dict[str, object]]] = {}
+
+    def update(self, partials: Dict[str, PartialAggregate], series: Dict[str, Tuple[HrSeries, PaceSeries]],
+               removed: Iterable[str] = ()):
+        """Replace the state of the files in ``partials``/``series``, drop ``removed`` files, and recompute."""
+        dates: Set[str] = set()
+        hr_days: Set[str] = set()
+        pace_days: Set[str] = set()
+        for path in removed:
+            dates |= self._drop_partial(path)
+            self._drop_series(path, hr_days, pace_days)
+        for path, partial in partials.items():
+            dates |= self._drop_partial(path)
+            self._partials[path] = partial
+            for date in _partial_dates(partial):
+                self._date_files.setdefault(date, set()).add(path)
+                dates.add(date)
+        for path, (hr, pace) in series.items():
+            self._drop_series(path, hr_days, pace_days)
+            hr.sort()
+            pace.sort()
+            self._series[path] = (hr, pace)
+            for index, file_series, days in ((self._hr_days, hr, hr_days), (self._pace_days, pace, pace_days)):
+                for day, rng in file_series.day_ranges().items():
+                    index.setdefault(day, {})[path] = rng
+                    days.add(day)
+
+        if hr_days:
+            self.hr_series, self._hr_ranges = self._merge_series(self.hr_series, self._hr_ranges,
+                                                                 self._hr_days, hr_days, 0)
+            dates |= self._refresh_hr_sketches(hr_days)
+        if pace_days:
+            self.pace_series, self._pace_ranges = self._merge_series(self.pace_series, self._pace_ranges,
+                                                                     self._pace_days, pace_days, 1)
+        for date in dates:
+            self._refresh_daily(date)
+        if self.rollup_resolutions:
+            for day in hr_days | pace_days:
+                self._refresh_rollups(day)
+        if pace_days:
+            self._redetect_sessions(pace_days)
+        self._refresh_sessions(hr_days | pace_days)
+
+    def index_records(self) -> List[Dict[str, object]]:
+        return [rec for path in sorted(self._partials) for rec in self._partials[path].index_records]
+
+    def daily_records(self) -> List[Dict[str, float]]:
+        """Plain daily records in date order (copies, so trend fields can be added to them)."""
+        return [dict(self._daily[date]) for date in sorted(self._daily)]
+
+    def rollup_days(self) -> Iterator[Dict[str, List[bytes]]]:
+        for day in sorted(self._rollups):
+            yield self._rollups[day]
+
+    def _drop_partial(self, path: str) -> Set[str]:
+        partial = self._partials.pop(path, None)
+        if partial is None:
+            return set()
+        dates = _partial_dates(partial)
+        for date in dates:
+            files = self._date_files.get(date)
+            if files is not None:
+                files.discard(path)
+                if not files:
+                    del self._date_files[date]
+        return dates
+
+    def _drop_series(self, path: str, hr_days: Set[str], pace_days: Set[str]):
+        if self._series.pop(path, None) is None:
+            return
+        for index, days in ((self._hr_days, hr_days), (self._pace_days, pace_days)):
+            for day in [d for d, files in index.items() if path in files]:
+                del index[day][path]
+                if not index[day]:
+                    del index[day]
+                days.add(day)
+
+    def _refresh_daily(self, date: str):
+        # Same merge as PartialAggregate.merge in path order, restricted to one date
+        agg: Dict[str, Dict[str, float]] = {}
+        contrib: Contributions = {}
+        for path in sorted(self._date_files.get(date, ())):
+            partial = self._partials[path]
+            values = partial.daily.get(date)
+            if values is not None:
+                day = agg.setdefault(date, {})
+                for key, value in values.items():
+                    day[key] = day.get(key, 0.0) + value
+            if date in partial.contrib:
+                merge_contributions(contrib, {date: partial.contrib[date]})
+        contributions_to_agg(contrib, agg)
+        if date in self._hr_sketches:
+            for key, value in hr_daily_fields(self._hr_sketches[date], self.max_hr).items():
+                aggregate_value(agg, date, key, value)
+        records = finalize_daily(agg)
+        if records:
+            self._daily[date] = records[0]
+        else:
+            self._daily.pop(date, None)
+
+    def _refresh_hr_sketches(self, days: Set[str]) -> Set[str]:
+        """Recompute the HR histograms of ``days`` and of the day before each; returns those dates.
+
+        The day before is included because its last sample is weighted by
+        the gap to the first sample of the next day.
+        """
+        touched = set(days)
+        touched.update((dt.date.fromisoformat(day) - dt.timedelta(days=1)).isoformat() for day in days)
+        for day in touched:
+            rng = self._hr_ranges.get(day)
+            if rng is None:
+                self._hr_sketches.pop(day, None)
+            else:
+                self._hr_sketches[day] = hr_day_sketch(self.hr_series, *rng)
+        return touched
+
+    def _merge_series(self, merged, ranges: Dict[str, Tuple[int, int]], index: DayIndex, days: Set[str],
+                      column: int):
+        """``merged`` with ``days`` rebuilt from the files (``column`` picks hr/pace), and its day ranges.
+
+        A day's samples are the files' samples of that day in path order,
+        stably sorted by time - the same order as sorting the concatenation
+        of all files. Only ``days`` are rebuilt and spliced into ``merged``
+        in place; the other days' samples are not copied.
+        """
+        # Latest day first, so the ranges of the days before it stay valid
+        for day in sorted(days, reverse=True):
+            day_series = type(merged)()
+            files = index.get(day, {})
+            for path in sorted(files):
+                lo, hi = files[path]
+                day_series.extend(self._series[path][column], lo, hi)
+            day_series.sort()
+            if day in ranges:
+                lo, hi = ranges[day]
+            else:
+                lo = hi = bisect_left(merged.times, _day_ordinal(day) * _DAY_SEC)
+            merged.splice(lo, hi, day_series)
+        return merged, merged.day_ranges()
+
+    def _refresh_rollups(self, day: str):
+        hr_range = self._hr_ranges.get(day)
+        pace_range = self._pace_ranges.get(day)
+        if hr_range is None and pace_range is None:
+            self._rollups.pop(day, None)
+            return
+        day_rollups = rollup_day(day, self.hr_series if hr_range else None, self.pace_series if pace_range else None,
+                                 self.rollup_resolutions, hr_range, pace_range)
+        self._rollups[day] = {label: [self.serializer(rec) for rec in records]
+                              for label, records in day_rollups.items()}
+
+    def _file_sessions(self) -> List[Dict[str, object]]:
+        sessions: List[Dict[str, object]] = []
+        seen: Set[int] = set()
+        for path in sorted(self._partials):
+            for rec in self._partials[path].sessions:
+                key = rec.get("_dedup_key")
+                if self.dedup and key is not None:
+                    if key in seen:
+                        continue
+                    seen.add(key)
+                sessions.append(rec)
+        return sessions
+
+    def _redetect_sessions(self, pace_days: Set[str]):
+        """Re-run pace session detection over the stretches of the series around ``pace_days``.
+
+        Detection restarts after any gap longer than the allowed inactivity,
+        so a stretch is cut at such gaps between samples of unaffected days;
+        sessions outside the stretches are the same as before.
+        """
+        times = self.pace_series.times
+        n = len(times)
+        affected = sorted(_day_ordinal(day) for day in pace_days)
+
+        def is_reset(i: int) -> bool:
+            # Detection restarts at sample i (0 < i < n), and no affected day lies between it and its predecessor
+            if times[i] - times[i - 1] <= AUTO_SESSION_GAP_ALLOW_SEC:
+                return False
+            j = bisect_left(affected, times[i - 1] // _DAY_SEC)
+            return j == len(affected) or affected[j] > times[i] // _DAY_SEC
+
+        windows: List[Tuple[int, int]] = []
+        for ordinal in affected:
+            lo = bisect_left(times, ordinal * _DAY_SEC)
+            hi = bisect_left(times, (ordinal + 1) * _DAY_SEC)
+            while lo > 0 and not (lo < n and is_reset(lo)):
+                lo -= 1
+            while hi < n and not (hi > 0 and is_reset(hi)):
+                hi += 1
+            if windows and lo <= windows[-1][1]:
+                windows[-1] = (windows[-1][0], max(hi, windows[-1][1]))
+            else:
+                windows.append((lo, hi))
+
+        file_sessions = self._file_sessions()
+        bounds = [(times[lo] if lo > 0 else None, times[hi] if hi < n else None) for lo, hi in windows]
+
+        def outside(rec: Dict[str, object]) -> bool:
+            t = epoch_seconds(rec["_start_dt"])
+            return not any((t0 is None or t >= t0) and (t1 is None or t < t1) for t0, t1 in bounds)
+
+        sessions = [rec for rec in self._auto_sessions if outside(rec)]
+        for lo, hi in windows:
+            stretch = PaceSeries()
+            stretch.extend(self.pace_series, lo, hi)
+            sessions.extend(detect_pace_sessions(stretch, file_sessions))
+        sessions.sort(key=lambda rec: epoch_seconds(rec["_start_dt"]))
+        self._auto_sessions = sessions
+
+    def _refresh_sessions(self, days: Set[str]):
+        """Session records: file sessions in path order, then auto-detected ones, enriched where needed."""
+        changed_days = sorted(days)
+
+        def overlaps(rec: Dict[str, object]) -> bool:
+            start, end = rec.get("_start_dt"), rec.get("_end_dt")
+            if not (isinstance(start, dt.datetime) and isinstance(end, dt.datetime)):
+                return False
+            first = start.replace(tzinfo=None).date().isoformat()
+            last = end.replace(tzinfo=None).date().isoformat()
+            i = bisect_left(changed_days, first)
+            return i < len(changed_days) and changed_days[i] <= last
+
+        enriched: Dict[int, Tuple[Dict[str, object], Dict[str, object]]] = {}
+        records: List[Dict[str, object]] = []
+        for rec in self._file_sessions() + self._auto_sessions:
+            cached: Optional[Tuple[Dict[str, object], Dict[str, object]]] = self._enriched.get(id(rec))
+            if cached is not None and cached[0] is rec and not overlaps(rec):
+                out = cached[1]
+            else:
+                out = public_fields(enrich_session(rec, self.hr_series, self.pace_series))
+            enriched[id(rec)] = (rec, out)
+            records.append(out)
+        self._enriched = enriched
+        self.session_records = records
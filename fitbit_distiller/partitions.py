@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from .serialization import Serializer
+from .utils import ensure_dir, write_bytes_atomic
+
+# Partitioned layout: <output>/<dataset>/year=YYYY/month=MM/part.jsonl
+PARTITION_FILE = "part.jsonl"
+PARTITION_LAYOUT = "year=YYYY/month=MM"
+# Partition value for records without a usable date
+UNKNOWN_PARTITION = "unknown"
+MANIFEST_NAME = "fitbit_manifest.json"
+
+PartitionEntry = Dict[str, object]
+
+
+def partition_of(date: Optional[object]) -> Tuple[str, str]:
+    """(year, month) of a ``YYYY-MM-DD`` date string; undated records go to the unknown partition."""
+    if isinstance(date, str) and len(date) >= 7 and date[:4].isdigit() and date[5:7].isdigit():
+        return date[:4], date[5:7]
+    return UNKNOWN_PARTITION, UNKNOWN_PARTITION
+
+
+def partition_relpath(dataset: str, year: str, month: str) -> str:
+    """Path of a partition file relative to the output root, with '/' separators."""
+    return f"{dataset}/year={year}/month={month}/{PARTITION_FILE}"
+
+
+def write_partitions(output_root: str, dataset: str, records: Iterable[Dict[str, object]],
+                     serializer: Serializer) -> Tuple[List[PartitionEntry], List[str]]:
+    """Write ``records`` into monthly partitions keyed by their ``date`` field.
+
+    Each partition is written atomically and only when its bytes changed;
+    partitions that no longer have records are removed. Returns the manifest
+    entries (sorted by partition) and the paths that were written or removed.
+    Record order within a partition is the input order.
+    """
+    groups: Dict[Tuple[str, str], List[bytes]] = {}
+    for rec in records:
+        groups.setdefault(partition_of(rec.get("date")), []).append(serializer(rec))
+
+    entries: List[PartitionEntry] = []
+    written: List[str] = []
+    keep: Set[str] = set()
+    for year, month in sorted(groups):
+        lines = groups[(year, month)]
+        rel = partition_relpath(dataset, year, month)
+        path = os.path.join(output_root, *rel.split("/"))
+        keep.add(os.path.normpath(path))
+        ensure_dir(os.path.dirname(path))
+        data = b"\n".join(lines) + b"\n"
+        if write_bytes_atomic(path, data):
+            written.append(path)
+        entries.append({
+            "path": rel,
+            "year": year,
+            "month": month,
+            "records": len(lines),
+            "bytes": len(data),
+            "sha256": hashlib.sha256(data).hexdigest(),
+        })
+    written.extend(_remove_stale_partitions(os.path.join(output_root, dataset), keep))
+    return entries, written
+
+
+def _remove_stale_partitions(dataset_root: str, keep: Set[str]) -> List[str]:
+    removed: List[str] = []
+    if not os.path.isdir(dataset_root):
+        return removed
+    for root, dirs, files in os.walk(dataset_root, topdown=False):
+        if PARTITION_FILE in files:
+            path = os.path.normpath(os.path.join(root, PARTITION_FILE))
+            if path not in keep:
+                os.remove(path)
+                removed.append(path)
+        if root != dataset_root and not os.listdir(root):
+            os.rmdir(root)
+    return removed
+
+
+def remove_partitions(output_root: str, datasets: Iterable[str]) -> List[str]:
+    """Remove the manifest and every partition of ``datasets``; returns the removed paths.
+
+    Used when switching back to the single-file layout. The manifest goes
+    first, so readers never follow it to partitions that are gone.
+    """
+    removed: List[str] = []
+    manifest = os.path.join(output_root, MANIFEST_NAME)
+    if os.path.isfile(manifest):
+        os.remove(manifest)
+        removed.append(manifest)
+    for dataset in datasets:
+        dataset_root = os.path.join(output_root, dataset)
+        removed.extend(_remove_stale_partitions(dataset_root, set()))
+        if os.path.isdir(dataset_root) and not os.listdir(dataset_root):
+            os.rmdir(dataset_root)
+    return removed
+
+
+def write_manifest(output_root: str, datasets: Dict[str, List[PartitionEntry]]) -> Optional[str]:
+    """Write the top-level manifest of partitions and checksums; returns its path if it changed.
+
+    The manifest carries no timestamps, so it only changes when a partition
+    does. Its presence marks the output directory as partitioned.
+    """
+    manifest = {
+        "layout": PARTITION_LAYOUT,
+        "datasets": {name: {"partitions": entries} for name, entries in datasets.items()},
+    }
+    path = os.path.join(output_root, MANIFEST_NAME)
+    text = json.dumps(manifest, ensure_ascii=False, indent=2) + "\n"
+    return path if write_bytes_atomic(path, text.encode("utf-8")) else None
@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+from typing import Callable, Dict, Generic, List, Optional, Set, Tuple, TypeVar
+
+from .dedup import Contributions, merge_contributions
+
+T = TypeVar("T")
+
+
+class PartialAggregate:
+    """Mergeable result of one or more processed CSV files.
+
+    Merging is done in place on the left operand. Provided partials are
+    always merged in the same order, the output (including float sums and
+    dict key order) is the same from run to run.
+    """
+
+    def __init__(self, dedup: bool = True):
+        self.dedup = dedup
+        self.daily: Dict[str, Dict[str, float]] = {}
+        self.contrib: Contributions = {}
+        self.sessions: List[Dict[str, object]] = []
+        self.session_keys: Set[int] = set()
+        self.index_records: List[Dict[str, object]] = []
+
+    def add_result(self, local_daily: Dict[str, Dict[str, float]], local_contrib: Contributions,
+                   local_sessions: List[Dict[str, object]], index_record: Optional[Dict[str, object]]):
+        _merge_daily(self.daily, local_daily)
+        merge_contributions(self.contrib, local_contrib)
+        self._add_sessions(local_sessions)
+        if index_record is not None:
+            self.index_records.append(index_record)
+
+    def merge(self, other: "PartialAggregate") -> "PartialAggregate":
+        _merge_daily(self.daily, other.daily)
+        merge_contributions(self.contrib, other.contrib)
+        self._add_sessions(other.sessions)
+        self.index_records.extend(other.index_records)
+        return self
+
+    def _add_sessions(self, sessions: List[Dict[str, object]]):
+        for rec in sessions:
+            key = rec.get("_dedup_key")
+            if self.dedup and key is not None:
+                if key in self.session_keys:
+                    continue
+                self.session_keys.add(key)
+            self.sessions.append(rec)
+
+
+def _merge_daily(dst: Dict[str, Dict[str, float]], src: Dict[str, Dict[str, float]]):
+    for d, metrics in src.items():
+        if d not in dst:
+            dst[d] = {}
+        day = dst[d]
+        for k, v in metrics.items():
+            day[k] = day.get(k, 0.0) + v
+
+
+class TreeReducer(Generic[T]):
+    """Pairwise reduction of indexed leaves into a fixed binary tree.
+
+    Leaf ``i`` is merged with leaf ``i ^ 1`` as soon as both have arrived,
+    the result with its sibling one level up, and so on. The tree shape
+    depends only on the leaf indices, so the merge order - and therefore the
+    result - is independent of the order in which leaves arrive.
+    """
+
+    def __init__(self, merge: Callable[[T, T], T], pending: Optional[Dict[Tuple[int, int], T]] = None):
+        self._merge = merge
+        # (level, index) -> merged subtree waiting for its sibling; restorable from ``nodes()``
+        self._pending: Dict[Tuple[int, int], T] = dict(pending) if pending else {}
+
+    def add(self, index: int, item: T):
+        level = 0
+        while True:
+            sibling = self._pending.pop((level, index ^ 1), None)
+            if sibling is None:
+                self._pending[(level, index)] = item
+                return
+            item = self._merge(sibling, item) if index & 1 else self._merge(item, sibling)
+            index //= 2
+            level += 1
+
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def nodes(self) -> Dict[Tuple[int, int], T]:
+        """The pending nodes (not copied), for checkpointing."""
+        return self._pending
+
+    def result(self) -> Optional[T]:
+        """Merge nodes left without a sibling, left to right by leaf position."""
+        out: Optional[T] = None
+        for (level, index), item in sorted(self._pending.items(), key=lambda kv: kv[0][1] << kv[0][0]):
+            out = item if out is None else self._merge(out, item)
+        self._pending.clear()
+        return out
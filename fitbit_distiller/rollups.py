@@ -0,0 +1,166 @@
+from __future__ import annotations
+
+import datetime as dt
+import math
+from collections import Counter
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from .series import HrSeries, PaceSeries, epoch_seconds
+
+# Rollup resolutions (label -> bucket width in seconds), finest first
+ROLLUP_RESOLUTIONS: Dict[str, int] = {
+    "1min": 60,
+    "15min": 15 * 60,
+    "1h": 60 * 60,
+    "1d": 24 * 60 * 60,
+}
+
+ROLLUP_PERCENTILES = (50, 95)
+
+
+class RollupBucket:
+    """Mergeable per-bucket accumulator for heart rate and live pace samples."""
+
+    __slots__ = ("hr_count", "hr_sum", "hr_min", "hr_max", "hr_hist", "steps", "distance_mm", "pace_count")
+
+    def __init__(self):
+        self.hr_count = 0
+        self.hr_sum = 0.0
+        self.hr_min: Optional[float] = None
+        self.hr_max: Optional[float] = None
+        self.hr_hist: Counter = Counter()
+        self.steps = 0.0
+        self.distance_mm = 0.0
+        self.pace_count = 0
+
+    def add_hr(self, bpm: float):
+        self.hr_count += 1
+        self.hr_sum += bpm
+        if self.hr_min is None or bpm < self.hr_min:
+            self.hr_min = bpm
+        if self.hr_max is None or bpm > self.hr_max:
+            self.hr_max = bpm
+        self.hr_hist[int(round(bpm))] += 1
+
+    def add_pace(self, steps: Optional[float], distance_mm: Optional[float]):
+        self.pace_count += 1
+        if steps is not None:
+            self.steps += steps
+        if distance_mm is not None:
+            self.distance_mm += distance_mm
+
+    def merge(self, other: "RollupBucket"):
+        if other.hr_count:
+            self.hr_count += other.hr_count
+            self.hr_sum += other.hr_sum
+            if self.hr_min is None or other.hr_min < self.hr_min:
+                self.hr_min = other.hr_min
+            if self.hr_max is None or other.hr_max > self.hr_max:
+                self.hr_max = other.hr_max
+            self.hr_hist.update(other.hr_hist)
+        self.pace_count += other.pace_count
+        self.steps += other.steps
+        self.distance_mm += other.distance_mm
+
+    def percentile(self, pct: float) -> Optional[int]:
+        """Nearest-rank percentile of the (integer-rounded) bpm samples."""
+        if not self.hr_count:
+            return None
+        rank = max(1, -(-self.hr_count * pct // 100))
+        seen = 0
+        for bpm in sorted(self.hr_hist):
+            seen += self.hr_hist[bpm]
+            if seen >= rank:
+                return bpm
+        return None
+
+    def to_record(self) -> Dict[str, object]:
+        rec: Dict[str, object] = {}
+        if self.hr_count:
+            rec["hr_count"] = self.hr_count
+            rec["hr_min"] = self.hr_min
+            rec["hr_max"] = self.hr_max
+            rec["hr_mean"] = round(self.hr_sum / self.hr_count, 3)
+            for pct in ROLLUP_PERCENTILES:
+                rec[f"hr_p{pct}"] = self.percentile(pct)
+        if self.pace_count:
+            rec["steps"] = round(self.steps, 3)
+            rec["distance"] = round(self.distance_mm / 1_000_000.0, 6)  # km from millimeters
+        return rec
+
+
+def rollup_day(day: str, hr: Optional[HrSeries], pace: Optional[PaceSeries], resolutions: Sequence[str],
+               hr_range: Optional[Tuple[int, int]] = None,
+               pace_range: Optional[Tuple[int, int]] = None) -> Dict[str, List[Dict[str, object]]]:
+    """Roll up one day of samples into every requested resolution.
+
+    ``hr_range``/``pace_range`` are the day's index ranges in the series (see
+    ``day_ranges``); without them the whole series is assumed to lie within
+    ``day``. Each sample is visited once and lands in its 1-minute bucket;
+    coarser resolutions are built by merging finer buckets, so the cost is one
+    pass over the samples plus a pass over at most 1440 minute buckets.
+    """
+    base = dt.datetime.strptime(day, "%Y-%m-%d")
+    day_start = int(epoch_seconds(base))
+    minutes: Dict[int, RollupBucket] = {}
+    if hr is not None:
+        lo, hi = hr_range if hr_range is not None else (0, len(hr))
+        for t, bpm in zip(hr.times[lo:hi], hr.bpm[lo:hi]):
+            idx = (t - day_start) // 60
+            bucket = minutes.get(idx)
+            if bucket is None:
+                bucket = minutes[idx] = RollupBucket()
+            bucket.add_hr(float(bpm))
+    if pace is not None:
+        lo, hi = pace_range if pace_range is not None else (0, len(pace))
+        for t, steps_v, dist_mm in zip(pace.times[lo:hi], pace.steps[lo:hi], pace.distance_mm[lo:hi]):
+            idx = (t - day_start) // 60
+            bucket = minutes.get(idx)
+            if bucket is None:
+                bucket = minutes[idx] = RollupBucket()
+            bucket.add_pace(None if math.isnan(steps_v) else steps_v, None if math.isnan(dist_mm) else dist_mm)
+
+    out: Dict[str, List[Dict[str, object]]] = {}
+    for label in resolutions:
+        width_min = ROLLUP_RESOLUTIONS[label] // 60
+        if width_min == 1:
+            buckets = minutes
+        else:
+            buckets = {}
+            for idx, bucket in minutes.items():
+                coarse = buckets.get(idx // width_min)
+                if coarse is None:
+                    coarse = buckets[idx // width_min] = RollupBucket()
+                coarse.merge(bucket)
+        records: List[Dict[str, object]] = []
+        for idx in sorted(buckets):
+            start = base + dt.timedelta(minutes=idx * width_min)
+            rec: Dict[str, object] = {
+                "date": start.date().isoformat(),
+                "start": start.isoformat(),
+                "resolution": label,
+            }
+            rec.update(buckets[idx].to_record())
+            records.append(rec)
+        out[label] = records
+    return out
+
+
+def iter_rollups(hr_series: HrSeries, pace_series: PaceSeries,
+                 resolutions: Sequence[str]) -> Iterator[Dict[str, List[Dict[str, object]]]]:
+    """Yield per-day rollups (resolution -> records) in date order; both series must be sorted."""
+    hr_days = hr_series.day_ranges()
+    pace_days = pace_series.day_ranges()
+    for day in sorted(set(hr_days) | set(pace_days)):
+        yield rollup_day(day, hr_series if day in hr_days else None, pace_series if day in pace_days else None,
+                         resolutions, hr_days.get(day), pace_days.get(day))
+
+
+def parse_resolutions(spec: str) -> List[str]:
+    labels = [s.strip() for s in spec.split(",") if s.strip()]
+    unknown = [s for s in labels if s not in ROLLUP_RESOLUTIONS]
+    if unknown:
+        raise ValueError(f"Unknown rollup resolution(s): {', '.join(unknown)} "
+                         f"(choose from {', '.join(ROLLUP_RESOLUTIONS)})")
+    # Keep the canonical finest-first order
+    return [label for label in ROLLUP_RESOLUTIONS if label in labels]
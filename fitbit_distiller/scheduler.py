@@ -0,0 +1,297 @@
+from __future__ import annotations
+
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing.sharedctypes import RawArray
+from typing import Callable, Deque, Dict, Hashable, Iterable, Iterator, List, Optional, Tuple
+
+# Tasks kept submitted per worker process; the window is refilled as results are consumed
+DEFAULT_TASKS_PER_WORKER = 2
+# Reruns, each in a worker of its own, for a task whose worker pool broke (a worker died, e.g. killed by the
+# OOM killer) before the task counts as failed
+DEFAULT_TASK_RETRIES = 1
+
+# (key, function, arguments): the function is called as fn(*arguments) in a worker process
+Task = Tuple[Hashable, Callable, tuple]
+# (key, result, error): exactly one of result/error is meaningful
+TaskResult = Tuple[Hashable, object, Optional[BaseException]]
+
+
+class TaskTimeout(Exception):
+    """A task ran longer than the scheduler's task timeout; its worker pool was terminated."""
+
+
+# Start-time cells shared with the worker processes of a timed executor (see _timed_call)
+_start_cells = None
+
+
+def _init_worker(cells):
+    global _start_cells
+    _start_cells = cells
+
+
+def _timed_call(cell: int, token: int, fn: Callable, args: tuple):
+    """Record when the task really starts (wall time, then its token) in start cell ``cell``, then run it.
+
+    The cells are lock-free shared memory: a worker terminated mid-write
+    cannot leave a lock held for the others.
+    """
+    _start_cells[2 * cell] = time.time()
+    _start_cells[2 * cell + 1] = token
+    return fn(*args)
+
+
+class _Slot:
+    __slots__ = ("key", "fn", "args", "pool", "attempts", "started", "isolated", "cell", "token")
+
+    def __init__(self, key: Hashable, fn: Callable, args: tuple):
+        self.key = key
+        self.fn = fn
+        self.args = args
+        self.pool: Optional[ProcessPoolExecutor] = None
+        self.attempts = 0
+        self.started: Optional[float] = None
+        # Run in a single-worker pool of its own, so a crash only affects this task
+        self.isolated = False
+        # Start cell and submission token while submitted with a task timeout
+        self.cell: Optional[int] = None
+        self.token = 0
+
+
+class WindowedExecutor:
+    """Runs tasks on worker processes with a bounded number in flight.
+
+    At most ``max_in_flight`` tasks (default ``DEFAULT_TASKS_PER_WORKER`` per
+    worker) are submitted at once; the next task is only taken from the input
+    iterator when a result has been consumed, so neither pending futures nor
+    unmerged results pile up in the parent.
+
+    - ``task_timeout``: a task running longer than this many seconds fails
+      with ``TaskTimeout``. The clock starts when a worker process starts the
+      task, which the worker records in shared memory; tasks merely queued in
+      the pool (the pool queues a few ahead of its workers) are not timed.
+      The pool's processes are terminated, and the other tasks they held are
+      resubmitted to a fresh pool.
+    - ``max_tasks_per_child``: a pool is retired after about this many tasks
+      per worker. It finishes its in-flight tasks while new ones go to a
+      fresh pool, which bounds memory growth in long-lived workers. Retiring
+      whole pools works with any multiprocessing start method. Retired pools
+      are shut down as soon as their last task is done.
+    - When a pool breaks (a worker died), its in-flight tasks are rerun, each
+      in a single-worker pool of its own, so the task that killed the worker
+      is told apart from the ones that shared its pool. At most ``workers``
+      of these run at once; the rest wait. A task that breaks its own pool
+      ``retries`` times fails with ``BrokenProcessPool``.
+
+    Results come back as ``(key, result, error)`` in completion order.
+    """
+
+    def __init__(self, workers: int, max_in_flight: Optional[int] = None, task_timeout: Optional[float] = None,
+                 max_tasks_per_child: Optional[int] = None, retries: int = DEFAULT_TASK_RETRIES):
+        self.workers = max(1, int(workers))
+        self.max_in_flight = max(1, int(max_in_flight or self.workers * DEFAULT_TASKS_PER_WORKER))
+        self.task_timeout = task_timeout if task_timeout and task_timeout > 0 else None
+        self.recycle_after = self.workers * int(max_tasks_per_child) if max_tasks_per_child else None
+        self.retries = retries
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pool_tasks = 0
+        self._retired: List[ProcessPoolExecutor] = []
+        self._inflight: Dict[Future, _Slot] = {}
+        # Isolated reruns waiting for one of the ``workers`` single-worker pool places
+        self._isolated_waiting: Deque[_Slot] = deque()
+        # With a timeout: (wall start time, token) per cell, written by the workers; cells are handed out
+        # first-in first-out, so a cell freed by a terminated pool is only reused well after its workers died
+        self._cells = RawArray("d", 4 * self.max_in_flight) if self.task_timeout is not None else None
+        self._free_cells: Deque[int] = deque(range(2 * self.max_in_flight))
+        self._next_token = 0
+
+    def _current_pool(self) -> ProcessPoolExecutor:
+        if self._pool is not None and self.recycle_after is not None and self._pool_tasks >= self.recycle_after:
+            # Let the old pool drain its in-flight tasks while new ones start elsewhere
+            self._retire(self._pool, terminate=False)
+        if self._pool is None:
+            self._pool = self._new_pool(self.workers)
+            self._pool_tasks = 0
+        return self._pool
+
+    def _new_pool(self, workers: int) -> ProcessPoolExecutor:
+        if self._cells is None:
+            return ProcessPoolExecutor(max_workers=workers)
+        return ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(self._cells,))
+
+    def _call(self, slot: _Slot) -> Tuple[Callable, tuple]:
+        """The function and arguments to submit for ``slot``; timed tasks are wrapped to report their start."""
+        if self._cells is None:
+            return slot.fn, slot.args
+        self._next_token += 1
+        slot.token = self._next_token
+        slot.cell = self._free_cells.popleft()
+        return _timed_call, (slot.cell, slot.token, slot.fn, slot.args)
+
+    def _release(self, slot: _Slot):
+        if slot.cell is not None:
+            self._free_cells.append(slot.cell)
+            slot.cell = None
+
+    def _retire(self, pool: ProcessPoolExecutor, terminate: bool):
+        if pool is self._pool:
+            self._pool = None
+        if terminate:
+            # No public API stops a running task; terminate the pool's processes instead
+            for proc in list((getattr(pool, "_processes", None) or {}).values()):
+                proc.terminate()
+            pool.shutdown(wait=False)
+        else:
+            pool.shutdown(wait=False)
+            self._retired.append(pool)
+
+    def _submit(self, slot: _Slot):
+        if slot.isolated and sum(s.isolated for s in self._inflight.values()) >= self.workers:
+            self._isolated_waiting.append(slot)
+            return
+        fn, args = self._call(slot)
+        if slot.isolated:
+            pool = self._new_pool(1)
+            future = pool.submit(fn, *args)
+            # The pool's one worker exits once this task is done
+            self._retire(pool, terminate=False)
+        else:
+            while True:
+                pool = self._current_pool()
+                try:
+                    future = pool.submit(fn, *args)
+                except BrokenProcessPool:
+                    self._retire(pool, terminate=True)
+                    continue
+                break
+            self._pool_tasks += 1
+        slot.pool = pool
+        slot.started = None
+        self._inflight[future] = slot
+
+    def _requeue_pool(self, pool: ProcessPoolExecutor, broken: bool) -> List[TaskResult]:
+        """Resubmit every unfinished task of a terminated or ``broken`` pool; returns the tasks given up on."""
+        failed: List[TaskResult] = []
+        for future, slot in list(self._inflight.items()):
+            if slot.pool is not pool:
+                continue
+            if future.done() and not future.cancelled() and future.exception() is None:
+                # Finished before the pool went down; its result is still collected
+                continue
+            del self._inflight[future]
+            self._release(slot)
+            if broken:
+                if slot.isolated:
+                    slot.attempts += 1
+                if slot.attempts >= self.retries:
+                    failed.append((slot.key, None, BrokenProcessPool("worker process died while running the task")))
+                    continue
+                slot.isolated = True
+            self._submit(slot)
+        return failed
+
+    def _start_waiting(self):
+        """Start waiting isolated reruns while fewer than ``workers`` are running."""
+        running = sum(s.isolated for s in self._inflight.values())
+        while self._isolated_waiting and running < self.workers:
+            self._submit(self._isolated_waiting.popleft())
+            running += 1
+
+    def _reap_retired(self):
+        """Shut down retired pools that have no task left, so long runs (--watch) do not accumulate them."""
+        busy = {id(s.pool) for s in self._inflight.values()}
+        keep: List[ProcessPoolExecutor] = []
+        for pool in self._retired:
+            if id(pool) in busy:
+                keep.append(pool)
+            else:
+                pool.shutdown(wait=True)
+        self._retired = keep
+
+    def _wait_timeout(self, now: float) -> Optional[float]:
+        if self.task_timeout is None:
+            return None
+        deadlines = [s.started + self.task_timeout for s in self._inflight.values() if s.started is not None]
+        # Poll at least once a second to notice tasks that started running
+        return max(0.0, min(deadlines + [now + 1.0]) - now)
+
+    def _note_started(self, slot: _Slot, now: float):
+        cells = self._cells
+        if slot.started is None and slot.cell is not None and cells[2 * slot.cell + 1] == slot.token:
+            # Convert the worker's wall-clock start into this process's monotonic clock
+            slot.started = now - max(0.0, time.time() - cells[2 * slot.cell])
+
+    def _check_timeouts(self) -> List[TaskResult]:
+        if self.task_timeout is None:
+            return []
+        now = time.monotonic()
+        timed_out: List[TaskResult] = []
+        for future, slot in list(self._inflight.items()):
+            if future not in self._inflight or future.done():
+                continue
+            self._note_started(slot, now)
+            if slot.started is not None and now - slot.started > self.task_timeout:
+                del self._inflight[future]
+                self._release(slot)
+                timed_out.append((slot.key, None, TaskTimeout(f"task timed out after {self.task_timeout:g}s")))
+                pool = slot.pool
+                self._retire(pool, terminate=True)
+                timed_out.extend(self._requeue_pool(pool, broken=False))
+        return timed_out
+
+    def run(self, tasks: Iterable[Task]) -> Iterator[TaskResult]:
+        """Run ``tasks`` and yield their results as they complete."""
+        tasks = iter(tasks)
+        exhausted = False
+        while True:
+            self._start_waiting()
+            self._reap_retired()
+            while not exhausted and len(self._inflight) + len(self._isolated_waiting) < self.max_in_flight:
+                task = next(tasks, None)
+                if task is None:
+                    exhausted = True
+                    break
+                self._submit(_Slot(*task))
+            if not self._inflight:
+                return
+            done, _ = wait(list(self._inflight), timeout=self._wait_timeout(time.monotonic()),
+                           return_when=FIRST_COMPLETED)
+            for future in done:
+                slot = self._inflight.pop(future, None)
+                if slot is None:
+                    # Already handled when its pool was terminated
+                    continue
+                self._release(slot)
+                try:
+                    result = future.result()
+                except BrokenProcessPool:
+                    self._inflight[future] = slot
+                    pool = slot.pool
+                    self._retire(pool, terminate=True)
+                    yield from self._requeue_pool(pool, broken=True)
+                except Exception as e:
+                    yield slot.key, None, e
+                else:
+                    yield slot.key, result, None
+            yield from self._check_timeouts()
+
+    def close(self, cancel: bool = False):
+        """Shut down every pool; with ``cancel``, tasks not yet running are dropped."""
+        if cancel:
+            for future in self._inflight:
+                future.cancel()
+        self._inflight.clear()
+        self._isolated_waiting.clear()
+        pools = self._retired + ([self._pool] if self._pool is not None else [])
+        self._pool = None
+        self._retired = []
+        for pool in pools:
+            pool.shutdown(wait=True)
+
+    def __enter__(self) -> "WindowedExecutor":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close(cancel=exc_type is not None)
@@ -0,0 +1,202 @@
+from __future__ import annotations
+
+import json
+import math
+import os
+from typing import Callable, Dict, List, Optional
+
+from .utils import replace_if_changed, temp_path_for
+
+# Serializer: one JSON value -> encoded line (without the trailing newline)
+Serializer = Callable[[object], bytes]
+
+JSON_BACKENDS = ("auto", "stdlib", "orjson")
+JSON_FORMATS = ("default", "canonical")
+
+# JsonlWriter flushes once this many encoded bytes are pending
+DEFAULT_BUFFER_BYTES = 1 << 20
+
+
+def orjson_available() -> bool:
+    try:
+        import orjson  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+# Encoders are built once; json.dumps with non-default arguments builds a new one per call
+_DEFAULT_ENCODER = json.JSONEncoder(ensure_ascii=False)
+_CANONICAL_ENCODER = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+
+
+def _stdlib_default(obj: object) -> bytes:
+    return _DEFAULT_ENCODER.encode(obj).encode("utf-8")
+
+
+def _stdlib_canonical(obj: object) -> bytes:
+    if _has_irregular_float(obj):
+        return _canonical_text(obj).encode("utf-8")
+    return _CANONICAL_ENCODER.encode(obj).encode("utf-8")
+
+
+def _has_irregular_float(obj: object) -> bool:
+    """Whether ``obj`` holds a float whose ``repr`` differs from orjson's rendering."""
+    if isinstance(obj, dict):
+        values = obj.values()
+    elif isinstance(obj, (list, tuple)):
+        values = obj
+    else:
+        values = (obj,)
+    for v in values:
+        if isinstance(v, float):
+            # repr and orjson agree on plain decimal notation in this range (NaN fails both tests)
+            if not (v == 0.0 or 1e-4 <= abs(v) < 1e16):
+                return True
+        elif isinstance(v, (dict, list, tuple)) and _has_irregular_float(v):
+            return True
+    return False
+
+
+def _canonical_text(obj: object) -> str:
+    # The C encoder offers no float hook, so records with irregular floats are encoded here
+    if isinstance(obj, float):
+        return _orjson_float(obj)
+    if isinstance(obj, dict):
+        items = []
+        for k, v in obj.items():
+            key = k if isinstance(k, str) else _CANONICAL_ENCODER.encode(k)
+            items.append(_CANONICAL_ENCODER.encode(key) + ":" + _canonical_text(v))
+        return "{" + ",".join(items) + "}"
+    if isinstance(obj, (list, tuple)):
+        return "[" + ",".join(_canonical_text(v) for v in obj) + "]"
+    return _CANONICAL_ENCODER.encode(obj)
+
+
+def _orjson_float(value: float) -> str:
+    """Render a float the way orjson does: shortest digits, no exponent sign or padding, NaN/Inf as null."""
+    if math.isnan(value) or math.isinf(value):
+        return "null"
+    text = repr(value)
+    sign = ""
+    if text.startswith("-"):
+        sign, text = "-", text[1:]
+    mantissa, _, exp = text.partition("e")
+    int_part, _, frac_part = mantissa.partition(".")
+    digits = (int_part + frac_part).lstrip("0")
+    if not digits:
+        return sign + "0.0"
+    # value = digits * 10**k; the decimal point sits ``point`` digits from the left
+    k = int(exp or 0) - len(frac_part)
+    stripped = digits.rstrip("0")
+    k += len(digits) - len(stripped)
+    digits = stripped
+    point = len(digits) + k
+    if k >= 0 and point <= 16:
+        return f"{sign}{digits}{'0' * k}.0"
+    if 0 < point <= 16:
+        return f"{sign}{digits[:point]}.{digits[point:]}"
+    if -5 < point <= 0:
+        return f"{sign}0.{'0' * -point}{digits}"
+    if len(digits) == 1:
+        return f"{sign}{digits}e{point - 1}"
+    return f"{sign}{digits[0]}.{digits[1:]}e{point - 1}"
+
+
+def get_serializer(backend: str = "auto", fmt: str = "default") -> Serializer:
+    """Return a serializer for JSONL output.
+
+    ``default`` format is ``json.dumps(obj, ensure_ascii=False)``, byte for
+    byte what earlier versions wrote; only the stdlib produces it.
+    ``canonical`` format is compact UTF-8 JSON (``,``/``:`` separators, keys
+    in insertion order) and is identical between the stdlib and orjson: the
+    stdlib encoder renders floats the way orjson does (``5e-6``, ``1e16``,
+    NaN and infinities as ``null``). ``auto`` picks orjson for canonical
+    output when it is installed.
+    """
+    if backend not in JSON_BACKENDS:
+        raise ValueError(f"Unknown JSON backend: {backend}")
+    if fmt not in JSON_FORMATS:
+        raise ValueError(f"Unknown JSON format: {fmt}")
+    if fmt == "default":
+        if backend == "orjson":
+            raise ValueError("orjson only supports the canonical JSON format")
+        return _stdlib_default
+    if backend == "stdlib" or (backend == "auto" and not orjson_available()):
+        return _stdlib_canonical
+    import orjson
+    return orjson.dumps
+
+
+class JsonlWriter:
+    """Buffered JSONL writer; records are encoded eagerly and written in large blocks.
+
+    With ``atomic=True`` the lines go to a temporary file that replaces
+    ``path`` on ``close()`` only if the content changed (``changed`` tells
+    which); readers never see a partially written file. Leaving a ``with``
+    block on an exception discards the temporary file.
+    """
+
+    def __init__(self, path: str, serializer: Optional[Serializer] = None,
+                 buffer_bytes: int = DEFAULT_BUFFER_BYTES, atomic: bool = False):
+        self.path = path
+        self.serializer = serializer or _stdlib_default
+        self.buffer_bytes = buffer_bytes
+        self.changed = False
+        self._tmp_path = temp_path_for(path) if atomic else None
+        self._f = open(self._tmp_path or path, "wb")
+        self._pending: List[bytes] = []
+        self._pending_bytes = 0
+
+    def write(self, obj: object):
+        self.write_encoded(self.serializer(obj))
+
+    def write_encoded(self, line: bytes):
+        """Write a line already encoded by this writer's serializer (without the trailing newline)."""
+        self._pending.append(line)
+        self._pending_bytes += len(line) + 1
+        if self._pending_bytes >= self.buffer_bytes:
+            self.flush()
+
+    def write_many(self, objs):
+        for obj in objs:
+            self.write(obj)
+
+    def flush(self):
+        if self._pending:
+            self._pending.append(b"")
+            self._f.write(b"\n".join(self._pending))
+            self._pending = []
+            self._pending_bytes = 0
+
+    def close(self):
+        if self._f.closed:
+            return
+        self.flush()
+        self._f.close()
+        if self._tmp_path is None:
+            self.changed = True
+        else:
+            self.changed = replace_if_changed(self._tmp_path, self.path)
+
+    def abort(self):
+        """Close without publishing; the target file is left as it was (atomic mode only)."""
+        if self._f.closed:
+            return
+        self._f.close()
+        if self._tmp_path is not None and os.path.exists(self._tmp_path):
+            os.remove(self._tmp_path)
+
+    def __enter__(self) -> "JsonlWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None and self._tmp_path is not None:
+            self.abort()
+        else:
+            self.close()
+
+
+def public_fields(rec: Dict[str, object]) -> Dict[str, object]:
+    """Drop internal (underscore-prefixed) fields and None values in a single pass."""
+    return {k: v for k, v in rec.items() if v is not None and not k.startswith("_")}
@@ -0,0 +1,280 @@
+from __future__ import annotations
+
+import datetime as dt
+import math
+import os
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .csv_reader import read_csv_stream
+from .utils import parse_datetime_value, to_float
+
+_NAN = float("nan")
+# utc_offset_min value of a sample whose timestamp had no UTC offset
+_NO_OFFSET = -32768
+
+
+def _naive(ts: dt.datetime) -> dt.datetime:
+    return ts.replace(tzinfo=None) if ts.tzinfo is not None else ts
+
+
+def _opt(v: float) -> Optional[float]:
+    return None if math.isnan(v) else v
+
+
+# Series timestamps are int32 seconds from this epoch (covers 1931-2068)
+SERIES_EPOCH = dt.datetime(2000, 1, 1)
+_DAY_SEC = 24 * 60 * 60
+# Above this many ascending runs, sort() skips the per-segment merge and sorts outright
+MAX_MERGE_RUNS = 64
+
+
+def epoch_seconds(ts: dt.datetime) -> float:
+    """Seconds from ``SERIES_EPOCH`` to ``ts`` (naive; any UTC offset is dropped)."""
+    return (_naive(ts) - SERIES_EPOCH).total_seconds()
+
+
+class _TimeSeries:
+    """Samples stored as int32 seconds from ``SERIES_EPOCH``, continuous across days.
+
+    Times are the samples' wall-clock times (any UTC offset is dropped, not
+    converted, so legacy exports without an offset and GoogleData exports
+    with one line up) at whole-second resolution. Absolute seconds rather
+    than per-day deltas: a delta would need the same 4-byte slot, and
+    absolute values let merges and range queries compare across midnight
+    without a per-day base. Range queries bisect, so their cost depends on
+    the samples in the window rather than on the days it touches. Appends
+    are O(1) and record where a new ascending run starts; ``sort()`` must be
+    called before range queries and only does work when there is more than
+    one run.
+    """
+
+    __slots__ = ("times", "_run_starts")
+    # Per-sample value arrays, kept parallel to ``times``
+    _value_columns: Tuple[str, ...] = ()
+
+    def __init__(self):
+        self.times = array("i")
+        # Indices where a sample is earlier than its predecessor (each starts an ascending run)
+        self._run_starts: List[int] = []
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    def _append_time(self, ts: dt.datetime) -> None:
+        t = math.floor(epoch_seconds(ts))
+        if self.times and t < self.times[-1]:
+            self._run_starts.append(len(self.times))
+        self.times.append(t)
+
+    def extend(self, other: "_TimeSeries", lo: int = 0, hi: Optional[int] = None) -> None:
+        """Append the samples ``lo:hi`` (default: all) of ``other`` (same type); ``other`` is left untouched."""
+        if hi is None:
+            hi = len(other.times)
+        if lo >= hi:
+            return
+        offset = len(self.times) - lo
+        if self.times and other.times[lo] < self.times[-1]:
+            self._run_starts.append(len(self.times))
+        self._run_starts.extend(i + offset for i in other._run_starts if lo < i < hi)
+        if lo == 0 and hi == len(other.times):
+            self.times.extend(other.times)
+            for name in self._value_columns:
+                getattr(self, name).extend(getattr(other, name))
+        else:
+            self.times.extend(other.times[lo:hi])
+            for name in self._value_columns:
+                getattr(self, name).extend(getattr(other, name)[lo:hi])
+
+    def splice(self, lo: int, hi: int, other: "_TimeSeries") -> None:
+        """Replace the samples ``lo:hi`` with all of ``other`` (same type), in place.
+
+        Both series must be sorted and ``other``'s times must fit between the
+        samples around ``lo:hi``, so the result stays sorted. Each column is
+        one slice assignment, so the cost does not depend on the number of
+        days left as they were.
+        """
+        self.times[lo:hi] = other.times
+        for name in self._value_columns:
+            getattr(self, name)[lo:hi] = getattr(other, name)
+
+    def is_sorted(self) -> bool:
+        return not self._run_starts
+
+    def sort(self) -> None:
+        """Order samples by time (stable), merging only where ascending runs overlap.
+
+        Files are normally appended in time order, leaving a single run and
+        nothing to do. Otherwise the timeline is cut at every run's first and
+        last time: a segment covered by one run is copied as a slice, and
+        only segments covered by several runs are merged (timsort over their
+        indices, which merges the natural runs in C and is faster here than
+        ``heapq.merge``). Inputs with very many runs are sorted outright.
+        """
+        if not self._run_starts:
+            return
+        times = self.times
+        bounds = [0] + self._run_starts + [len(times)]
+        runs = list(zip(bounds, bounds[1:]))
+        columns = ("times",) + self._value_columns
+        old = {name: getattr(self, name) for name in columns}
+        new = {name: array(col.typecode) for name, col in old.items()}
+
+        def gather(order: List[int]):
+            order.sort(key=times.__getitem__)
+            for name in columns:
+                new[name].extend(map(old[name].__getitem__, order))
+
+        if len(runs) > MAX_MERGE_RUNS:
+            gather(list(range(len(times))))
+        else:
+            points = sorted({times[lo] for lo, _ in runs} | {times[hi - 1] + 1 for _, hi in runs})
+            for seg_lo, seg_hi in zip(points, points[1:]):
+                parts = []
+                for lo, hi in runs:
+                    if times[lo] < seg_hi and times[hi - 1] >= seg_lo:
+                        i = bisect_left(times, seg_lo, lo, hi)
+                        j = bisect_left(times, seg_hi, lo, hi)
+                        if i < j:
+                            parts.append((i, j))
+                if len(parts) == 1:
+                    i, j = parts[0]
+                    for name in columns:
+                        new[name].extend(old[name][i:j])
+                elif parts:
+                    gather([k for i, j in parts for k in range(i, j)])
+        for name in columns:
+            setattr(self, name, new[name])
+        self._run_starts = []
+
+    def _bounds(self, start: dt.datetime, end: dt.datetime) -> Tuple[int, int]:
+        """Index range of samples with ``start <= ts <= end``."""
+        lo = bisect_left(self.times, math.ceil(epoch_seconds(start)))
+        hi = bisect_right(self.times, math.floor(epoch_seconds(end)))
+        return lo, hi
+
+    def timestamp(self, i: int) -> dt.datetime:
+        return SERIES_EPOCH + dt.timedelta(seconds=self.times[i])
+
+    def day_ranges(self) -> Dict[str, Tuple[int, int]]:
+        """``{YYYY-MM-DD: (lo, hi)}`` index range of each calendar day with samples."""
+        ranges: Dict[str, Tuple[int, int]] = {}
+        times = self.times
+        lo = 0
+        n = len(times)
+        while lo < n:
+            day_start = times[lo] - times[lo] % _DAY_SEC
+            hi = bisect_left(times, day_start + _DAY_SEC, lo)
+            day = (SERIES_EPOCH + dt.timedelta(seconds=day_start)).date().isoformat()
+            ranges[day] = (lo, hi)
+            lo = hi
+        return ranges
+
+
+class HrSeries(_TimeSeries):
+    """Heart rate samples: int32 times plus uint8 bpm (5 bytes per sample)."""
+
+    __slots__ = ("bpm",)
+    _value_columns = ("bpm",)
+
+    def __init__(self):
+        super().__init__()
+        self.bpm = array("B")
+
+    def append(self, ts: dt.datetime, bpm: float) -> None:
+        self._append_time(ts)
+        self.bpm.append(min(max(int(round(bpm)), 0), 255))
+
+    def __iter__(self) -> Iterator[Tuple[dt.datetime, float]]:
+        for i in range(len(self.times)):
+            yield self.timestamp(i), float(self.bpm[i])
+
+    def window_values(self, start: dt.datetime, end: dt.datetime) -> array:
+        """bpm values with ``start <= ts <= end`` as a slice of the buffer."""
+        lo, hi = self._bounds(start, end)
+        return self.bpm[lo:hi]
+
+
+class PaceSeries(_TimeSeries):
+    """Live pace samples: steps, distance (mm) and altitude gain (mm); NaN marks a missing value.
+
+    Each sample also keeps its timestamp's UTC offset in minutes, so the
+    auto-detected sessions built from the series report their start and
+    end as written in the export (e.g. ``+00:00`` for GoogleData files).
+    """
+
+    __slots__ = ("steps", "distance_mm", "altitude_mm", "utc_offset_min")
+    _value_columns = ("steps", "distance_mm", "altitude_mm", "utc_offset_min")
+
+    def __init__(self):
+        super().__init__()
+        self.steps = array("d")
+        self.distance_mm = array("d")
+        self.altitude_mm = array("d")
+        self.utc_offset_min = array("h")
+
+    def append(self, ts: dt.datetime, steps: Optional[float], distance_mm: Optional[float],
+               altitude_mm: Optional[float]) -> None:
+        self._append_time(ts)
+        self.steps.append(_NAN if steps is None else steps)
+        self.distance_mm.append(_NAN if distance_mm is None else distance_mm)
+        self.altitude_mm.append(_NAN if altitude_mm is None else altitude_mm)
+        offset = ts.utcoffset()
+        self.utc_offset_min.append(_NO_OFFSET if offset is None else int(offset.total_seconds() // 60))
+
+    def timestamp(self, i: int) -> dt.datetime:
+        ts = super().timestamp(i)
+        offset = self.utc_offset_min[i]
+        return ts if offset == _NO_OFFSET else ts.replace(tzinfo=dt.timezone(dt.timedelta(minutes=offset)))
+
+    def __iter__(self) -> Iterator[Tuple[dt.datetime, Optional[float], Optional[float], Optional[float]]]:
+        for i in range(len(self.times)):
+            yield (self.timestamp(i), _opt(self.steps[i]), _opt(self.distance_mm[i]),
+                   _opt(self.altitude_mm[i]))
+
+    def window(self, start: dt.datetime, end: dt.datetime
+               ) -> Iterator[Tuple[Optional[float], Optional[float], Optional[float]]]:
+        """(steps, distance_mm, altitude_mm) of samples with ``start <= ts <= end``."""
+        lo, hi = self._bounds(start, end)
+        for i in range(lo, hi):
+            yield _opt(self.steps[i]), _opt(self.distance_mm[i]), _opt(self.altitude_mm[i])
+
+
+def scan_series_file(csv_path: str) -> Tuple[HrSeries, PaceSeries]:
+    """Read a heart_rate_*/live_pace_* CSV into series; other files yield empty series."""
+    hr_series = HrSeries()
+    pace_series = PaceSeries()
+    name_low = os.path.basename(csv_path).lower()
+    if "live_pace_" in name_low:
+        headers, rows_iter, _enc, _errs = read_csv_stream(csv_path)
+        if headers:
+            lower_map = {h.lower().strip(): h for h in headers}
+            ts_k = lower_map.get("timestamp")
+            steps_k = lower_map.get("steps")
+            dist_k = lower_map.get("distance millimeters")
+            alt_k = lower_map.get("altitude gain millimeters")
+            for row in rows_iter:
+                ts = parse_datetime_value(row.get(ts_k) if ts_k else None)
+                if not isinstance(ts, dt.datetime):
+                    continue
+                steps_v = to_float(row.get(steps_k)) if steps_k else None
+                dist_mm = to_float(row.get(dist_k)) if dist_k else None
+                alt_mm = to_float(row.get(alt_k)) if alt_k else None
+                pace_series.append(ts, steps_v, dist_mm, alt_mm)
+    elif "heart_rate_" in name_low:
+        headers, rows_iter, _enc, _errs = read_csv_stream(csv_path)
+        if headers:
+            lower_map = {h.lower().strip(): h for h in headers}
+            ts_k = lower_map.get("timestamp")
+            bpm_k = lower_map.get("beats per minute")
+            for row in rows_iter:
+                ts = parse_datetime_value(row.get(ts_k) if ts_k else None)
+                if not isinstance(ts, dt.datetime):
+                    continue
+                bpm = to_float(row.get(bpm_k)) if bpm_k else None
+                if bpm is None:
+                    continue
+                hr_series.append(ts, bpm)
+    return hr_series, pace_series
+
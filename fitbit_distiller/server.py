@@ -0,0 +1,298 @@
+from __future__ import annotations
+
+import datetime as dt
+import json
+import os
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Hashable, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from .partitions import MANIFEST_NAME
+from .serialization import get_serializer
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+# Responses kept in the LRU cache
+DEFAULT_CACHE_ENTRIES = 512
+# Output files are stat'ed for changes at most this often
+RELOAD_CHECK_INTERVAL_SEC = 0.5
+
+DAILY_FILE = "fitbit_daily_distilled.jsonl"
+SESSIONS_FILE = "fitbit_activity_sessions.jsonl"
+
+
+class QueryError(ValueError):
+    """Invalid query parameters (answered with HTTP 400)."""
+
+
+class LruCache:
+    """Thread-safe least-recently-used cache of encoded responses."""
+
+    def __init__(self, max_entries: int = DEFAULT_CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self._items: "OrderedDict[Hashable, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[bytes]:
+        with self._lock:
+            value = self._items.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: bytes):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+class _Table:
+    """Records sorted by date, with their encoded lines and a parallel date list for bisect."""
+
+    __slots__ = ("dates", "records", "lines", "undated")
+
+    def __init__(self, rows: List[Tuple[Dict[str, object], bytes]]):
+        dated = [(rec, line) for rec, line in rows if isinstance(rec.get("date"), str)]
+        # Stable sort keeps file order within a day
+        dated.sort(key=lambda rl: rl[0]["date"])
+        self.dates: List[str] = [rec["date"] for rec, _ in dated]
+        self.records: List[Dict[str, object]] = [rec for rec, _ in dated]
+        self.lines: List[bytes] = [line for _, line in dated]
+        self.undated: List[Tuple[Dict[str, object], bytes]] = [rl for rl in rows if not isinstance(rl[0].get("date"), str)]
+
+    def select(self, start: Optional[str], end: Optional[str]) -> List[Tuple[Dict[str, object], bytes]]:
+        """Rows with ``start <= date <= end``; undated rows are only included for an unbounded query."""
+        lo = bisect_left(self.dates, start) if start else 0
+        hi = bisect_right(self.dates, end) if end else len(self.dates)
+        rows = list(zip(self.records[lo:hi], self.lines[lo:hi]))
+        if start is None and end is None:
+            rows.extend(self.undated)
+        return rows
+
+
+def _read_jsonl(path: str, rows: List[Tuple[Dict[str, object], bytes]],
+                encode: Callable[[Dict[str, object]], bytes]):
+    """Append ``(record, encoded line)`` for each JSON object in ``path``.
+
+    Lines are re-encoded rather than kept as read, since the output files may
+    use either --json-format; responses must not depend on which was used.
+    """
+    with open(path, "rb") as f:
+        for raw in f:
+            raw = raw.strip()
+            if not raw:
+                continue
+            try:
+                rec = json.loads(raw)
+            except ValueError:
+                continue
+            if isinstance(rec, dict):
+                rows.append((rec, encode(rec)))
+
+
+class DistilledStore:
+    """In-memory, date-indexed view of a distiller output directory.
+
+    Reads the partitioned layout through its manifest when there is one
+    (the distiller removes the manifest when it writes single files, and
+    the single files when it writes partitions), else the single
+    daily/session files. Records are kept with their canonical JSON
+    encoding (``encode``), which responses splice. ``reload_if_changed`` swaps in a
+    fresh snapshot when the source files change; queries always see one
+    consistent snapshot.
+    """
+
+    def __init__(self, output_root: str):
+        self.output_root = output_root
+        self.encode = get_serializer("auto", "canonical")
+        self.generation = 0
+        self._signature: Optional[tuple] = None
+        self._daily = _Table([])
+        self._sessions = _Table([])
+        self._lock = threading.Lock()
+        self._next_check = 0.0
+        self.reload_if_changed(force=True)
+
+    def _sources(self) -> Dict[str, List[str]]:
+        """Files backing each dataset; the manifest marks the partitioned layout."""
+        manifest = os.path.join(self.output_root, MANIFEST_NAME)
+        if os.path.isfile(manifest):
+            with open(manifest, "r", encoding="utf-8") as f:
+                datasets = json.load(f).get("datasets", {})
+            return {
+                name: [os.path.join(self.output_root, *p["path"].split("/"))
+                       for p in datasets.get(stem, {}).get("partitions", [])]
+                for name, stem in (("daily", "fitbit_daily_distilled"), ("sessions", "fitbit_activity_sessions"))
+            }
+        return {"daily": [os.path.join(self.output_root, DAILY_FILE)],
+                "sessions": [os.path.join(self.output_root, SESSIONS_FILE)]}
+
+    def _stat_signature(self) -> tuple:
+        manifest = os.path.join(self.output_root, MANIFEST_NAME)
+        sig = []
+        # The manifest changes whenever a partition does, so it stands in for the partition files
+        for path in (manifest, os.path.join(self.output_root, DAILY_FILE),
+                     os.path.join(self.output_root, SESSIONS_FILE)):
+            try:
+                st = os.stat(path)
+                sig.append((path, st.st_size, st.st_mtime_ns))
+            except OSError:
+                sig.append((path, None, None))
+        return tuple(sig)
+
+    def reload_if_changed(self, force: bool = False) -> bool:
+        """Reload when the output files changed since the last load; checks are throttled."""
+        now = time.monotonic()
+        if not force and now < self._next_check:
+            return False
+        with self._lock:
+            if not force and now < self._next_check:
+                return False
+            self._next_check = now + RELOAD_CHECK_INTERVAL_SEC
+            signature = self._stat_signature()
+            if not force and signature == self._signature:
+                return False
+            tables: Dict[str, _Table] = {}
+            sources = self._sources()
+            for name in ("daily", "sessions"):
+                rows: List[Tuple[Dict[str, object], bytes]] = []
+                for path in sources.get(name, []):
+                    if os.path.isfile(path):
+                        _read_jsonl(path, rows, self.encode)
+                tables[name] = _Table(rows)
+            self._daily, self._sessions = tables["daily"], tables["sessions"]
+            self._signature = signature
+            self.generation += 1
+            return True
+
+    def daily(self, start: Optional[str], end: Optional[str]) -> List[Tuple[Dict[str, object], bytes]]:
+        return self._daily.select(start, end)
+
+    def sessions(self, start: Optional[str], end: Optional[str]) -> List[Tuple[Dict[str, object], bytes]]:
+        return self._sessions.select(start, end)
+
+
+class QueryService:
+    """Answers /daily and /sessions queries from a ``DistilledStore`` through an LRU cache."""
+
+    def __init__(self, store: DistilledStore, cache: Optional[LruCache] = None):
+        self.store = store
+        self.cache = cache if cache is not None else LruCache()
+        self._encode = store.encode
+        self._generation = store.generation
+
+    def handle(self, path: str, query: Dict[str, List[str]]) -> Optional[bytes]:
+        """Encoded JSON response for ``path``, or None for an unknown path; raises QueryError."""
+        if path not in ("/daily", "/sessions"):
+            return None
+        if self.store.reload_if_changed() or self._generation != self.store.generation:
+            self._generation = self.store.generation
+            self.cache.clear()
+        start = _date_param(query, "from")
+        end = _date_param(query, "to")
+        if path == "/daily":
+            fields = _list_param(query, "fields")
+            key: Hashable = (path, self._generation, start, end, fields)
+        else:
+            activity_type = _text_param(query, "type")
+            key = (path, self._generation, start, end, activity_type)
+        body = self.cache.get(key)
+        if body is not None:
+            return body
+        if path == "/daily":
+            body = self._respond(self.store.daily(start, end), fields=fields)
+        else:
+            rows = self.store.sessions(start, end)
+            if activity_type is not None:
+                rows = [rl for rl in rows if str(rl[0].get("type") or "").lower() == activity_type]
+            body = self._respond(rows)
+        self.cache.put(key, body)
+        return body
+
+    def _respond(self, rows: List[Tuple[Dict[str, object], bytes]], fields: Optional[tuple] = None) -> bytes:
+        if fields is None:
+            # Stored lines were encoded with the same encoder at load time; splice them
+            parts = [line for _, line in rows]
+        else:
+            parts = [self._encode({k: rec[k] for k in ("date",) + fields if k in rec}) for rec, _ in rows]
+        return b'{"count":' + str(len(parts)).encode() + b',"records":[' + b",".join(parts) + b"]}"
+
+
+def _date_param(query: Dict[str, List[str]], name: str) -> Optional[str]:
+    value = _text_param(query, name, lower=False)
+    if value is None:
+        return None
+    try:
+        return dt.date.fromisoformat(value).isoformat()
+    except ValueError:
+        raise QueryError(f"'{name}' must be a YYYY-MM-DD date, got {value!r}")
+
+
+def _text_param(query: Dict[str, List[str]], name: str, lower: bool = True) -> Optional[str]:
+    values = query.get(name)
+    if not values or not values[-1].strip():
+        return None
+    value = values[-1].strip()
+    return value.lower() if lower else value
+
+
+def _list_param(query: Dict[str, List[str]], name: str) -> Optional[tuple]:
+    value = _text_param(query, name, lower=False)
+    if value is None:
+        return None
+    return tuple(f.strip() for f in value.split(",") if f.strip() and f.strip() != "date")
+
+
+def make_handler(service: QueryService) -> type:
+    class DistilledRequestHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            url = urlsplit(self.path)
+            try:
+                body = service.handle(url.path.rstrip("/") or "/", parse_qs(url.query))
+            except QueryError as e:
+                self._send(400, json.dumps({"error": str(e)}).encode("utf-8"))
+                return
+            if body is None:
+                self._send(404, json.dumps({"error": f"unknown path {url.path}",
+                                            "paths": ["/daily", "/sessions"]}).encode("utf-8"))
+                return
+            self._send(200, body)
+
+        def _send(self, status: int, body: bytes):
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            # Keep the console quiet; agents poll frequently
+            pass
+
+    return DistilledRequestHandler
+
+
+def make_server(output_root: str, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT,
+                cache_entries: int = DEFAULT_CACHE_ENTRIES) -> ThreadingHTTPServer:
+    """HTTP server answering /daily and /sessions from ``output_root``; call ``serve_forever()`` on it."""
+    service = QueryService(DistilledStore(output_root), LruCache(cache_entries))
+    server = ThreadingHTTPServer((host, port), make_handler(service))
+    server.daemon_threads = True
+    return server
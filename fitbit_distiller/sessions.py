@@ -0,0 +1,163 @@
+from __future__ import annotations
+
+import datetime as dt
+from typing import Dict, List, Optional
+
+from .series import HrSeries, PaceSeries, epoch_seconds
+
+# Auto-detected sessions: minimum length and the inactivity allowed inside a session
+AUTO_SESSION_MIN_DURATION_MIN = 10.0
+AUTO_SESSION_GAP_ALLOW_SEC = 180
+
+_AUTO_CATEGORY = "Physical Activity_GoogleData"
+_AUTO_SOURCE = "Physical Activity_GoogleData/live_pace_*.csv"
+
+
+def detect_pace_sessions(pace_series: PaceSeries,
+                         sessions: List[Dict[str, object]]) -> List[Dict[str, object]]:
+    """Detect sessions of contiguous movement in the (sorted) live pace series.
+
+    The series is walked as one timeline, so a session that runs past
+    midnight stays one session. Returns new session records; sessions already
+    in ``sessions`` (same start, category and source path) are not emitted
+    again.
+    """
+    existing_keys = set()
+    for rec in sessions:
+        s = rec.get("start")
+        if s:
+            existing_keys.add((s, rec.get("category"), rec.get("source_path")))
+
+    detected: List[Dict[str, object]] = []
+    in_session = False
+    sess_start: Optional[dt.datetime] = None
+    last_active: Optional[dt.datetime] = None
+    steps_sum = 0.0
+    dist_mm_sum = 0.0
+    alt_mm_sum = 0.0
+
+    def _flush_session():
+        nonlocal in_session, sess_start, last_active, steps_sum, dist_mm_sum, alt_mm_sum
+        if in_session and sess_start and last_active:
+            duration_min = (epoch_seconds(last_active) - epoch_seconds(sess_start)) / 60.0
+            if duration_min >= AUTO_SESSION_MIN_DURATION_MIN:
+                start_iso = sess_start.isoformat()
+                key = (start_iso, _AUTO_CATEGORY, _AUTO_SOURCE)
+                if key not in existing_keys:
+                    rec_fl = {
+                        "date": sess_start.date().isoformat(),
+                        "start": start_iso,
+                        "end": last_active.isoformat(),
+                        "duration_min": round(duration_min, 3),
+                        "type": "Auto (live pace)",
+                        "steps": round(steps_sum, 3) if steps_sum > 0 else None,
+                        "distance": round(dist_mm_sum / 1_000_000.0, 6) if dist_mm_sum > 0 else None,
+                        "elevation_gain_m": round(alt_mm_sum / 1000.0, 3) if alt_mm_sum > 0 else None,
+                        "category": _AUTO_CATEGORY,
+                        "source_path": _AUTO_SOURCE,
+                        "_start_dt": sess_start,
+                        "_end_dt": last_active,
+                    }
+                    detected.append(rec_fl)
+                    existing_keys.add(key)
+        # reset
+        in_session = False
+        sess_start = None
+        last_active = None
+        steps_sum = 0.0
+        dist_mm_sum = 0.0
+        alt_mm_sum = 0.0
+
+    for ts, steps_v, dist_mm, alt_mm in pace_series:
+        moved = ((steps_v or 0.0) > 0.0) or ((dist_mm or 0.0) > 0.0)
+        if not in_session:
+            if moved:
+                in_session = True
+                sess_start = ts
+                last_active = ts
+                steps_sum = (steps_v or 0.0)
+                dist_mm_sum = (dist_mm or 0.0)
+                alt_mm_sum = (alt_mm or 0.0)
+            else:
+                # idle, skip
+                continue
+        else:
+            # we are in a session
+            # Check gap since last_active
+            # Wall-clock gap, so samples with and without a UTC offset (mixed exports) compare
+            if last_active and epoch_seconds(ts) - epoch_seconds(last_active) > AUTO_SESSION_GAP_ALLOW_SEC:
+                # too long gap -> end the current session and possibly start a new one
+                _flush_session()
+                if moved:
+                    in_session = True
+                    sess_start = ts
+                    last_active = ts
+                    steps_sum = (steps_v or 0.0)
+                    dist_mm_sum = (dist_mm or 0.0)
+                    alt_mm_sum = (alt_mm or 0.0)
+                else:
+                    in_session = False
+                    sess_start = None
+                    last_active = None
+                    steps_sum = 0.0
+                    dist_mm_sum = 0.0
+                    alt_mm_sum = 0.0
+            else:
+                # within the allowed gap window
+                if moved:
+                    last_active = ts
+                    steps_sum += (steps_v or 0.0)
+                    dist_mm_sum += (dist_mm or 0.0)
+                    alt_mm_sum += (alt_mm or 0.0)
+                # else keep the session open within an allowed gap
+    # End of series: flush any pending session
+    _flush_session()
+    return detected
+
+
+def enrich_session(rec: Dict[str, object], hr_series: HrSeries,
+                   pace_series: PaceSeries) -> Dict[str, object]:
+    """Return a copy of ``rec`` with missing HR, steps, distance and elevation filled from the time series.
+
+    The (sorted) series are queried by the session's absolute time range, so
+    sessions crossing midnight or spanning several days see all of their
+    samples.
+    """
+    rec = dict(rec)
+    start_dt = rec.get("_start_dt")
+    end_dt = rec.get("_end_dt")
+    # Only enrich when we have a valid window
+    if not (isinstance(start_dt, dt.datetime) and isinstance(end_dt, dt.datetime) and end_dt >= start_dt):
+        return rec
+    # Heart rate enrichment
+    values = hr_series.window_values(start_dt, end_dt)
+    if values:
+        if rec.get("avg_hr") is None:
+            rec["avg_hr"] = round(sum(values) / float(len(values)), 3)
+        if rec.get("max_hr") is None:
+            rec["max_hr"] = float(max(values))
+
+    # Live pace enrichment (steps, distance, altitude gain)
+    steps_sum = 0.0
+    dist_mm_sum = 0.0
+    alt_mm_sum = 0.0
+    any_pace_points = False
+    for steps_v, dist_mm, alt_mm in pace_series.window(start_dt, end_dt):
+        any_pace_points = True
+        if steps_v is not None:
+            steps_sum += steps_v
+        if dist_mm is not None:
+            dist_mm_sum += dist_mm
+        if alt_mm is not None:
+            alt_mm_sum += alt_mm
+    if any_pace_points:
+        # Backfill steps if missing
+        if rec.get("steps") is None and steps_sum > 0:
+            rec["steps"] = round(steps_sum, 3)
+        # Backfill distance if missing (km from millimeters)
+        if rec.get("distance") is None and dist_mm_sum > 0:
+            rec["distance"] = round(dist_mm_sum / 1_000_000.0, 6)  # km
+        # Backfill elevation gain if missing (meters from millimeters)
+        if rec.get("elevation_gain_m") is None and alt_mm_sum > 0:
+            rec["elevation_gain_m"] = round(alt_mm_sum / 1000.0, 3)
+    return rec
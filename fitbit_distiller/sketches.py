@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+from array import array
+from typing import Dict, Optional
+
+from .constants import HR_MAX_BPM, HR_MAX_SAMPLE_GAP_SEC, HR_MIN_BPM, HR_ZONES
+from .series import HrSeries
+
+
+class HrHistogram:
+    """Fixed-bin (1 bpm) heart-rate histogram with constant memory.
+
+    Bins span ``HR_MIN_BPM..HR_MAX_BPM``; readings outside that range (sensor
+    dropouts, garbage values) are ignored. Each bin keeps a sample count (for
+    percentiles) and the seconds covered by those samples (for time in zone).
+    Histograms merge by adding bins.
+    """
+
+    __slots__ = ("counts", "seconds")
+
+    def __init__(self):
+        nbins = HR_MAX_BPM - HR_MIN_BPM + 1
+        self.counts = array("L", bytes(array("L").itemsize * nbins))
+        self.seconds = array("d", bytes(array("d").itemsize * nbins))
+
+    def add(self, bpm: float, seconds: float):
+        # Also false for NaN; anything that passes rounds into a bin
+        if not HR_MIN_BPM - 0.5 <= bpm <= HR_MAX_BPM + 0.5:
+            return
+        i = int(round(bpm)) - HR_MIN_BPM
+        self.counts[i] += 1
+        self.seconds[i] += seconds
+
+    def merge(self, other: "HrHistogram") -> "HrHistogram":
+        counts, seconds = self.counts, self.seconds
+        for i, c in enumerate(other.counts):
+            if c:
+                counts[i] += c
+                seconds[i] += other.seconds[i]
+        return self
+
+    def total(self) -> int:
+        return sum(self.counts)
+
+    def percentile(self, pct: float) -> Optional[int]:
+        """Nearest-rank percentile over samples, in whole bpm."""
+        total = self.total()
+        if not total:
+            return None
+        rank = max(1, -(-total * pct // 100))
+        seen = 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= rank:
+                return HR_MIN_BPM + i
+        return HR_MAX_BPM
+
+    def minutes_between(self, lo_bpm: float, hi_bpm: Optional[float] = None) -> float:
+        """Minutes spent at ``lo_bpm <= bpm < hi_bpm`` (no upper bound when ``hi_bpm`` is None)."""
+        total = 0.0
+        for i, secs in enumerate(self.seconds):
+            bpm = HR_MIN_BPM + i
+            if bpm >= lo_bpm and (hi_bpm is None or bpm < hi_bpm):
+                total += secs
+        return total / 60.0
+
+
+def hr_day_sketch(series: HrSeries, lo: int, hi: int) -> HrHistogram:
+    """Histogram of the samples ``lo:hi`` (one day) of a sorted, merged HR series.
+
+    Each timestamp counts once, with the first sample at it: overlapping
+    exports (a legacy file and its GoogleData variant) and repeated rows
+    hold the same samples, which would otherwise double the day's weights.
+    A sample is weighted by the gap to the next timestamp (which may be on
+    the next day), capped at ``HR_MAX_SAMPLE_GAP_SEC`` so that gaps in wear
+    time do not count as time in zone; the last sample gets the cap.
+    """
+    hist = HrHistogram()
+    if lo >= hi:
+        return hist
+    times, bpm = series.times, series.bpm
+    prev_t, prev_bpm = times[lo], bpm[lo]
+    for t, b in zip(times[lo + 1:hi], bpm[lo + 1:hi]):
+        if t != prev_t:
+            hist.add(prev_bpm, min(t - prev_t, HR_MAX_SAMPLE_GAP_SEC))
+            prev_t, prev_bpm = t, b
+    weight = min(times[hi] - prev_t, HR_MAX_SAMPLE_GAP_SEC) if hi < len(times) else HR_MAX_SAMPLE_GAP_SEC
+    hist.add(prev_bpm, weight)
+    return hist
+
+
+def series_hr_sketches(series: HrSeries) -> Dict[str, HrHistogram]:
+    """Per-day histograms of a sorted, merged HR series (see ``hr_day_sketch``)."""
+    return {day: hr_day_sketch(series, lo, hi) for day, (lo, hi) in series.day_ranges().items()}
+
+
+def hr_daily_fields(hist: HrHistogram, max_hr: float) -> Dict[str, float]:
+    """Daily HR fields from a day's histogram: percentiles and minutes in each zone."""
+    fields: Dict[str, float] = {}
+    if not hist.total():
+        return fields
+    fields["hr_p50"] = float(hist.percentile(50))
+    fields["hr_p95"] = float(hist.percentile(95))
+    for zone, (lo, hi) in HR_ZONES.items():
+        fields[f"hr_zone_{zone}_minutes"] = round(
+            hist.minutes_between(lo * max_hr, hi * max_hr if hi is not None else None), 3)
+    return fields
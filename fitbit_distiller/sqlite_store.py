@@ -0,0 +1,196 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import sqlite3
+from itertools import islice
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .constants import HR_ZONES, METRIC_MAP
+
+# Bump when the meaning of stored values changes. Column changes (e.g. a new METRIC_MAP key) need no bump:
+# the database's user_version holds a fingerprint of this version and the generated DDL, and a database
+# with another fingerprint is rebuilt on the next write.
+SQLITE_SCHEMA_VERSION = 1
+# Rows per executemany call
+SQLITE_BATCH_ROWS = 10000
+
+Column = Tuple[str, str]
+
+DAILY_TABLE = "daily"
+SESSIONS_TABLE = "sessions"
+FILES_TABLE = "files"
+
+DAILY_COLUMNS: List[Column] = (
+    [("date", "TEXT PRIMARY KEY")]
+    + [(key, "REAL") for key in METRIC_MAP]
+    + [("workout_minutes", "REAL"), ("workout_count", "REAL"), ("hr_p50", "REAL"), ("hr_p95", "REAL")]
+    + [(f"hr_zone_{zone}_minutes", "REAL") for zone in HR_ZONES]
+)
+
+SESSION_COLUMNS: List[Column] = [
+    ("date", "TEXT"),
+    ("start", "TEXT"),
+    ("end", "TEXT"),
+    ("duration_min", "REAL"),
+    ("type", "TEXT"),
+    ("calories", "REAL"),
+    ("distance", "REAL"),
+    ("steps", "REAL"),
+    ("avg_hr", "REAL"),
+    ("max_hr", "REAL"),
+    ("elevation_gain_m", "REAL"),
+    ("azm_minutes", "REAL"),
+    ("azm_fat_burn_minutes", "REAL"),
+    ("azm_cardio_minutes", "REAL"),
+    ("azm_peak_minutes", "REAL"),
+    ("category", "TEXT"),
+    ("source_path", "TEXT"),
+]
+
+FILES_COLUMNS: List[Column] = [
+    ("path", "TEXT PRIMARY KEY"),
+    ("category", "TEXT"),
+    ("size_bytes", "INTEGER"),
+    ("file_class", "TEXT"),
+    ("extractor", "TEXT"),
+    ("encoding", "TEXT"),
+    ("row_count", "INTEGER"),
+    ("date_column", "TEXT"),
+    ("date_min", "TEXT"),
+    ("date_max", "TEXT"),
+    ("columns", "TEXT"),
+    ("metric_hits", "TEXT"),
+    ("errors", "TEXT"),
+    ("covered_by", "TEXT"),
+]
+
+# Files index fields stored as JSON text
+_FILES_JSON_FIELDS = {"columns", "metric_hits", "errors"}
+
+SQLITE_INDEXES = [
+    (SESSIONS_TABLE, "date"),
+    (SESSIONS_TABLE, "start"),
+    (SESSIONS_TABLE, "end"),
+    (SESSIONS_TABLE, "type"),
+    (FILES_TABLE, "category"),
+]
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _create_statements() -> List[str]:
+    def table(name: str, columns: Sequence[Column], rowid: bool = False) -> str:
+        cols = [f"{_quote(c)} {t}" for c, t in columns]
+        if rowid:
+            cols.insert(0, "id INTEGER PRIMARY KEY")
+        # Fields without a column of their own are kept as a JSON object
+        cols.append("extra TEXT")
+        return f"CREATE TABLE {name} ({', '.join(cols)})"
+
+    statements = [
+        table(DAILY_TABLE, DAILY_COLUMNS),
+        table(SESSIONS_TABLE, SESSION_COLUMNS, rowid=True),
+        table(FILES_TABLE, FILES_COLUMNS),
+    ]
+    for tbl, col in SQLITE_INDEXES:
+        statements.append(f"CREATE INDEX idx_{tbl}_{col} ON {tbl} ({_quote(col)})")
+    return statements
+
+
+def _schema_fingerprint() -> int:
+    """Positive 31-bit fingerprint of ``SQLITE_SCHEMA_VERSION`` and the DDL, stored as ``PRAGMA user_version``."""
+    ddl = "\n".join([str(SQLITE_SCHEMA_VERSION)] + _create_statements())
+    return int.from_bytes(hashlib.sha256(ddl.encode("utf-8")).digest()[:4], "big") & 0x7FFFFFFF
+
+
+def _insert_statement(table: str, columns: Sequence[Column]) -> str:
+    names = [_quote(c) for c, _ in columns] + ["extra"]
+    return f"INSERT INTO {table} ({', '.join(names)}) VALUES ({', '.join('?' * len(names))})"
+
+
+def _extra(rec: Dict[str, object], known: Iterable[str]) -> Optional[str]:
+    extra = {k: v for k, v in rec.items() if k not in known}
+    return json.dumps(extra, ensure_ascii=False) if extra else None
+
+
+def _record_rows(records: Iterable[Dict[str, object]], columns: Sequence[Column]):
+    names = [c for c, _ in columns]
+    known = set(names)
+    for rec in records:
+        yield tuple(rec.get(c) for c in names) + (_extra(rec, known),)
+
+
+def _index_rows(records: Iterable[Dict[str, object]]):
+    names = [c for c, _ in FILES_COLUMNS]
+    known = set(names) | {"date_range"}
+    for rec in records:
+        date_range = rec.get("date_range") or {}
+        row = []
+        for c in names:
+            if c == "date_min":
+                v = date_range.get("min")
+            elif c == "date_max":
+                v = date_range.get("max")
+            else:
+                v = rec.get(c)
+                if c in _FILES_JSON_FIELDS and v is not None:
+                    v = json.dumps(v, ensure_ascii=False)
+            row.append(v)
+        yield tuple(row) + (_extra(rec, known),)
+
+
+def _insert_batches(conn: sqlite3.Connection, sql: str, rows, batch_rows: int) -> int:
+    count = 0
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, batch_rows))
+        if not batch:
+            return count
+        conn.executemany(sql, batch)
+        count += len(batch)
+
+
+def write_sqlite(path: str, daily_records: Iterable[Dict[str, object]],
+                 session_records: Iterable[Dict[str, object]], index_records: Iterable[Dict[str, object]],
+                 batch_rows: int = SQLITE_BATCH_ROWS) -> Dict[str, int]:
+    """Replace the contents of the daily, sessions and files tables in the SQLite database at ``path``.
+
+    The database is opened in WAL mode and the whole rewrite is one
+    transaction, so concurrent readers see either the previous or the new
+    contents. Tables are created (or rebuilt after a schema change) as
+    needed. Returns the number of rows written per table.
+    """
+    conn = sqlite3.connect(path, isolation_level=None)
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            fingerprint = _schema_fingerprint()
+            if conn.execute("PRAGMA user_version").fetchone()[0] != fingerprint:
+                for table in (DAILY_TABLE, SESSIONS_TABLE, FILES_TABLE):
+                    conn.execute(f"DROP TABLE IF EXISTS {table}")
+                for statement in _create_statements():
+                    conn.execute(statement)
+                conn.execute(f"PRAGMA user_version={fingerprint}")
+            else:
+                for table in (DAILY_TABLE, SESSIONS_TABLE, FILES_TABLE):
+                    conn.execute(f"DELETE FROM {table}")
+            counts = {
+                DAILY_TABLE: _insert_batches(conn, _insert_statement(DAILY_TABLE, DAILY_COLUMNS),
+                                             _record_rows(daily_records, DAILY_COLUMNS), batch_rows),
+                SESSIONS_TABLE: _insert_batches(conn, _insert_statement(SESSIONS_TABLE, SESSION_COLUMNS),
+                                                _record_rows(session_records, SESSION_COLUMNS), batch_rows),
+                FILES_TABLE: _insert_batches(conn, _insert_statement(FILES_TABLE, FILES_COLUMNS),
+                                             _index_rows(index_records), batch_rows),
+            }
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        return counts
+    finally:
+        conn.close()
@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import datetime as dt
+import filecmp
 import os
 import re
 from typing import Dict, List, Optional
@@ -35,12 +36,29 @@ def to_float(s: str) -> Optional[float]:
     return None
 
 
+# Plain ISO dates/datetimes ("2024-01-31", "2024-01-31 08:00:00", "2024-01-31T08:00:00"): the shapes the
+# first matching strptime format accepts, parsed with fromisoformat instead of trying each format in turn
+_ISO_FAST_RE = re.compile(r"\d{4}-\d{2}-\d{2}(?:[T ]\d{2}:\d{2}:\d{2})?", re.ASCII)
+
+
+def _parse_iso_fast(s: str) -> Optional[dt.datetime]:
+    if _ISO_FAST_RE.fullmatch(s) is None:
+        return None
+    try:
+        return dt.datetime.fromisoformat(s)
+    except ValueError:
+        return None
+
+
 def parse_date_value(val: str) -> Optional[dt.date]:
     if val is None:
         return None
     s = str(val).strip()
     if not s:
         return None
+    fast = _parse_iso_fast(s)
+    if fast is not None:
+        return fast.date()
     # Try multiple common date/datetime formats
     candidates = [
         "%Y-%m-%d",
@@ -86,6 +104,9 @@ def parse_datetime_value(val: str) -> Optional[dt.datetime]:
     s = str(val).strip()
     if not s:
         return None
+    fast = _parse_iso_fast(s)
+    if fast is not None:
+        return fast
     fmts = [
         "%Y-%m-%d %H:%M:%S",
         "%Y-%m-%d %H:%M",
@@ -202,3 +223,35 @@ def num_value(row: Dict[str, str], headers: List[str], keywords: List[str]) -> O
 def ensure_dir(path: str):
     if not os.path.isdir(path):
         os.makedirs(path, exist_ok=True)
+
+
+def temp_path_for(path: str) -> str:
+    """Temporary sibling of ``path`` (same directory, so the final rename is atomic)."""
+    d, name = os.path.split(path)
+    return os.path.join(d, f".{name}.{os.getpid()}.tmp")
+
+
+def replace_if_changed(tmp_path: str, path: str) -> bool:
+    """Atomically move ``tmp_path`` over ``path`` unless both hold the same bytes.
+
+    Returns True when ``path`` was (re)written; an unchanged target keeps its
+    mtime and ``tmp_path`` is removed.
+    """
+    if os.path.isfile(path) and filecmp.cmp(tmp_path, path, shallow=False):
+        os.remove(tmp_path)
+        return False
+    os.replace(tmp_path, path)
+    return True
+
+
+def write_bytes_atomic(path: str, data: bytes) -> bool:
+    """Write ``data`` through a temp file plus rename; skipped when unchanged."""
+    tmp_path = temp_path_for(path)
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    return replace_if_changed(tmp_path, path)
+
+
+def write_text_atomic(path: str, text: str) -> bool:
+    """Write ``text`` (UTF-8) through a temp file plus rename; skipped when unchanged."""
+    return write_bytes_atomic(path, text.encode("utf-8"))
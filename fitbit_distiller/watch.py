@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+import os
+from typing import Dict, List, Tuple
+
+# File signature used to detect changes: (size in bytes, mtime in ns)
+FileSignature = Tuple[int, int]
+
+DEFAULT_POLL_INTERVAL_SEC = 2.0
+
+
+def find_csv_files(input_root: str) -> List[str]:
+    """All CSV files under ``input_root``, sorted so processing order is reproducible."""
+    csv_paths: List[str] = []
+    for root, _, files in os.walk(input_root):
+        for name in files:
+            if name.lower().endswith(".csv"):
+                csv_paths.append(os.path.join(root, name))
+    csv_paths.sort()
+    return csv_paths
+
+
+def snapshot_csv_files(input_root: str) -> Dict[str, FileSignature]:
+    """Map every CSV path under ``input_root`` to its current signature."""
+    snapshot: Dict[str, FileSignature] = {}
+    for path in find_csv_files(input_root):
+        try:
+            st = os.stat(path)
+        except OSError:
+            # Removed between the walk and the stat
+            continue
+        snapshot[path] = (st.st_size, st.st_mtime_ns)
+    return snapshot
+
+
+class DirectoryPoller:
+    """Detects new, changed and removed CSV files under a directory by polling.
+
+    A new or changed file is only reported once its signature has been the
+    same for two consecutive polls, so files still being copied into the
+    drop directory are picked up after the copy finishes rather than
+    half-written.
+    """
+
+    def __init__(self, input_root: str, known: Dict[str, FileSignature]):
+        self.input_root = input_root
+        # Signatures of the files whose current content has been reported
+        self.known: Dict[str, FileSignature] = dict(known)
+        # Signatures seen on the previous poll for files not yet reported
+        self._settling: Dict[str, FileSignature] = {}
+
+    def poll(self) -> Tuple[List[str], List[str]]:
+        """Return ``(changed, removed)`` paths since the last reported state, both sorted."""
+        current = snapshot_csv_files(self.input_root)
+        changed: List[str] = []
+        settling: Dict[str, FileSignature] = {}
+        for path, sig in current.items():
+            if self.known.get(path) == sig:
+                continue
+            if self._settling.get(path) == sig:
+                changed.append(path)
+                self.known[path] = sig
+            else:
+                settling[path] = sig
+        self._settling = settling
+        removed = sorted(p for p in self.known if p not in current)
+        for path in removed:
+            del self.known[path]
+        return sorted(changed), removed
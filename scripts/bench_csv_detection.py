@@ -0,0 +1,107 @@
+"""Time CSV encoding and delimiter detection on synthetic export files.
+
+Compares ``detect_csv_format`` (byte sample, direct delimiter counting),
+with and without its per-directory delimiter cache, against the previous
+approach: decode a 4 KB sample per candidate encoding, run ``csv.Sniffer``
+on it, then read the header line again as text.
+
+Usage:
+    python3 scripts/bench_csv_detection.py [--files 2000] [--rounds 3]
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fitbit_distiller import csv_reader, detect_csv_format  # noqa: E402
+
+# (file name prefix, header, row template, delimiter, encoding, BOM)
+_SHAPES = [
+    ("heart_rate", ["timestamp", "beats per minute"], ["2024-01-01T00:{m:02d}:00Z", "{v}"], ",", "utf-8", False),
+    ("steps", ["date", "steps"], ["2024-01-{d:02d}", "{v}"], ",", "utf-8", False),
+    ("calories", ["date", "calories"], ["2024-01-{d:02d}", "{v}"], ";", "utf-8", False),
+    ("daily_rhr", ["date", "resting heart rate"], ["2024-01-{d:02d}", "{v}"], ",", "utf-8", True),
+    ("exercise", ["activity name", "start time", "distance", "note"],
+     ["Randonnée", "2024-01-{d:02d} 07:00:00", "{v}", '"hill, then lake"'], ",", "latin-1", False),
+    ("sleep_score", ["timestamp", "overall_score", "duration_score"], ["2024-01-{d:02d}", "{v}", "20"], "\t", "utf-8",
+     False),
+]
+
+
+def _write_files(root: str, n: int, rows: int):
+    paths = []
+    for i in range(n):
+        prefix, header, template, delimiter, encoding, bom = _SHAPES[i % len(_SHAPES)]
+        # Several files share a directory and header, as monthly exports do
+        folder = os.path.join(root, f"dir_{i % 20}")
+        os.makedirs(folder, exist_ok=True)
+        path = os.path.join(folder, f"{prefix}_{i}.csv")
+        lines = [delimiter.join(header)]
+        for r in range(rows):
+            lines.append(delimiter.join(cell.format(m=r % 60, d=1 + r % 28, v=60 + r % 40) for cell in template))
+        data = ("\n".join(lines) + "\n").encode(encoding)
+        with open(path, "wb") as f:
+            f.write((b"\xef\xbb\xbf" if bom else b"") + data)
+        paths.append(path)
+    return paths
+
+
+def _sniffer_format(path: str):
+    """The previous detection: first encoding that works, csv.Sniffer on 4 KB, header re-read as text."""
+    for enc in ("utf-8-sig", "utf-8", "latin-1"):
+        try:
+            with open(path, "rb") as f:
+                sample = f.read(4096).decode(enc, errors="ignore")
+            try:
+                delimiter = csv.Sniffer().sniff(sample, delimiters=",;\t|").delimiter
+            except Exception:
+                delimiter = ","
+            with open(path, "r", encoding=enc, errors="ignore", newline="") as f:
+                first = next((line for line in f if line.strip()), None)
+            headers = [c.strip() for c in next(csv.reader([first], delimiter=delimiter))] if first else []
+            return enc, delimiter, headers
+        except Exception:
+            continue
+    return None
+
+
+def _uncached_format(path: str):
+    csv_reader._DIALECT_CACHE.clear()
+    return detect_csv_format(path)
+
+
+def _bench(label: str, fn, paths, rounds: int) -> list:
+    best = float("inf")
+    results = []
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        results = [fn(p) for p in paths]
+        best = min(best, time.perf_counter() - t0)
+    print(f"{label:<28} {best * 1000:9.1f} ms  {len(paths) / best:10,.0f} files/s")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=2000)
+    parser.add_argument("--rows", type=int, default=200, help="Data rows per file")
+    parser.add_argument("--rounds", type=int, default=3, help="Timed rounds; the best is reported")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = _write_files(tmp, args.files, args.rows)
+        old = _bench("sniffer (previous)", _sniffer_format, paths, args.rounds)
+        _bench("detect_csv_format, no cache", _uncached_format, paths, args.rounds)
+        new = _bench("detect_csv_format, cached", detect_csv_format, paths, args.rounds)
+        same = sum(o is not None and n is not None and o[1:] == (n.delimiter, n.headers) for o, n in zip(old, new))
+        print(f"same delimiter and headers: {same}/{len(paths)}")
+
+
+if __name__ == "__main__":
+    main()
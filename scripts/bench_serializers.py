@@ -0,0 +1,70 @@
+"""Compare JSONL serializer backends on synthetic distiller records.
+
+Usage:
+    python3 scripts/bench_serializers.py [--records 200000]
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fitbit_distiller import JsonlWriter, get_serializer, orjson_available  # noqa: E402
+
+
+def _records(n: int):
+    rnd = random.Random(42)
+    out = []
+    for i in range(n):
+        day = f"2023-{1 + i % 12:02d}-{1 + i % 28:02d}"
+        out.append({
+            "date": day,
+            "start": f"{day}T18:{i % 60:02d}:00",
+            "end": f"{day}T19:{i % 60:02d}:00",
+            "duration_min": round(rnd.uniform(10, 120), 3),
+            "type": rnd.choice(["Run", "Walk", "Bike", "Randonnée"]),
+            "calories": float(rnd.randint(50, 900)),
+            "distance": round(rnd.uniform(0.5, 30), 6),
+            "steps": float(rnd.randint(500, 20000)),
+            "avg_hr": round(rnd.uniform(80, 170), 3),
+            "category": "Physical Activity_GoogleData",
+            "source_path": f"Physical Activity_GoogleData/exercise_{i % 50}.csv",
+        })
+    return out
+
+
+def _bench(label: str, serializer, records, path: str) -> bytes:
+    t0 = time.perf_counter()
+    with JsonlWriter(path, serializer) as w:
+        w.write_many(records)
+    elapsed = time.perf_counter() - t0
+    with open(path, "rb") as f:
+        data = f.read()
+    print(f"{label:<22} {elapsed * 1000:9.1f} ms  {len(records) / elapsed:12,.0f} rec/s  {len(data):,} bytes")
+    return data
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--records", type=int, default=200_000)
+    args = parser.parse_args()
+
+    records = _records(args.records)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.jsonl")
+        _bench("stdlib/default", get_serializer("stdlib", "default"), records, path)
+        canonical = _bench("stdlib/canonical", get_serializer("stdlib", "canonical"), records, path)
+        if orjson_available():
+            fast = _bench("orjson/canonical", get_serializer("orjson", "canonical"), records, path)
+            print("canonical outputs identical:", fast == canonical)
+        else:
+            print("orjson not installed; skipped")
+
+
+if __name__ == "__main__":
+    main()
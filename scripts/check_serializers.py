@@ -0,0 +1,83 @@
+"""Check that the canonical JSON format is byte-identical between serializer backends.
+
+Edge-case floats are encoded with the stdlib canonical serializer and compared
+with the bytes orjson writes for them (the expected bytes are listed, so the
+check also runs without orjson), then decoded again to confirm the values
+round-trip. Exits non-zero on any mismatch.
+
+Usage:
+    python3 scripts/check_serializers.py
+"""
+from __future__ import annotations
+
+import json
+import math
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fitbit_distiller import get_serializer, orjson_available  # noqa: E402
+
+# value -> bytes orjson writes for it
+CASES = [
+    (5e-06, b"5e-6"),
+    (1e-05, b"0.00001"),
+    (0.0001, b"0.0001"),
+    (1.5e-07, b"1.5e-7"),
+    (-2.5e-300, b"-2.5e-300"),
+    (5e-324, b"5e-324"),
+    (0.0, b"0.0"),
+    (-0.0, b"-0.0"),
+    (0.1, b"0.1"),
+    (12.0, b"12.0"),
+    (1e15, b"1000000000000000.0"),
+    (9999999999999998.0, b"9999999999999998.0"),
+    (1e16, b"1e16"),
+    (1.23e20, b"1.23e20"),
+    (1.2345678901234568e17, b"1.2345678901234568e17"),
+    (1.7976931348623157e308, b"1.7976931348623157e308"),
+    (float("nan"), b"null"),
+    (float("inf"), b"null"),
+    (float("-inf"), b"null"),
+]
+
+
+def _same_value(a: object, b: object) -> bool:
+    if isinstance(b, float) and not math.isfinite(b):
+        return a is None
+    return a == b and math.copysign(1.0, a) == math.copysign(1.0, b)
+
+
+def main() -> int:
+    stdlib = get_serializer("stdlib", "canonical")
+    backends = [("stdlib", stdlib)]
+    if orjson_available():
+        backends.append(("orjson", get_serializer("orjson", "canonical")))
+    else:
+        print("orjson not installed; comparing stdlib against the expected bytes only")
+
+    failures = 0
+    for value, expected in CASES:
+        for name, serializer in backends:
+            got = serializer(value)
+            if got != expected:
+                print(f"{name}: {value!r} encoded as {got!r}, expected {expected!r}")
+                failures += 1
+            decoded = json.loads(got)
+            if not _same_value(decoded, value):
+                print(f"{name}: {value!r} decoded as {decoded!r}")
+                failures += 1
+    # Nested records take the same path as the daily/session outputs
+    record = {"date": "2024-01-01", "values": [v for v, _ in CASES], "nested": {"x": 5e-06, "s": "1e+16"}}
+    encoded = {name: serializer(record) for name, serializer in backends}
+    if len(set(encoded.values())) != 1:
+        print("record encodings differ:", encoded)
+        failures += 1
+
+    print(f"{len(CASES)} values, {len(backends)} backend(s): {'OK' if not failures else f'{failures} failure(s)'}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
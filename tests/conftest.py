@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Import the package and distill_fitbit.py from the checkout, as scripts/ does
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
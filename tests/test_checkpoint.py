@@ -0,0 +1,100 @@
+import os
+import pickle
+
+import pytest
+
+import distill_fitbit
+from fitbit_distiller import RunCheckpoint, contributions_to_agg, finalize_daily, make_plan
+from fitbit_distiller.checkpoint import SERIES_FILE, STATE_FILE
+
+
+class _InlineExecutor:
+    """Runs tasks in this process, in reverse order, and can be interrupted after some results."""
+
+    def __init__(self, interrupt_after=None):
+        self.interrupt_after = interrupt_after
+
+    def run(self, tasks):
+        for n, (key, fn, args) in enumerate(reversed(list(tasks))):
+            if n == self.interrupt_after:
+                raise KeyboardInterrupt
+            yield key, fn(*args), None
+
+
+@pytest.fixture
+def batches(tmp_path):
+    root = str(tmp_path / "Fitbit")
+    paths = []
+    for i in range(7):
+        folder = os.path.join(root, "Physical Activity" if i % 2 else "Physical Activity_GoogleData")
+        os.makedirs(folder, exist_ok=True)
+        path = os.path.join(folder, f"steps_{i}.csv")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("date,steps,distance\n" + "".join(f"2024-01-{d:02d},{100 * i + d},{0.1 * i + d / 3}\n"
+                                                         for d in range(1 + i, 10 + i)))
+        paths.append(path)
+    paths.sort()
+    return root, [paths[i:i + 2] for i in range(0, len(paths), 2)]
+
+
+def _result(merged):
+    contributions_to_agg(merged.contrib, merged.daily)
+    return finalize_daily(merged.daily), sorted(rec["path"] for rec in merged.index_records)
+
+
+def _run(root, batches, executor, checkpoint=None, resume=False):
+    return distill_fitbit._run_batches(batches, root, executor, True, False, False, checkpoint, resume,
+                                       checkpoint_interval=0.0)
+
+
+def test_resumed_run_matches_an_uninterrupted_one(batches, tmp_path):
+    root, batches = batches
+    expected = _result(_run(root, batches, _InlineExecutor()))
+    state_dir = str(tmp_path / "state")
+    checkpoint = RunCheckpoint(state_dir, make_plan(root, batches, {"dedup": True}))
+    checkpoint.start()
+    checkpoint.set_series(("hr", "pace"))
+    with pytest.raises(KeyboardInterrupt):
+        _run(root, batches, _InlineExecutor(interrupt_after=2), checkpoint)
+
+    resumed = RunCheckpoint(state_dir, make_plan(root, batches, {"dedup": True}))
+    assert resumed.matches()
+    done, pending = resumed.load_reduce_state()
+    assert done == {len(batches) - 1, len(batches) - 2} and pending
+    assert resumed.load_series() == ("hr", "pace")
+    assert _result(_run(root, batches, _InlineExecutor(), resumed, resume=True)) == expected
+    resumed.clear()
+    assert not os.path.exists(state_dir)
+
+
+def test_series_is_written_once_with_the_first_save(batches, tmp_path):
+    root, batches = batches
+    checkpoint = RunCheckpoint(str(tmp_path / "state"), make_plan(root, batches, {}))
+    checkpoint.start()
+    checkpoint.set_series(("hr", "pace"))
+    series_path = os.path.join(checkpoint.state_dir, SERIES_FILE)
+    assert not os.path.exists(series_path)
+    checkpoint.save_reduce_state({0}, {})
+    mtime = os.stat(series_path).st_mtime_ns
+    os.utime(series_path, ns=(mtime - 10 ** 9, mtime - 10 ** 9))
+    checkpoint.save_reduce_state({0, 1}, {})
+    assert os.stat(series_path).st_mtime_ns == mtime - 10 ** 9
+    with open(os.path.join(checkpoint.state_dir, STATE_FILE), "rb") as f:
+        assert pickle.load(f)["done"] == [0, 1]
+
+
+def test_changed_inputs_do_not_match(batches, tmp_path):
+    root, batches = batches
+    state_dir = str(tmp_path / "state")
+    RunCheckpoint(state_dir, make_plan(root, batches, {})).start()
+    with open(batches[0][0], "a", encoding="utf-8") as f:
+        f.write("2024-02-01,1,1\n")
+    assert not RunCheckpoint(state_dir, make_plan(root, batches, {})).matches()
+    assert not RunCheckpoint(state_dir, make_plan(root, batches[:-1], {})).matches()
+
+
+def test_start_refuses_unrelated_directories(tmp_path):
+    (tmp_path / "notes.txt").write_text("keep me")
+    with pytest.raises(ValueError):
+        RunCheckpoint(str(tmp_path), {"version": 0}).start()
+    assert (tmp_path / "notes.txt").exists()
@@ -0,0 +1,122 @@
+import os
+from array import array
+
+import distill_fitbit
+from fitbit_distiller import (
+    FileContributions,
+    KeyedValues,
+    PartialAggregate,
+    contribution_key,
+    contributions_to_agg,
+    finalize_daily,
+    find_covered_files,
+    merge_contributions,
+    normalize_timestamp,
+    value_source,
+)
+
+
+def _write(root, rel, text):
+    path = os.path.join(root, *rel.split("/"))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+    return path
+
+
+def _daily(root, rels, dedup=True):
+    merged = PartialAggregate(dedup)
+    for rel in sorted(rels):
+        merged.merge(distill_fitbit.process_csv_batch(([os.path.join(root, *rel.split("/"))], root, dedup, False)))
+    contributions_to_agg(merged.contrib, merged.daily)
+    return {rec["date"]: rec for rec in finalize_daily(merged.daily)}
+
+
+def test_contribution_key_is_stable_and_distinguishes_occurrences():
+    key = contribution_key("steps", "2024-01-01", "physical activity")
+    assert key == contribution_key("steps", "2024-01-01", "physical activity")
+    assert key != contribution_key("calories", "2024-01-01", "physical activity")
+    assert key != contribution_key("steps", "2024-01-01", "physical activity", occurrence=1)
+
+
+def test_export_variants_normalize_to_the_same_source_and_timestamp():
+    assert value_source("Physical Activity") == value_source("Physical Activity_GoogleData")
+    assert value_source("Sleep", "Fitbit") != value_source("Sleep")
+    assert normalize_timestamp("2024-01-01T07:00:00Z", "2024-01-01") == \
+        normalize_timestamp("2024-01-01 07:00:00", "2024-01-01")
+    assert normalize_timestamp("2024-01-01", "2024-01-01") == "2024-01-01"
+
+
+def test_file_contributions_keep_repeats_within_a_file():
+    contrib = FileContributions()
+    for _ in range(2):
+        contrib.add("2024-01-01", "steps", "2024-01-01T07:00:00", "physical activity", 100.0)
+    keyed = contrib.finish()["2024-01-01"]["steps"]
+    assert len(keyed) == 2 and len(set(keyed.keys)) == 2
+
+
+def test_merge_keeps_the_first_value_per_key():
+    first = FileContributions()
+    first.add("2024-01-01", "steps", "2024-01-01", "physical activity", 100.0)
+    second = FileContributions()
+    second.add("2024-01-01", "steps", "2024-01-01", "physical activity", 999.0)
+    second.add("2024-01-02", "steps", "2024-01-02", "physical activity", 50.0)
+    merged = {}
+    merge_contributions(merged, first.finish())
+    merge_contributions(merged, second.finish())
+    assert list(merged["2024-01-01"]["steps"].values) == [100.0]
+    assert list(merged["2024-01-02"]["steps"].values) == [50.0]
+
+
+def test_keyed_values_update_skips_known_keys():
+    kv = KeyedValues()
+    kv.update(KeyedValues(array("q", [1, 2]), array("d", [1.0, 2.0])))
+    kv.update(KeyedValues(array("q", [2, 3]), array("d", [20.0, 3.0])))
+    assert list(kv.keys) == [1, 2, 3] and list(kv.values) == [1.0, 2.0, 3.0]
+
+
+def test_overlapping_exports_count_once(tmp_path):
+    root = str(tmp_path)
+    rows = "date,steps\n2024-01-01,8000\n2024-01-02,9000\n"
+    _write(root, "Physical Activity/steps_2024-01.csv", rows)
+    _write(root, "Physical Activity_GoogleData/steps_2024-01.csv", rows + "2024-01-03,7000\n")
+    rels = ["Physical Activity/steps_2024-01.csv", "Physical Activity_GoogleData/steps_2024-01.csv"]
+    daily = _daily(root, rels)
+    assert [daily[d]["steps"] for d in sorted(daily)] == [8000.0, 9000.0, 7000.0]
+    # Without dedup the overlapping days are summed
+    assert _daily(root, rels, dedup=False)["2024-01-01"]["steps"] == 16000.0
+
+
+def test_repeated_session_counts_once_within_a_file(tmp_path):
+    root = str(tmp_path)
+    _write(root, "Physical Activity/exercise_log.csv",
+           "activity name,start time,end time,calories\n"
+           "Hike,2024-01-02 09:00:00,2024-01-02 10:00:00,800\n"
+           "Hike,2024-01-02 09:00:00,2024-01-02 10:00:00,800\n")
+    assert _daily(root, ["Physical Activity/exercise_log.csv"])["2024-01-02"]["calories"] == 800.0
+
+
+def _index(path, category, lo, hi, rows, columns=("date", "steps"), precision="date"):
+    return {"path": path, "category": category, "columns": list(columns), "row_count": rows,
+            "date_range": {"min": lo, "max": hi}, "date_precision": precision}
+
+
+def test_find_covered_files():
+    records = [
+        _index("A/steps_jan.csv", "Physical Activity", "2024-01-01", "2024-01-31", 31),
+        _index("B/steps_all.csv", "Physical Activity_GoogleData", "2024-01-01", "2024-03-31", 91),
+        # Different columns: never covered
+        _index("A/calories.csv", "Physical Activity", "2024-01-01", "2024-01-31", 31, ("date", "calories")),
+        # Intraday files do not take part
+        _index("A/steps_intraday.csv", "Physical Activity", "2024-01-02", "2024-01-02", 5, precision="datetime"),
+    ]
+    assert find_covered_files(records) == {"A/steps_jan.csv": "B/steps_all.csv"}
+    # Denser files are not covered by sparser ones
+    records[0]["row_count"] = 62
+    assert find_covered_files(records) == {}
+
+
+def test_find_covered_files_ties_do_not_depend_on_order():
+    a = _index("a.csv", "Sleep", "2024-01-01", "2024-01-10", 10)
+    b = _index("b.csv", "Sleep_GoogleData", "2024-01-01", "2024-01-10", 10)
+    assert find_covered_files([a, b]) == find_covered_files([b, a]) == {"b.csv": "a.csv"}
@@ -0,0 +1,67 @@
+import pytest
+
+from fitbit_distiller import (
+    GENERIC_EXTRACTOR,
+    REGISTRY,
+    Extractor,
+    ExtractorRegistry,
+    FileContext,
+    classify_headers,
+    run_extractor,
+)
+
+
+def _ctx(rel, headers, category="Physical Activity"):
+    return FileContext(f"/export/{rel}", rel, category, headers, classify_headers(headers, category, rel))
+
+
+@pytest.mark.parametrize("rel,headers,category,expected", [
+    ("steps_2024-01.csv", ["date", "steps"], "Physical Activity", "steps"),
+    ("calories.csv", ["date", "calories"], "Other", "calories"),
+    ("daily_resting_heart_rate.csv", ["date", "resting heart rate"], "Heart Rate Variability", "resting_heart_rate"),
+    ("heart_rate_2024-01-01.csv", ["timestamp", "beats per minute"], "Physical Activity_GoogleData", "heart_rate"),
+    ("live_pace_2024-01.csv", ["timestamp", "steps", "distance millimeters"], "Physical Activity_GoogleData",
+     "live_pace"),
+    ("sleep_score.csv", ["timestamp", "sleep score"], "Sleep", "sleep"),
+    ("exercise_log.csv", ["activity name", "start time", "end time", "calories"], "Physical Activity", "exercise"),
+    # Right name, wrong columns: falls back
+    ("steps_2024-01.csv", ["date", "calories"], "Physical Activity", "generic"),
+    ("misc.csv", ["date", "floors"], "Other", "generic"),
+])
+def test_files_go_to_their_extractor(rel, headers, category, expected):
+    assert REGISTRY.select(_ctx(rel, headers, category)).name == expected
+
+
+def test_dedicated_extractor_reads_its_metric():
+    ctx = _ctx("steps_2024-01.csv", ["date", "steps"])
+    rows = [{"date": "2024-01-01", "steps": "8000"}, {"date": "2024-01-02", "steps": "9000"}]
+    assert run_extractor(ctx, rows).name == "steps"
+    assert ctx.row_count == 2 and (ctx.min_date, ctx.max_date) == ("2024-01-01", "2024-01-02")
+    assert ctx.metric_hits == {"steps": 2}
+    assert [list(ctx.local_contrib.finish()[d]["steps"].values) for d in ("2024-01-01", "2024-01-02")] == [
+        [8000.0], [9000.0]]
+
+
+def test_extractors_must_implement_extract():
+    class Incomplete(Extractor):
+        name = "incomplete"
+        patterns = ("x_*.csv",)
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+def test_registry_requires_patterns_or_categories_and_a_fallback():
+    class Anything(Extractor):
+        name = "anything"
+
+        def extract(self, ctx, rows):
+            pass
+
+    registry = ExtractorRegistry()
+    with pytest.raises(ValueError):
+        registry.register(Anything())
+    with pytest.raises(LookupError):
+        registry.select(_ctx("steps.csv", ["date", "steps"]))
+    registry.register(GENERIC_EXTRACTOR, fallback=True)
+    assert registry.select(_ctx("steps.csv", ["date", "steps"])) is GENERIC_EXTRACTOR
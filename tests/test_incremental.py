@@ -0,0 +1,121 @@
+import datetime as dt
+import os
+
+import pytest
+
+import distill_fitbit
+from fitbit_distiller import (
+    ROLLUP_RESOLUTIONS,
+    HrSeries,
+    PaceSeries,
+    PartialAggregate,
+    WatchState,
+    get_serializer,
+    scan_series_file,
+)
+
+SERIALIZER = get_serializer("stdlib", "canonical")
+RESOLUTIONS = list(ROLLUP_RESOLUTIONS)
+
+
+def _write(path, lines):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+
+
+@pytest.fixture
+def export(tmp_path):
+    root = str(tmp_path / "Fitbit")
+    activity = os.path.join(root, "Physical Activity_GoogleData")
+    _write(os.path.join(root, "Physical Activity", "steps_2024-01.csv"),
+           ["date,steps"] + [f"2024-01-{d:02d},{8000 + d}" for d in range(1, 5)])
+    _write(os.path.join(activity, "steps_2024-01.csv"),
+           ["date,steps"] + [f"2024-01-{d:02d},{8000 + d}" for d in range(3, 7)])
+    _write(os.path.join(activity, "exercise_log.csv"),
+           ["activity name,start time,end time,calories",
+            "Run,2024-01-02 07:00:00,2024-01-02 07:45:00,400"])
+    start = dt.datetime(2024, 1, 1, 22, 0)
+    for day in range(3):
+        first = start + dt.timedelta(days=day)
+        _write(os.path.join(activity, f"heart_rate_{first.date()}.csv"),
+               ["timestamp,beats per minute"]
+               + [f"{(first + dt.timedelta(minutes=m)).isoformat()}Z,{70 + (m * 7) % 90}" for m in range(0, 240, 3)])
+    _write(os.path.join(activity, "live_pace_2024-01.csv"),
+           ["timestamp,steps,distance millimeters,altitude gain millimeters"]
+           + [f"{(start + dt.timedelta(minutes=m)).isoformat()}Z,100,80000,100" for m in range(0, 60)])
+    return root
+
+
+def _csvs(root):
+    return sorted(os.path.join(d, f) for d, _, files in os.walk(root) for f in files if f.endswith(".csv"))
+
+
+def _process(root, paths):
+    partials = {p: distill_fitbit.process_csv_batch(([p], root, True, False)) for p in paths}
+    return partials, {p: scan_series_file(p) for p in paths}
+
+
+def _read_outputs(out):
+    found = {}
+    for d, _, files in os.walk(out):
+        for f in files:
+            with open(os.path.join(d, f), "rb") as fh:
+                found[os.path.relpath(os.path.join(d, f), out)] = fh.read()
+    return found
+
+
+def _full_rebuild(root, out):
+    partials, series = _process(root, _csvs(root))
+    merged = PartialAggregate(True)
+    for path in sorted(partials):
+        merged.merge(partials[path])
+    hr, pace = HrSeries(), PaceSeries()
+    for path in sorted(series):
+        hr.extend(series[path][0])
+        pace.extend(series[path][1])
+    paths, rollup_paths = distill_fitbit._output_paths(out)
+    os.makedirs(out)
+    distill_fitbit._write_outputs(merged, [], hr, pace, paths, rollup_paths, RESOLUTIONS, SERIALIZER, 220.0,
+                                  trends=True)
+    return _read_outputs(out)
+
+
+def _publish(state, out):
+    paths, rollup_paths = distill_fitbit._output_paths(out)
+    os.makedirs(out)
+    distill_fitbit._publish_outputs(state.index_records(), state.rollup_days(), state.session_records,
+                                    state.daily_records(), paths, rollup_paths, RESOLUTIONS, SERIALIZER,
+                                    trends=True)
+    return _read_outputs(out)
+
+
+def test_updates_match_a_full_rebuild(export, tmp_path):
+    state = WatchState(True, 220.0, RESOLUTIONS, SERIALIZER)
+    state.update(*_process(export, _csvs(export)))
+    step = 0
+
+    def check():
+        nonlocal step
+        step += 1
+        assert _publish(state, str(tmp_path / f"inc{step}")) == _full_rebuild(export, str(tmp_path / f"full{step}"))
+
+    check()
+    activity = os.path.join(export, "Physical Activity_GoogleData")
+    # Shorten one HR file: its days, the day after and the sessions overlapping them change
+    hr_path = os.path.join(activity, "heart_rate_2024-01-02.csv")
+    with open(hr_path, encoding="utf-8") as f:
+        lines = f.read().splitlines()
+    _write(hr_path, lines[:20])
+    state.update(*_process(export, [hr_path]))
+    check()
+    # Remove the pace file: the auto-detected session across midnight goes away
+    pace_path = os.path.join(activity, "live_pace_2024-01.csv")
+    os.remove(pace_path)
+    state.update({}, {}, removed=[pace_path])
+    check()
+    # A new file that overlaps existing days
+    new_path = os.path.join(activity, "heart_rate_extra.csv")
+    _write(new_path, ["timestamp,beats per minute", "2024-01-02T23:59:00Z,180", "2024-01-05T12:00:00Z,90"])
+    state.update(*_process(export, [new_path]))
+    check()
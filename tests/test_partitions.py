@@ -0,0 +1,57 @@
+import json
+import os
+
+from fitbit_distiller import (
+    MANIFEST_NAME,
+    get_serializer,
+    partition_of,
+    partition_relpath,
+    write_manifest,
+    write_partitions,
+)
+
+SERIALIZER = get_serializer("stdlib", "canonical")
+
+
+def _records(months):
+    return [{"date": f"2024-{m:02d}-{d:02d}", "steps": float(m * 100 + d)} for m in months for d in (1, 15)]
+
+
+def test_partition_of():
+    assert partition_of("2024-03-15") == ("2024", "03")
+    assert partition_of(None) == ("unknown", "unknown")
+    assert partition_of("soon") == ("unknown", "unknown")
+    assert partition_relpath("daily", "2024", "03") == "daily/year=2024/month=03/part.jsonl"
+
+
+def test_only_changed_partitions_are_rewritten_and_stale_ones_removed(tmp_path):
+    root = str(tmp_path)
+    entries, written = write_partitions(root, "daily", _records([1, 2, 3]) + [{"steps": 1.0}], SERIALIZER)
+    assert [(e["year"], e["month"], e["records"]) for e in entries] == [
+        ("2024", "01", 2), ("2024", "02", 2), ("2024", "03", 2), ("unknown", "unknown", 1)]
+    assert len(written) == 4
+
+    # February changes, March disappears
+    records = _records([1, 2])
+    records[2]["steps"] = 0.0
+    entries, written = write_partitions(root, "daily", records, SERIALIZER)
+    rel = sorted(os.path.relpath(p, root).replace(os.sep, "/") for p in written)
+    assert rel == ["daily/year=2024/month=02/part.jsonl", "daily/year=2024/month=03/part.jsonl",
+                   "daily/year=unknown/month=unknown/part.jsonl"]
+    assert not os.path.exists(os.path.join(root, "daily", "year=2024", "month=03"))
+    with open(os.path.join(root, "daily", "year=2024", "month=02", "part.jsonl"), "rb") as f:
+        assert f.read() == b'{"date":"2024-02-01","steps":0.0}\n{"date":"2024-02-15","steps":215.0}\n'
+
+
+def test_manifest_lists_checksums_and_only_changes_with_partitions(tmp_path):
+    root = str(tmp_path)
+    entries, _ = write_partitions(root, "daily", _records([1]), SERIALIZER)
+    path = write_manifest(root, {"daily": entries})
+    assert path == os.path.join(root, MANIFEST_NAME)
+    with open(path, encoding="utf-8") as f:
+        manifest = json.load(f)
+    [entry] = manifest["datasets"]["daily"]["partitions"]
+    assert entry["path"] == "daily/year=2024/month=01/part.jsonl" and entry["records"] == 2
+    assert len(entry["sha256"]) == 64
+    assert write_manifest(root, {"daily": entries}) is None
+
@@ -0,0 +1,50 @@
+import random
+
+from fitbit_distiller import PartialAggregate, TreeReducer
+
+
+def _reduce(order, pending=None):
+    reducer = TreeReducer(lambda a, b: f"({a}+{b})", pending)
+    for i in order:
+        reducer.add(i, str(i))
+    return reducer
+
+
+def test_result_does_not_depend_on_arrival_order():
+    n = 13
+    expected = _reduce(range(n)).result()
+    rnd = random.Random(7)
+    for _ in range(20):
+        order = list(range(n))
+        rnd.shuffle(order)
+        assert _reduce(order).result() == expected
+    # Leaves stay in index order
+    assert [int(tok.strip("()")) for tok in expected.split("+")] == list(range(n))
+
+
+def test_restored_nodes_continue_the_same_tree():
+    n = 9
+    expected = _reduce(range(n)).result()
+    first = _reduce([4, 0, 7, 1])
+    resumed = _reduce([8, 2, 6, 3, 5], pending=first.nodes())
+    assert resumed.result() == expected
+
+
+def test_float_sums_are_reproducible():
+    values = [0.1 * (i % 7) + 1e-9 * i for i in range(50)]
+
+    def leaf(i):
+        partial = PartialAggregate(dedup=False)
+        partial.add_result({"2024-01-01": {"distance": values[i]}}, {}, [], None)
+        return partial
+
+    results = set()
+    rnd = random.Random(3)
+    for _ in range(5):
+        order = list(range(len(values)))
+        rnd.shuffle(order)
+        reducer = TreeReducer(PartialAggregate.merge)
+        for i in order:
+            reducer.add(i, leaf(i))
+        results.add(reducer.result().daily["2024-01-01"]["distance"])
+    assert len(results) == 1
@@ -0,0 +1,63 @@
+import os
+import time
+from concurrent.futures.process import BrokenProcessPool
+
+from fitbit_distiller import TaskTimeout, WindowedExecutor
+
+
+def _work(x, sleep=0.0):
+    if x == "die":
+        os._exit(1)
+    time.sleep(sleep)
+    return x
+
+
+def _outcomes(results):
+    return {key: type(error).__name__ if error is not None else result for key, result, error in results}
+
+
+def test_window_bounds_tasks_taken_ahead_of_results():
+    pulled = []
+
+    def tasks():
+        for i in range(20):
+            pulled.append(i)
+            yield i, _work, (i,)
+
+    with WindowedExecutor(2, max_in_flight=3) as ex:
+        seen = 0
+        for key, result, error in ex.run(tasks()):
+            seen += 1
+            assert error is None and result == key
+            assert len(pulled) - seen <= 3
+    assert seen == 20
+
+
+def test_timeout_fails_only_the_hung_task():
+    # One worker: the short tasks queue behind each other for longer than the timeout but are not
+    # timed until they start
+    tasks = [(i, _work, (i, 0.4)) for i in range(3)] + [("hang", _work, ("hang", 30)), ("after", _work, ("after",))]
+    t0 = time.monotonic()
+    with WindowedExecutor(1, max_in_flight=3, task_timeout=1.0) as ex:
+        results = list(ex.run(tasks))
+    assert time.monotonic() - t0 < 10
+    assert _outcomes(results) == {0: 0, 1: 1, 2: 2, "hang": "TaskTimeout", "after": "after"}
+    assert all(isinstance(error, TaskTimeout) for key, _, error in results if key == "hang")
+
+
+def test_crashing_task_is_rerun_alone_and_only_it_fails():
+    tasks = [(i, _work, ("die" if i == 3 else i, 0.1)) for i in range(8)]
+    with WindowedExecutor(2, max_in_flight=8) as ex:
+        results = list(ex.run(tasks))
+    errors = {key: error for key, _, error in results if error is not None}
+    assert list(errors) == [3] and isinstance(errors[3], BrokenProcessPool)
+    assert _outcomes(results) == {**{i: i for i in range(8)}, 3: "BrokenProcessPool"}
+
+
+def test_retired_pools_are_released():
+    with WindowedExecutor(2, max_tasks_per_child=1) as ex:
+        most_retired = 0
+        for key, result, error in ex.run([(i, _work, (i,)) for i in range(30)]):
+            assert error is None
+            most_retired = max(most_retired, len(ex._retired))
+        assert most_retired <= 3
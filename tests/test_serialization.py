@@ -0,0 +1,68 @@
+import json
+import os
+import random
+import sys
+
+import pytest
+
+from fitbit_distiller import JsonlWriter, get_serializer, orjson_available, public_fields
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts"))
+from check_serializers import CASES  # noqa: E402
+
+requires_orjson = pytest.mark.skipif(not orjson_available(), reason="orjson not installed")
+
+
+def _records(n=500):
+    rnd = random.Random(11)
+    out = []
+    for i in range(n):
+        out.append({
+            "date": f"2024-01-{1 + i % 28:02d}",
+            "type": rnd.choice(["Run", "Randonnée", 'quote "x"', "tab\there"]),
+            "distance": rnd.uniform(-1e3, 1e3) * 10 ** rnd.randint(-8, 18),
+            "steps": float(rnd.randint(0, 30000)),
+            "nested": {"values": [rnd.random(), None, True, i]},
+        })
+    return out
+
+
+@pytest.mark.parametrize("value,expected", CASES)
+def test_stdlib_canonical_floats_match_orjson_bytes(value, expected):
+    assert get_serializer("stdlib", "canonical")({"v": value}) == b'{"v":' + expected + b"}"
+
+
+@requires_orjson
+def test_canonical_backends_are_byte_identical():
+    stdlib = get_serializer("stdlib", "canonical")
+    fast = get_serializer("orjson", "canonical")
+    for rec in _records():
+        assert stdlib(rec) == fast(rec)
+
+
+def test_default_format_matches_json_dumps():
+    default = get_serializer("stdlib", "default")
+    for rec in _records(50):
+        assert default(rec) == json.dumps(rec, ensure_ascii=False).encode("utf-8")
+
+
+def test_orjson_backend_rejects_default_format():
+    with pytest.raises(ValueError):
+        get_serializer("orjson", "default")
+
+
+def test_atomic_writer_only_replaces_changed_files(tmp_path):
+    path = str(tmp_path / "out.jsonl")
+    serializer = get_serializer("stdlib", "canonical")
+    records = [public_fields({"date": "2024-01-01", "steps": 1.0, "_key": 1, "none": None})]
+    for expected in (True, False):
+        with JsonlWriter(path, serializer, atomic=True) as w:
+            w.write_many(records)
+        assert w.changed is expected
+    with open(path, "rb") as f:
+        assert f.read() == b'{"date":"2024-01-01","steps":1.0}\n'
+    with pytest.raises(RuntimeError):
+        with JsonlWriter(path, serializer, atomic=True) as w:
+            w.write({"date": "2024-01-02"})
+            raise RuntimeError
+    assert os.listdir(str(tmp_path)) == ["out.jsonl"]
@@ -0,0 +1,106 @@
+import datetime as dt
+import random
+
+from fitbit_distiller import HrSeries, PaceSeries, enrich_session
+
+T0 = dt.datetime(2024, 1, 1, 23, 50)
+
+
+def _hr(offsets_bpm):
+    series = HrSeries()
+    for minutes, bpm in offsets_bpm:
+        series.append(T0 + dt.timedelta(minutes=minutes), bpm)
+    return series
+
+
+def test_window_spans_midnight():
+    series = _hr([(0, 100), (5, 110), (10, 120), (15, 130), (20, 140)])
+    values = series.window_values(T0 + dt.timedelta(minutes=5), T0 + dt.timedelta(minutes=15))
+    assert list(values) == [110, 120, 130]
+    assert series.day_ranges() == {"2024-01-01": (0, 2), "2024-01-02": (2, 5)}
+
+
+def test_window_bounds_are_inclusive_and_ignore_offsets():
+    series = _hr([(0, 100), (10, 120)])
+    utc = dt.timezone.utc
+    values = series.window_values(T0.replace(tzinfo=utc), (T0 + dt.timedelta(minutes=10)).replace(tzinfo=utc))
+    assert list(values) == [100, 120]
+    assert list(series.window_values(T0 + dt.timedelta(seconds=1), T0 + dt.timedelta(minutes=9))) == []
+
+
+def test_multi_day_session_enrichment():
+    # One sample per hour for two days, peaking on the second day
+    series = _hr([(h * 60, 150 if h == 30 else 80) for h in range(48)])
+    session = {"_start_dt": T0, "_end_dt": T0 + dt.timedelta(days=2)}
+    enriched = enrich_session(session, series, PaceSeries())
+    assert enriched["max_hr"] == 150.0
+    assert enriched["avg_hr"] == round((150 + 47 * 80) / 48, 3)
+
+
+def test_pace_timestamps_keep_their_utc_offset():
+    series = PaceSeries()
+    aware = T0.replace(tzinfo=dt.timezone(dt.timedelta(hours=2)))
+    series.append(aware, 10.0, None, 5.0)
+    series.append(T0 + dt.timedelta(minutes=1), 20.0, 100.0, None)
+    assert series.timestamp(0) == aware and series.timestamp(0).utcoffset() == dt.timedelta(hours=2)
+    assert series.timestamp(1).tzinfo is None
+    assert list(series.window(T0, T0 + dt.timedelta(minutes=1))) == [(10.0, None, 5.0), (20.0, 100.0, None)]
+
+
+def _shuffled_runs(seed, runs, per_run):
+    rnd = random.Random(seed)
+    series = HrSeries()
+    expected = []
+    for r in range(runs):
+        start = rnd.randrange(0, 5000)
+        for i in range(per_run):
+            t = start + i * rnd.randint(0, 3)
+            series.append(T0 + dt.timedelta(seconds=t), 40 + (r * per_run + i) % 200)
+            expected.append((t, 40 + (r * per_run + i) % 200))
+    # Stable by time: equal times keep their append order
+    expected.sort(key=lambda tv: tv[0])
+    return series, expected
+
+
+def _samples(series):
+    return [(t - series.times[0], bpm) for t, bpm in zip(series.times, series.bpm)] if series.times else []
+
+
+def test_sort_is_stable_and_merges_overlapping_runs():
+    # 70 runs is past MAX_MERGE_RUNS, so that case sorts outright
+    for runs in (1, 2, 5, 70):
+        series, expected = _shuffled_runs(runs, runs, 30)
+        series.sort()
+        assert series.is_sorted()
+        base = expected[0][0]
+        assert _samples(series) == [(t - base, bpm) for t, bpm in expected]
+
+
+def test_sorted_input_is_left_as_is():
+    series = _hr([(m, 60 + m) for m in range(10)])
+    times = series.times
+    assert series.is_sorted()
+    series.sort()
+    assert series.times is times
+
+
+def test_extend_records_runs_and_keeps_columns_parallel():
+    first = _hr([(10, 100), (20, 110)])
+    second = _hr([(0, 90), (15, 105), (30, 120)])
+    merged = HrSeries()
+    merged.extend(first)
+    merged.extend(second, 1)
+    assert not merged.is_sorted()
+    merged.sort()
+    assert list(merged.bpm) == [100, 105, 110, 120]
+    assert list(merged.window_values(T0 + dt.timedelta(minutes=15), T0 + dt.timedelta(minutes=20))) == [105, 110]
+
+
+def test_splice_replaces_a_day_in_place():
+    series = _hr([(0, 100), (5, 101), (20, 102), (30, 103)])
+    day = _hr([(12, 110), (15, 111), (18, 112)])
+    # Replace the first sample after midnight
+    lo, _ = series.day_ranges()["2024-01-02"]
+    series.splice(lo, lo + 1, day)
+    assert list(series.bpm) == [100, 101, 110, 111, 112, 103]
+    assert series.day_ranges() == {"2024-01-01": (0, 2), "2024-01-02": (2, 6)}
@@ -0,0 +1,68 @@
+import json
+import os
+
+import pytest
+
+import distill_fitbit
+from fitbit_distiller import MANIFEST_NAME, DistilledStore, QueryError, QueryService, get_serializer
+
+DAILY = [{"date": f"2024-01-{d:02d}", "steps": 1000.0 * d, "calories": 2000.5} for d in range(1, 6)]
+SESSIONS = [{"date": "2024-01-02", "start": "2024-01-02T07:00:00", "type": "Run", "calories": 400.0},
+            {"date": "2024-01-04", "start": "2024-01-04T07:00:00", "type": "Walk", "calories": 150.0}]
+
+
+def _publish(out, daily, partitioned, fmt="default"):
+    paths, rollup_paths = distill_fitbit._output_paths(out)
+    distill_fitbit._publish_outputs([], [], SESSIONS, [dict(rec) for rec in daily], paths, rollup_paths, [],
+                                    get_serializer("stdlib", fmt), out if partitioned else None)
+
+
+def _query(service, path, **params):
+    return json.loads(service.handle(path, {k: [v] for k, v in params.items()}))
+
+
+def test_date_range_fields_and_type_filters(tmp_path):
+    out = str(tmp_path)
+    _publish(out, DAILY, partitioned=False)
+    service = QueryService(DistilledStore(out))
+    body = _query(service, "/daily", **{"from": "2024-01-02", "to": "2024-01-03"})
+    assert body["count"] == 2 and [r["date"] for r in body["records"]] == ["2024-01-02", "2024-01-03"]
+    assert _query(service, "/daily", fields="steps", to="2024-01-01")["records"] == [
+        {"date": "2024-01-01", "steps": 1000.0}]
+    assert [r["type"] for r in _query(service, "/sessions", type="walk")["records"]] == ["Walk"]
+    assert service.handle("/nope", {}) is None
+    with pytest.raises(QueryError):
+        service.handle("/daily", {"from": ["January"]})
+
+
+def test_responses_are_canonical_whatever_the_output_format(tmp_path):
+    bodies = []
+    for fmt in ("default", "canonical"):
+        out = str(tmp_path / fmt)
+        os.makedirs(out)
+        _publish(out, DAILY, partitioned=False, fmt=fmt)
+        service = QueryService(DistilledStore(out))
+        bodies.append((service.handle("/daily", {}), service.handle("/daily", {"fields": ["steps,calories"]})))
+    assert bodies[0] == bodies[1]
+    full, filtered = bodies[0]
+    assert b": " not in full and b", " not in full
+    assert full.startswith(b'{"count":5,"records":[{"date":"2024-01-01","steps":1000.0,"calories":2000.5}')
+    assert json.loads(filtered) == json.loads(full)
+
+
+def test_store_follows_layout_switches(tmp_path):
+    out = str(tmp_path)
+    _publish(out, DAILY, partitioned=False)
+    _publish(out, DAILY[:2], partitioned=True)
+    assert os.path.isfile(os.path.join(out, MANIFEST_NAME))
+    assert not os.path.exists(os.path.join(out, "fitbit_daily_distilled.jsonl"))
+    store = DistilledStore(out)
+    assert len(store.daily(None, None)) == 2
+
+    # Back to single files: the manifest and partitions go, and the store reloads from the single files
+    _publish(out, DAILY[:3], partitioned=False)
+    assert not os.path.exists(os.path.join(out, MANIFEST_NAME))
+    assert not os.path.exists(os.path.join(out, "fitbit_daily_distilled"))
+    assert store.reload_if_changed(force=True)
+    assert len(store.daily(None, None)) == 3
+    assert len(store.sessions("2024-01-03", None)) == 1